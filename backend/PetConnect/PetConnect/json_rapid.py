@@ -0,0 +1,100 @@
+"""
+Renderer i parser JSON de l'API amb orjson, si està instal·lat.
+
+`JSONRapidRenderer` dona els mateixos bytes que el `JSONRenderer` de DRF amb la
+configuració per defecte (`COMPACT_JSON` i `UNICODE_JSON`): separadors
+compactes, UTF-8 sense escapar i `\\u2028` / `\\u2029` escapats. Els tipus que
+orjson no coneix (cadenes de traducció lazy, Decimal, QuerySet...) i les dates
+(`OPT_PASSTHROUGH_DATETIME`) passen pel `default` de l'encoder de DRF, així que
+surten amb el mateix format ('Z' per UTC, microsegons inclosos).
+
+Es fa servir el renderer de DRF (json de la stdlib) quan:
+- orjson no està instal·lat;
+- es demana sortida indentada (`; indent=4`, l'API navegable);
+- `COMPACT_JSON` / `UNICODE_JSON` no tenen el valor per defecte;
+- `orjson.dumps` rebutja les dades (p. ex. enters fora del rang de 64 bits,
+  amb signe o sense).
+
+Diferències conegudes amb la stdlib: NaN i infinit surten com a `null` (amb
+`STRICT_JSON` DRF hi falla amb un ValueError) i els reals amb exponent
+s'escriuen sense el signe ni el zero (`1e-5` en lloc de `1e-05`); el valor és
+el mateix.
+
+`JSONRapidParser` llegeix amb `orjson.loads` els cossos UTF-8. `orjson.loads`
+no rebutja els enters fora del rang de 64 bits: els retorna com a float i hi
+perd precisió. Per això els cossos amb alguna tira de 19 xifres o més (que pot
+ser un d'aquests enters) van directament al parser de DRF, igual que els que
+orjson rebutja (JSON invàlid, `NaN`...). El parser de DRF dona el mateix
+resultat o el mateix `ParseError` que abans.
+"""
+import io
+import re
+
+from django.conf import settings
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depèn de l'entorn
+    orjson = None
+
+
+ESCAPAMENTS = ((b'\xe2\x80\xa8', b'\\u2028'), (b'\xe2\x80\xa9', b'\\u2029'))
+# Els enters de 64 bits tenen com a molt 19 xifres (20 sense signe): a partir de
+# 19 poden ser fora de rang, i orjson els llegiria com a float
+XIFRES_LLARGUES = re.compile(rb'\d{19}')
+
+
+def disponible():
+    return orjson is not None
+
+
+class JSONRapidRenderer(JSONRenderer):
+    """`JSONRenderer` de DRF amb orjson quan la sortida és compacta."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if (
+            orjson is None
+            or not self.compact
+            or self.ensure_ascii
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(
+                data,
+                default=self.encoder_class().default,
+                option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS,
+            )
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Com DRF: JSON que també és un subconjunt estricte de JavaScript
+        if b'\xe2\x80' in ret:
+            for caracter, escapat in ESCAPAMENTS:
+                ret = ret.replace(caracter, escapat)
+        return ret
+
+
+class JSONRapidParser(JSONParser):
+    """`JSONParser` de DRF amb `orjson.loads` per als cossos UTF-8."""
+    renderer_class = JSONRapidRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or encoding.lower().replace('_', '-') not in ('utf-8', 'utf8'):
+            return super().parse(stream, media_type, parser_context)
+
+        cos = stream.read()
+        if XIFRES_LLARGUES.search(cos) is None:
+            try:
+                return orjson.loads(cos)
+            except orjson.JSONDecodeError:
+                pass
+        return super().parse(io.BytesIO(cos), media_type, parser_context)
+
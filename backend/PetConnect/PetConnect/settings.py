@@ -55,6 +55,19 @@ REST_FRAMEWORK = {
     ],
 }
 
+# Renderer i parser JSON amb orjson si està instal·lat (PetConnect.json_rapid);
+# API_JSON_RAPID=False torna als de DRF
+if os.environ.get('API_JSON_RAPID', 'True') == 'True':
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'] = [
+        'PetConnect.json_rapid.JSONRapidRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ]
+    REST_FRAMEWORK['DEFAULT_PARSER_CLASSES'] = [
+        'PetConnect.json_rapid.JSONRapidParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ]
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),    # Token expira en 1h
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),       
@@ -133,6 +146,44 @@ else:
     }
 
 
+# Cache
+# - Per defecte, cache en memòria del procés (locmem).
+# - DJANGO_CACHE_BACKEND=file + DJANGO_CACHE_LOCATION=/ruta per compartir-la entre processos.
+if os.environ.get('DJANGO_CACHE_BACKEND') == 'file':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('DJANGO_CACHE_LOCATION', str(BASE_DIR / '.cache')),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'petconnect',
+        }
+    }
+
+# Rànquing de recomanacions cachejat per usuari (ai_service.cache_recomanacions)
+RECOMANACIONS_CACHE_TTL = int(os.environ.get('RECOMANACIONS_CACHE_TTL', 600))
+RECOMANACIONS_CACHE_MIDA = int(os.environ.get('RECOMANACIONS_CACHE_MIDA', 50))
+# Validesa del top-N precalculat per `precompute_recommendations` (segons)
+RECOMANACIONS_PRECALCUL_TTL = int(os.environ.get('RECOMANACIONS_PRECALCUL_TTL', 24 * 3600))
+# Recomptes per faceta del catàleg cachejats per conjunt de filtres (mascotas.facetes)
+FACETES_CACHE_TTL = int(os.environ.get('FACETES_CACHE_TTL', 60))
+# Respostes anònimes del catàleg públic (mascotas.cache_cataleg)
+CATALEG_CACHE_TTL = int(os.environ.get('CATALEG_CACHE_TTL', 300))
+# Derivades de les fotos de mascotes (mascotas.imatges): 'proces' (pool de processos),
+# 'sincron' (al mateix fil) o 'desactivat'
+IMATGES_DERIVADES_MODE = os.environ.get('IMATGES_DERIVADES_MODE', 'proces')
+IMATGES_PROCESSOS = int(os.environ.get('IMATGES_PROCESSOS', 2))
+# Lectures completes de Mascota sense passar per DRF (mascotas.serialitzacio_rapida)
+MASCOTES_SERIALITZACIO_RAPIDA = os.environ.get('MASCOTES_SERIALITZACIO_RAPIDA', 'True') == 'True'
+
+# Mode write-behind dels swipes: `swipe_action` només desa l'esdeveniment a
+# swipes_pendientes i `buidar_swipes_pendents` l'aplica (mascotas.swipes)
+SWIPES_WRITE_BEHIND = os.environ.get('SWIPES_WRITE_BEHIND', 'False') == 'True'
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
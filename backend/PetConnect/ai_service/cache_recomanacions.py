@@ -0,0 +1,133 @@
+"""
+Cache per usuari del rànquing de recomanacions (IA 2).
+
+Es guarda la llista de tuples (mascota_id, score, score_explicites,
+score_implicites) que retorna `calcular_ranquing_ia`, amb més elements dels
+que demana la vista (`RECOMANACIONS_CACHE_MIDA`) perquè l'entrada sobrevisqui
+a uns quants swipes. Caduca després de `RECOMANACIONS_CACHE_TTL` segons.
+
+Invalidació (receptors a `mascotas.signals`):
+- dislike nou: es treu la mascota de l'entrada de l'usuari (la resta no canvia).
+- like, o like que passa a dislike: s'esborra l'entrada, perquè canvia
+  l'histograma implícit i per tant el score de totes les mascotes.
+- PerfilUsuario desat: s'esborra l'entrada de l'usuari.
+- Mascota creada / editada / ocultada / adoptada / esborrada: s'incrementa la
+  versió global del catàleg i totes les entrades anteriors deixen de valdre.
+
+Els comptadors de likes d'altres usuaris (bonus de popularitat) no invaliden:
+aquest desfasament queda acotat pel TTL.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+PREFIX = 'recomanacions'
+CLAU_VERSIO_CATALEG = f'{PREFIX}:versio_cataleg'
+CLAUS_ESTADISTIQUES = {'hit': f'{PREFIX}:hits', 'miss': f'{PREFIX}:misses'}
+
+
+def ttl():
+    return getattr(settings, 'RECOMANACIONS_CACHE_TTL', 600)
+
+
+def mida_ranquing():
+    return getattr(settings, 'RECOMANACIONS_CACHE_MIDA', 50)
+
+
+def clau_usuari(usuario_id):
+    return f'{PREFIX}:usuari:{usuario_id}'
+
+
+def _incrementar(clau):
+    try:
+        return cache.incr(clau)
+    except ValueError:
+        # La clau no existeix (o ha caducat): es crea; si una altra petició
+        # l'ha creat just abans, es torna a incrementar
+        if cache.add(clau, 1, timeout=None):
+            return 1
+        return cache.incr(clau)
+
+
+def versio_cataleg():
+    versio = cache.get(CLAU_VERSIO_CATALEG)
+    if versio is None:
+        cache.add(CLAU_VERSIO_CATALEG, 1, timeout=None)
+        versio = cache.get(CLAU_VERSIO_CATALEG, 1)
+    return versio
+
+
+def invalidar_cataleg():
+    _incrementar(CLAU_VERSIO_CATALEG)
+
+
+def invalidar_usuari(usuario_id):
+    cache.delete(clau_usuari(usuario_id))
+
+
+def _temps_restant(entrada):
+    return entrada['caduca'] - time.time()
+
+
+def desar(usuario_id, ranquing, complet):
+    """
+    Desa el rànquing de l'usuari. `complet` indica que conté totes les
+    mascotes candidates (se n'han calculat menys de les demanades).
+    """
+    cache.set(clau_usuari(usuario_id), {
+        'versio': versio_cataleg(),
+        'caduca': time.time() + ttl(),
+        'complet': complet,
+        'ranquing': [tuple(fila) for fila in ranquing],
+    }, timeout=ttl())
+
+
+def llegir(usuario_id, limit):
+    """
+    Rànquing cachejat de l'usuari, o None si no n'hi ha, és d'una versió
+    anterior del catàleg o ja no té prou elements per servir `limit`.
+    Registra el hit / miss.
+    """
+    entrada = cache.get(clau_usuari(usuario_id))
+    valida = (
+        entrada is not None
+        and entrada['versio'] == versio_cataleg()
+        and _temps_restant(entrada) > 0
+        and (entrada['complet'] or len(entrada['ranquing']) >= limit)
+    )
+    registrar('hit' if valida else 'miss')
+    return entrada['ranquing'] if valida else None
+
+
+def treure_mascota(usuario_id, mascota_id):
+    treure_mascotes(usuario_id, [mascota_id])
+
+
+def treure_mascotes(usuario_id, mascota_ids):
+    """Treu mascotes de l'entrada de l'usuari sense tocar-ne la caducitat."""
+    clau = clau_usuari(usuario_id)
+    entrada = cache.get(clau)
+    if entrada is None:
+        return
+    restant = _temps_restant(entrada)
+    if restant <= 0:
+        cache.delete(clau)
+        return
+    treure = set(mascota_ids)
+    entrada['ranquing'] = [fila for fila in entrada['ranquing'] if fila[0] not in treure]
+    cache.set(clau, entrada, timeout=restant)
+
+
+def registrar(resultat):
+    _incrementar(CLAUS_ESTADISTIQUES[resultat])
+
+
+def estadistiques():
+    """Comptadors globals de hits / misses (i la taxa d'encert)."""
+    valors = cache.get_many(CLAUS_ESTADISTIQUES.values())
+    hits = valors.get(CLAUS_ESTADISTIQUES['hit'], 0)
+    misses = valors.get(CLAUS_ESTADISTIQUES['miss'], 0)
+    total = hits + misses
+    return {'hits': hits, 'misses': misses, 'taxa_encert': hits / total if total else 0.0}
@@ -0,0 +1,439 @@
+"""
+IA 2: Motor de puntuació vectoritzat.
+
+Codifica el catàleg de mascotes com una matriu numèrica (espècie, tamany,
+edat, sexe, apto_ninos, companyia, experiència i les màscares de bits de
+convivència / estat de salut que ja guarda la BD) i puntua tots els
+candidats d'una sola passada amb NumPy.
+
+Les regles (exclusions forçoses, pesos, bonus i penalitzacions) són
+exactament les de `calcular_score_preferencies_explicites` i
+`calcular_score_preferencies_implicites`: el rànquing resultant ha de ser
+idèntic al del càlcul iteratiu.
+"""
+import heapq
+import itertools
+import random
+
+import numpy as np
+
+from mascotas import mascares
+from mascotas.models import Mascota
+
+
+# Codi reservat per a valors buits o fora de choices ('DESCONOCIDO')
+CODI_DESCONEGUT = 0
+
+
+def _vocabulari(choices):
+    """Assigna un codi enter (a partir d'1) a cada valor d'unes choices."""
+    return {valor: i for i, (valor, _) in enumerate(choices, start=1)}
+
+
+VOCABULARIS = {
+    'especie': _vocabulari(Mascota.ESPECIES_CHOICES),
+    'tamano': _vocabulari(Mascota.TAMANO_CHOICES),
+    'edad_clasificacion': _vocabulari(Mascota.EDAD_CHOICES),
+    'genero': _vocabulari(Mascota.GENERO_CHOICES),
+    'apto_ninos': _vocabulari(Mascota.NINOS_CHOICES),
+    'necesita_compania_animal': _vocabulari(Mascota.COMPANIA_ANIMAL_CHOICES),
+    'nivel_experiencia': _vocabulari(Mascota.NIVEL_EXPERIENCIA_CHOICES),
+}
+
+# Mateixos bits que les columnes `<camp>_bits` de Mascota (mascotas.mascares)
+BITS_APTO_CON = mascares.bits('apto_con')
+BITS_ESTADO_SALUD = mascares.bits('estado_legal_salud')
+
+# Files que es codifiquen i puntuen de cop en el mode streaming
+MIDA_BLOC = 2000
+
+# Camps que es llegeixen de la BD per construir la matriu (ordre fix)
+CAMPS_CATALEG = (
+    'id',
+    'especie',
+    'tamano',
+    'edad_clasificacion',
+    'genero',
+    'apto_ninos',
+    'necesita_compania_animal',
+    'nivel_experiencia',
+    'apto_con_bits',
+    'estado_legal_salud_bits',
+    'condicion_especial_gato_bits',
+    'condicion_especial_perro_bits',
+    'total_likes',
+    'protectora__perfil_protectora__codigo_postal_refugio',
+)
+
+
+def _codi(vocabulari, valor):
+    return vocabulari.get(valor, CODI_DESCONEGUT) if valor else CODI_DESCONEGUT
+
+
+def _mascara(bits, valors):
+    mascara = 0
+    for valor in valors or ():
+        mascara |= bits.get(valor, 0)
+    return mascara
+
+
+def codificar_cataleg(files):
+    """
+    Converteix files de `CAMPS_CATALEG` (tuples de `values_list`) en un
+    diccionari d'arrays NumPy, una columna per característica. Convivència,
+    estat de salut i condicions especials ja arriben com a màscares de bits.
+    """
+    columnes = {nom: [] for nom in (
+        'id', 'especie', 'tamano', 'edad_clasificacion', 'genero',
+        'apto_ninos', 'necesita_compania_animal', 'nivel_experiencia',
+        'apto_con', 'estado_salud', 'n_apto_con', 'te_condicio',
+        'likes', 'codigo_postal',
+    )}
+
+    for (mascota_id, especie, tamano, edad_cls, genero, apto_ninos, compania,
+         experiencia, apto_con, estado, cond_gato, cond_perro, total_likes, codigo_postal) in files:
+        columnes['id'].append(mascota_id)
+        columnes['especie'].append(_codi(VOCABULARIS['especie'], especie))
+        columnes['tamano'].append(_codi(VOCABULARIS['tamano'], tamano))
+        columnes['edad_clasificacion'].append(_codi(VOCABULARIS['edad_clasificacion'], edad_cls))
+        columnes['genero'].append(_codi(VOCABULARIS['genero'], genero))
+        columnes['apto_ninos'].append(_codi(VOCABULARIS['apto_ninos'], apto_ninos))
+        columnes['necesita_compania_animal'].append(_codi(VOCABULARIS['necesita_compania_animal'], compania))
+        columnes['nivel_experiencia'].append(_codi(VOCABULARIS['nivel_experiencia'], experiencia))
+        columnes['apto_con'].append(apto_con)
+        columnes['estado_salud'].append(estado)
+        columnes['n_apto_con'].append(apto_con.bit_count())
+        if especie == 'GATO':
+            columnes['te_condicio'].append(bool(cond_gato))
+        elif especie == 'PERRO':
+            columnes['te_condicio'].append(bool(cond_perro))
+        else:
+            columnes['te_condicio'].append(False)
+        columnes['likes'].append(total_likes)
+        columnes['codigo_postal'].append(codigo_postal or '')
+
+    cataleg = {
+        'id': np.array(columnes['id'], dtype=np.int64),
+        'apto_con': np.array(columnes['apto_con'], dtype=np.int64),
+        'estado_salud': np.array(columnes['estado_salud'], dtype=np.int64),
+        'n_apto_con': np.array(columnes['n_apto_con'], dtype=np.int64),
+        'te_condicio': np.array(columnes['te_condicio'], dtype=bool),
+        'likes': np.array(columnes['likes'], dtype=np.int64),
+        'codigo_postal': np.array(columnes['codigo_postal'], dtype=object),
+    }
+    for nom in VOCABULARIS:
+        cataleg[nom] = np.array(columnes[nom], dtype=np.int8)
+    return cataleg
+
+
+def _codi_de(nom, valor):
+    return VOCABULARIS[nom].get(valor, CODI_DESCONEGUT) if valor else CODI_DESCONEGUT
+
+
+def _es_a(columna, nom, valors):
+    """Màscara booleana: el valor de la columna és dins de `valors`."""
+    codis = [VOCABULARIS[nom][v] for v in valors if v in VOCABULARIS[nom]]
+    return np.isin(columna, codis) & (columna != CODI_DESCONEGUT)
+
+
+def mascara_exclusions(cataleg, pref_explicites):
+    """FASE 1: True per a les mascotes INCOMPATIBLES amb la situació de l'usuari."""
+    n = len(cataleg['id'])
+    excloses = np.zeros(n, dtype=bool)
+    if not pref_explicites:
+        return excloses
+
+    apto_ninos = cataleg['apto_ninos']
+    compania = cataleg['necesita_compania_animal']
+    experiencia = cataleg['nivel_experiencia']
+
+    # 1. Nens
+    if pref_explicites.get('tiene_ninos', False):
+        excloses |= apto_ninos == _codi_de('apto_ninos', 'NO_APTO_NINOS')
+
+    # 2. Companyia animal
+    tiene_animales = (
+        pref_explicites.get('tiene_perros', False) or
+        pref_explicites.get('tiene_gatos', False) or
+        pref_explicites.get('tiene_otros_animales', False)
+    )
+    if not tiene_animales:
+        excloses |= compania == _codi_de('necesita_compania_animal', 'NECESITA_COMPANIA')
+
+    # 3. Experiència
+    if pref_explicites.get('es_primerizo', True):
+        excloses |= _es_a(experiencia, 'nivel_experiencia', ['EXPERIENCIA', 'LICENCIA_PPP'])
+
+    # 4. Llicència PPP
+    if not pref_explicites.get('tiene_licencia_ppp', False):
+        excloses |= experiencia == _codi_de('nivel_experiencia', 'LICENCIA_PPP')
+
+    return excloses
+
+
+def puntuar_explicites(cataleg, pref_explicites):
+    """
+    Versió vectoritzada de `calcular_score_preferencies_explicites`.
+    Retorna un array de scores (0-1) amb -1 per a les mascotes incompatibles.
+    """
+    n = len(cataleg['id'])
+    if not pref_explicites:
+        return np.zeros(n)
+
+    # Les sumes es fan en el mateix ordre que la versió iterativa perquè
+    # els resultats en coma flotant siguin idèntics.
+    score = np.zeros(n)
+    total_criteris = np.zeros(n)
+
+    # FASE 2: criteris opcionals
+    if pref_explicites.get('especie'):
+        total_criteris += 2
+        score += np.where(_es_a(cataleg['especie'], 'especie', pref_explicites['especie']), 2.0, 0.0)
+
+    if pref_explicites.get('tamano'):
+        total_criteris += 1
+        score += np.where(_es_a(cataleg['tamano'], 'tamano', pref_explicites['tamano']), 1.0, 0.0)
+
+    if pref_explicites.get('edad'):
+        total_criteris += 1
+        score += np.where(_es_a(cataleg['edad_clasificacion'], 'edad_clasificacion', pref_explicites['edad']), 1.0, 0.0)
+
+    if pref_explicites.get('sexo'):
+        total_criteris += 1
+        score += np.where(_es_a(cataleg['genero'], 'genero', pref_explicites['sexo']), 1.0, 0.0)
+
+    if pref_explicites.get('convivencia'):
+        total_criteris += 1
+        mascara = _mascara(BITS_APTO_CON, pref_explicites['convivencia'])
+        score += np.where((cataleg['apto_con'] & mascara) != 0, 1.0, 0.0)
+
+    if pref_explicites.get('estado_salud'):
+        total_criteris += 1
+        requerits = pref_explicites['estado_salud']
+        if all(est in BITS_ESTADO_SALUD for est in requerits):
+            mascara = _mascara(BITS_ESTADO_SALUD, requerits)
+            score += np.where((cataleg['estado_salud'] & mascara) == mascara, 1.0, 0.0)
+
+    # FASE 3: bonus per compatibilitat positiva
+    if pref_explicites.get('tiene_ninos', False):
+        bonus = cataleg['apto_ninos'] == _codi_de('apto_ninos', 'APTO_NINOS')
+        score += np.where(bonus, 0.3, 0.0)
+        total_criteris += np.where(bonus, 0.3, 0.0)
+
+    if pref_explicites.get('es_primerizo', True):
+        bonus = cataleg['nivel_experiencia'] == _codi_de('nivel_experiencia', 'PRIMERIZOS')
+        score += np.where(bonus, 0.2, 0.0)
+        total_criteris += np.where(bonus, 0.2, 0.0)
+
+    if pref_explicites.get('tiene_perros', False) or pref_explicites.get('tiene_gatos', False):
+        bonus = _es_a(cataleg['necesita_compania_animal'], 'necesita_compania_animal',
+                      ['NECESITA_COMPANIA', 'INDIFERENTE_COMPANIA'])
+        score += np.where(bonus, 0.2, 0.0)
+        total_criteris += np.where(bonus, 0.2, 0.0)
+
+    # FASE 4: penalitzacions
+    if not pref_explicites.get('acepta_condicion_especial', False):
+        score -= np.where(cataleg['te_condicio'], 0.5, 0.0)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        resultat = np.where(
+            total_criteris <= 0,
+            0.5,
+            np.clip(score / np.where(total_criteris <= 0, 1, total_criteris), 0.0, 1.0),
+        )
+
+    resultat[mascara_exclusions(cataleg, pref_explicites)] = -1
+    return resultat
+
+
+def _comptatges(cataleg, nom, histograma):
+    """Per a cada mascota, el nombre de likes de l'histograma amb el seu mateix valor."""
+    taula = np.zeros(len(VOCABULARIS[nom]) + 1)
+    taula[CODI_DESCONEGUT] = histograma.get('DESCONOCIDO', 0)
+    for valor, codi in VOCABULARIS[nom].items():
+        taula[codi] = histograma.get(valor, 0)
+    return taula[cataleg[nom]]
+
+
+def puntuar_implicites(cataleg, pref_implicites):
+    """Versió vectoritzada de `calcular_score_preferencies_implicites`."""
+    n = len(cataleg['id'])
+    if not pref_implicites:
+        return np.zeros(n)
+
+    total_likes = pref_implicites['total_likes']
+    if total_likes == 0:
+        return np.zeros(n)
+
+    score = np.zeros(n)
+    total_weight = 0.0
+
+    for nom, clau, weight in (
+        ('especie', 'especie', 0.4),
+        ('tamano', 'tamano', 0.2),
+        ('edad_clasificacion', 'edad_clasificacion', 0.15),
+        ('genero', 'sexo', 0.15),
+    ):
+        score += weight * (_comptatges(cataleg, nom, pref_implicites[clau]) / total_likes)
+        total_weight += weight
+
+    # Convivència (10%)
+    weight = 0.1
+    convivencia = pref_implicites['convivencia']
+    te_apto = cataleg['n_apto_con'] > 0
+    if te_apto.any():
+        conv_score = np.zeros(n)
+        for valor, bit in BITS_APTO_CON.items():
+            if convivencia.get(valor):
+                conv_score += np.where((cataleg['apto_con'] & bit) != 0, float(convivencia[valor]), 0.0)
+        max_conv = max(convivencia.values()) if convivencia else 1
+        if max_conv > 0:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                aportacio = weight * (conv_score / (max_conv * np.where(te_apto, cataleg['n_apto_con'], 1)))
+            score += np.where(te_apto, aportacio, 0.0)
+    total_weight += weight
+
+    return score / total_weight if total_weight > 0 else np.zeros(n)
+
+
+def bonus_proximitat(cataleg, codigo_postal_usuario):
+    """Bonus per proximitat geogràfica: mateixa província (2 primers dígits)."""
+    n = len(cataleg['id'])
+    if not codigo_postal_usuario:
+        return np.zeros(n)
+
+    codis, inversa = np.unique(cataleg['codigo_postal'], return_inverse=True)
+    bonus_per_codi = np.zeros(len(codis))
+    for i, codigo_postal_protectora in enumerate(codis):
+        if not codigo_postal_protectora:
+            continue
+        if codigo_postal_usuario[:2] == codigo_postal_protectora[:2]:
+            bonus_per_codi[i] = 0.15
+        elif codigo_postal_usuario[:3] == codigo_postal_protectora[:3]:
+            bonus_per_codi[i] = 0.1
+    return bonus_per_codi[inversa]
+
+
+def arrodonir(valors, decimals=3):
+    """
+    Arrodoniment vectoritzat equivalent a `round(x, decimals)` de Python.
+
+    `np.round` pot diferir en els casos límit (x * 10^d a prop de .5):
+    aquests pocs valors es recalculen amb `round`.
+    """
+    arrodonits = np.round(valors, decimals)
+    escalats = valors * (10 ** decimals)
+    dubtosos = np.abs(escalats - np.floor(escalats) - 0.5) < 1e-6
+    for i in np.flatnonzero(dubtosos):
+        arrodonits[i] = round(float(valors[i]), decimals)
+    return arrodonits
+
+
+def puntuar_cataleg(cataleg, pref_explicites, pref_implicites, codigo_postal_usuario=None):
+    """
+    Puntua tot el catàleg d'una passada.
+
+    Retorna (score_final, score_explicites, score_implicites, valides), on
+    `valides` és la màscara de mascotes que NO queden excloses.
+    """
+    n = len(cataleg['id'])
+
+    # Determinar pesos segons disponibilitat
+    if pref_explicites and pref_implicites:
+        weight_explicites, weight_implicites = 0.6, 0.4
+    elif pref_explicites:
+        weight_explicites, weight_implicites = 1.0, 0.0
+    elif pref_implicites:
+        weight_explicites, weight_implicites = 0.0, 1.0
+    else:
+        weight_explicites, weight_implicites = 0.0, 0.0
+
+    score_explicites = puntuar_explicites(cataleg, pref_explicites)
+    valides = score_explicites != -1
+    score_implicites = puntuar_implicites(cataleg, pref_implicites)
+
+    score_base = (weight_explicites * score_explicites) + (weight_implicites * score_implicites)
+    if weight_explicites == 0 and weight_implicites == 0:
+        # Sense preferències: component aleatori entre 0.3 i 0.5
+        score_base = 0.3 + (np.array([random.random() for _ in range(n)]) * 0.2)
+
+    popularity_bonus = np.minimum(0.1, cataleg['likes'] * 0.02)
+    proximity_bonus = bonus_proximitat(cataleg, codigo_postal_usuario)
+
+    score_final = np.minimum(1.0, np.maximum(0.0, score_base + popularity_bonus + proximity_bonus))
+    return score_final, score_explicites, score_implicites, valides
+
+
+def _ordre_top(score_final, valides, limit):
+    """Índexs dels `limit` millors candidats (ordenació estable sobre el score arrodonit)."""
+    index_valids = np.flatnonzero(valides)
+    arrodonits = arrodonir(score_final[index_valids])
+    return index_valids[np.argsort(-arrodonits, kind='stable')][:limit]
+
+
+def _fila_resultat(cataleg, score_final, score_explicites, score_implicites, i):
+    return (
+        int(cataleg['id'][i]),
+        round(float(score_final[i]), 3),
+        round(float(score_explicites[i]), 3),
+        round(float(score_implicites[i]), 3),
+    )
+
+
+def seleccionar_top(cataleg, score_final, score_explicites, score_implicites, valides, limit):
+    """
+    Retorna els `limit` millors candidats com a llista de tuples
+    (mascota_id, score, score_explicites, score_implicites).
+
+    L'ordenació és estable sobre el score arrodonit, igual que el
+    `sort(reverse=True)` de la versió iterativa.
+    """
+    return [
+        _fila_resultat(cataleg, score_final, score_explicites, score_implicites, i)
+        for i in _ordre_top(score_final, valides, limit)
+    ]
+
+
+def seleccionar_top_streaming(files, pref_explicites, pref_implicites, codigo_postal_usuario=None,
+                              limit=5, mida_bloc=MIDA_BLOC):
+    """
+    Com `puntuar_cataleg` + `seleccionar_top`, però consumint `files` (un
+    iterable de tuples de `CAMPS_CATALEG`, p.ex. `values_list(...).iterator()`)
+    per blocs de `mida_bloc`. Només es manté en memòria el bloc actual i un
+    heap amb els `limit` millors, així que el pic de memòria no depèn de la
+    mida del catàleg.
+
+    Dona el mateix resultat que puntuar tot el catàleg de cop: els empats es
+    resolen per ordre d'arribada, com l'ordenació estable.
+    """
+    if limit <= 0:
+        return []
+
+    # Min-heap de (score, -posició, fila): l'arrel és el pitjor dels millors
+    # (score més baix i, en cas d'empat, el que ha arribat més tard)
+    heap = []
+    posicio = 0
+    files = iter(files)
+    while True:
+        bloc = list(itertools.islice(files, mida_bloc))
+        if not bloc:
+            break
+
+        cataleg = codificar_cataleg(bloc)
+        score_final, score_explicites, score_implicites, valides = puntuar_cataleg(
+            cataleg, pref_explicites, pref_implicites, codigo_postal_usuario
+        )
+        # Dins del bloc n'hi ha prou amb els `limit` millors
+        for i in _ordre_top(score_final, valides, limit):
+            fila = _fila_resultat(cataleg, score_final, score_explicites, score_implicites, i)
+            entrada = (fila[1], -(posicio + int(i)), fila)
+            if len(heap) < limit:
+                heapq.heappush(heap, entrada)
+            elif entrada > heap[0]:
+                heapq.heapreplace(heap, entrada)
+            else:
+                # La resta del bloc té score igual o menor i arriba més tard
+                break
+        posicio += len(bloc)
+
+    return [fila for _, _, fila in sorted(heap, reverse=True)]
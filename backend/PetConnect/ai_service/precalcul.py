@@ -0,0 +1,97 @@
+"""
+Recomanacions precalculades offline (taula `recomendaciones_precalculadas`).
+
+`precompute_recommendations` calcula el top-N de cada usuari actiu (en
+paral·lel, per lots d'usuaris) i el desa aquí; `RecomendacionIAView` el
+serveix mentre és fresc i, si no, puntua en línia.
+
+Un rànquing és fresc si:
+- s'ha calculat fa menys de `RECOMANACIONS_PRECALCUL_TTL` segons,
+- no s'ha donat d'alta cap mascota visible després (podria entrar al
+  rànquing),
+- cap de les mascotes del rànquing que encara es poden recomanar s'ha
+  editat després (el seu score podria haver canviat). Les adoptades, ocultes,
+  esborrades o ja swipejades simplement es treuen; les edicions d'altres
+  mascotes no el fan caducar,
+- l'usuari no ha fet cap like (ni n'ha desfet cap) ni ha editat el perfil
+  després (els receptors de `mascotas.signals` esborren la fila).
+Els dislikes nous no l'invaliden: les mascotes ja vistes es filtren en llegir-lo.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+
+from mascotas.models import Mascota, RecomendacionPrecalculada
+
+
+def ttl():
+    return getattr(settings, 'RECOMANACIONS_PRECALCUL_TTL', 24 * 3600)
+
+
+def usuaris_actius():
+    return get_user_model().objects.filter(is_active=True, role='usuario')
+
+
+def calcular_lot(usuario_ids, top):
+    """
+    Calcula i desa el top `top` de cada usuari de `usuario_ids`.
+    És la unitat de feina dels processos del pool; retorna quants usuaris ha desat.
+    """
+    # Import diferit: ai_service.views també importa aquest mòdul
+    from . import views
+
+    files = []
+    for usuario in usuaris_actius().filter(pk__in=usuario_ids).select_related('perfil_usuario'):
+        # La marca de temps es pren abans de llegir el catàleg: qualsevol canvi
+        # posterior fa que el rànquing es consideri caducat
+        fecha_calculo = timezone.now()
+        ranquing = views.calcular_ranquing_ia(usuario, limit=top)
+        files.append(RecomendacionPrecalculada(
+            usuario=usuario,
+            ranquing=[list(fila) for fila in ranquing],
+            completo=len(ranquing) < top,
+            fecha_calculo=fecha_calculo,
+        ))
+
+    RecomendacionPrecalculada.objects.bulk_create(
+        files,
+        update_conflicts=True,
+        unique_fields=['usuario'],
+        update_fields=['ranquing', 'completo', 'fecha_calculo'],
+    )
+    return len(files)
+
+
+def llegir(usuario, limit):
+    """
+    Rànquing precalculat i fresc de l'usuari com a (ranquing, completo), o
+    None si no n'hi ha, ha caducat o no té prou mascotes per servir `limit`.
+    """
+    fila = RecomendacionPrecalculada.objects.filter(usuario=usuario).first()
+    if fila is None or fila.fecha_calculo < timezone.now() - timedelta(seconds=ttl()):
+        return None
+    # Mascotes noves al catàleg després del càlcul: podrien entrar al rànquing
+    # (consulta acotada per l'índex parcial `mascotas_visibles_recents`)
+    if Mascota.objects.filter(adoptado=False, oculto=False, fecha_creacion__gt=fila.fecha_calculo).exists():
+        return None
+
+    # Només les mascotes del rànquing: les que ja no es poden recomanar (o ja
+    # swipejades, també pendents en mode write-behind) es treuen; si alguna de
+    # les altres s'ha editat després del càlcul, el seu score ja no val
+    actualitzacions = dict(
+        Mascota.objects.filter(
+            id__in=[mascota_id for mascota_id, *_ in fila.ranquing], adoptado=False, oculto=False,
+        ).no_vistes_per(usuario).values_list('id', 'fecha_actualizacion')
+    )
+    if any(fecha > fila.fecha_calculo for fecha in actualitzacions.values()):
+        return None
+    ranquing = [tuple(valors) for valors in fila.ranquing if valors[0] in actualitzacions]
+    if not fila.completo and len(ranquing) < limit:
+        return None
+    return ranquing, fila.completo
+
+
+def invalidar_usuari(usuario_id):
+    RecomendacionPrecalculada.objects.filter(usuario_id=usuario_id).delete()
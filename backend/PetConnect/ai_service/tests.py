@@ -0,0 +1,447 @@
+import itertools
+import random
+import tracemalloc
+from datetime import timedelta
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from mascotas import mascares
+from mascotas.models import Mascota, Interaccion, RecomendacionPrecalculada
+from usuarios.models import Usuario, PerfilProtectora
+from . import cache_recomanacions, motor_recomanacio
+from .views import (
+    calcular_ranquing_ia,
+    calcular_score_preferencies_explicites,
+    obtenir_preferencies_explicites,
+    obtenir_recomanacions_ia,
+    obtenir_recomanacions_ia_iteratiu,
+)
+
+
+def _opcions(choices):
+    return [valor for valor, _ in choices]
+
+
+def crear_mascota_aleatoria(rng, protectora, **extra):
+    """Crea una mascota amb una combinació aleatòria (i vàlida) de choices."""
+    especie = rng.choice(['PERRO', 'GATO'])
+    dades = {
+        'nombre': f'Mascota {rng.randint(1, 10**6)}',
+        'especie': especie,
+        'genero': rng.choice(_opcions(Mascota.GENERO_CHOICES)),
+        'tamano': rng.choice(_opcions(Mascota.TAMANO_CHOICES)),
+        'edad_clasificacion': rng.choice(_opcions(Mascota.EDAD_CHOICES)),
+        'apto_ninos': rng.choice(_opcions(Mascota.NINOS_CHOICES)),
+        'necesita_compania_animal': rng.choice(_opcions(Mascota.COMPANIA_ANIMAL_CHOICES)),
+        'nivel_experiencia': rng.choice(_opcions(Mascota.NIVEL_EXPERIENCIA_CHOICES)),
+        'apto_con': rng.sample(_opcions(Mascota.APTO_CON_CHOICES), rng.randint(0, 3)),
+        'estado_legal_salud': rng.sample(_opcions(Mascota.ESTADO_LEGAL_SALUD_CHOICES), rng.randint(0, 4)),
+        'foto': 'mascotas/test.jpg',
+        'protectora': protectora,
+    }
+    if especie == 'PERRO':
+        dades['raza_perro'] = rng.choice(_opcions(Mascota.RAZAS_PERRO_CHOICES))
+        dades['condicion_especial_perro'] = rng.sample(_opcions(Mascota.CONDICION_ESPECIAL_PERRO_CHOICES), rng.choice([0, 0, 1]))
+    else:
+        dades['raza_gato'] = rng.choice(_opcions(Mascota.RAZAS_GATO_CHOICES))
+        dades['condicion_especial_gato'] = rng.sample(_opcions(Mascota.CONDICION_ESPECIAL_GATO_CHOICES), rng.choice([0, 0, 1]))
+    dades.update(extra)
+    return Mascota.objects.create(**dades)
+
+
+class MotorRecomanacioParitatTests(TestCase):
+    """El motor vectoritzat ha de donar exactament el mateix rànquing que l'iteratiu."""
+
+    @classmethod
+    def setUpTestData(cls):
+        rng = random.Random(1234)
+        cls.protectores = []
+        for i, codigo_postal in enumerate(['08001', '08500', '17001', None]):
+            protectora = Usuario.objects.create_user(
+                username=f'protectora{i}', email=f'protectora{i}@test.com',
+                password='test1234', role='protectora',
+            )
+            PerfilProtectora.objects.filter(usuario=protectora).update(codigo_postal_refugio=codigo_postal)
+            cls.protectores.append(protectora)
+
+        cls.mascotes = [
+            crear_mascota_aleatoria(rng, rng.choice(cls.protectores))
+            for _ in range(80)
+        ]
+
+        perfils = [
+            {},
+            {'tiene_ninos': True, 'es_primerizo': True, 'codigo_postal': '08010'},
+            {'tiene_perros': True, 'es_primerizo': False, 'tiene_licencia_ppp': True,
+             'preferencias_especie': ['PERRO'], 'preferencias_tamano': ['GRANDE', 'GIGANTE']},
+            {'tiene_gatos': True, 'preferencias_especie': ['GATO'], 'preferencias_sexo': ['HEMBRA'],
+             'preferencias_edad': ['0', '1_2'], 'preferencias_estado_basico': ['VACUNADO', 'MICROCHIP'],
+             'acepta_condicion_especial': True, 'codigo_postal': '17300'},
+            {'tiene_otros_animales': True, 'es_primerizo': False,
+             'preferencias_convivencia': ['NINOS', 'GATOS'], 'preferencias_estado_basico': ['ESTERILIZADO']},
+        ]
+        cls.usuaris = []
+        for i, perfil in enumerate(perfils):
+            usuari = Usuario.objects.create_user(
+                username=f'usuari{i}', email=f'usuari{i}@test.com', password='test1234',
+            )
+            for camp, valor in perfil.items():
+                setattr(usuari.perfil_usuario, camp, valor)
+            usuari.perfil_usuario.save()
+            cls.usuaris.append(usuari)
+
+        # Historial de swipes (preferències implícites + popularitat)
+        for usuari in cls.usuaris[1:]:
+            for mascota in rng.sample(cls.mascotes, 15):
+                Interaccion.objects.create(
+                    usuario=usuari, mascota=mascota,
+                    accion=rng.choice(['like', 'like', 'dislike']),
+                )
+
+    def assertMateixRanquing(self, usuari, limit):
+        iteratiu = obtenir_recomanacions_ia_iteratiu(usuari, limit=limit)
+        vectoritzat = obtenir_recomanacions_ia(usuari, limit=limit)
+        self.assertEqual(
+            [(r['mascota'].id, r['score'], r['score_explicites'], r['score_implicites']) for r in iteratiu],
+            [(r['mascota'].id, r['score'], r['score_explicites'], r['score_implicites']) for r in vectoritzat],
+        )
+
+    def test_mateix_ranquing_complet(self):
+        for usuari in self.usuaris:
+            with self.subTest(usuari=usuari.username):
+                self.assertMateixRanquing(usuari, limit=len(self.mascotes))
+
+    def test_mateix_top_5(self):
+        for usuari in self.usuaris:
+            with self.subTest(usuari=usuari.username):
+                self.assertMateixRanquing(usuari, limit=5)
+
+    def test_exclou_mascotes_incompatibles(self):
+        usuari = self.usuaris[1]  # té nens i és primerizo
+        ids = {r['mascota'].id for r in obtenir_recomanacions_ia(usuari, limit=len(self.mascotes))}
+        incompatibles = Mascota.objects.filter(apto_ninos='NO_APTO_NINOS').values_list('id', flat=True)
+        self.assertFalse(ids & set(incompatibles))
+
+    def test_sense_mascotes_disponibles(self):
+        Mascota.objects.update(oculto=True)
+        self.assertEqual(obtenir_recomanacions_ia(self.usuaris[1]), [])
+
+
+def files_sintetiques(n, seed=0):
+    """Genera `n` files de `CAMPS_CATALEG` sense tocar la BD (catàleg sintètic)."""
+    rng = random.Random(seed)
+    apto_con = _opcions(Mascota.APTO_CON_CHOICES)
+    estado = _opcions(Mascota.ESTADO_LEGAL_SALUD_CHOICES)
+    for mascota_id in range(1, n + 1):
+        especie = rng.choice(['PERRO', 'GATO'])
+        yield (
+            mascota_id,
+            especie,
+            rng.choice(_opcions(Mascota.TAMANO_CHOICES)),
+            rng.choice(_opcions(Mascota.EDAD_CHOICES)),
+            rng.choice(_opcions(Mascota.GENERO_CHOICES)),
+            rng.choice(_opcions(Mascota.NINOS_CHOICES)),
+            rng.choice(_opcions(Mascota.COMPANIA_ANIMAL_CHOICES)),
+            rng.choice(_opcions(Mascota.NIVEL_EXPERIENCIA_CHOICES)),
+            mascares.mascara(mascares.bits('apto_con'), rng.sample(apto_con, rng.randint(0, 3))),
+            mascares.mascara(mascares.bits('estado_legal_salud'), rng.sample(estado, rng.randint(0, 4))),
+            mascares.mascara(
+                mascares.bits('condicion_especial_gato'),
+                ['DIABETES'] if especie == 'GATO' and rng.random() < 0.1 else [],
+            ),
+            mascares.mascara(
+                mascares.bits('condicion_especial_perro'),
+                ['ANSIEDAD_SEPARACION'] if especie == 'PERRO' and rng.random() < 0.1 else [],
+            ),
+            rng.randint(0, 10),
+            rng.choice(['08001', '17001', '25001', None]),
+        )
+
+
+class SeleccioStreamingTests(TestCase):
+    """Top-k per blocs amb heap: mateix resultat i memòria acotada."""
+
+    PREF_EXPLICITES = {
+        'tiene_ninos': True, 'es_primerizo': False, 'tiene_perros': True,
+        'especie': ['PERRO'], 'tamano': ['GRANDE'], 'convivencia': ['NINOS'],
+        'estado_salud': ['VACUNADO'], 'codigo_postal': '08010',
+    }
+    PREF_IMPLICITES = {
+        'total_likes': 4, 'especie': {'PERRO': 3, 'GATO': 1}, 'tamano': {'GRANDE': 2},
+        'edad_clasificacion': {'ADULTO': 4}, 'sexo': {'MACHO': 1}, 'convivencia': {'NINOS': 2},
+        'estado_salud': {},
+    }
+
+    def seleccionar(self, files, limit, mida_bloc):
+        return motor_recomanacio.seleccionar_top_streaming(
+            files, self.PREF_EXPLICITES, self.PREF_IMPLICITES, '08010', limit=limit, mida_bloc=mida_bloc,
+        )
+
+    def test_mateix_resultat_que_el_cataleg_sencer(self):
+        files = list(files_sintetiques(3000, seed=5))
+        cataleg = motor_recomanacio.codificar_cataleg(files)
+        scores = motor_recomanacio.puntuar_cataleg(cataleg, self.PREF_EXPLICITES, self.PREF_IMPLICITES, '08010')
+        for limit in (1, 5, 50, 3000):
+            esperat = motor_recomanacio.seleccionar_top(cataleg, *scores, limit=limit)
+            for mida_bloc in (7, 256, 5000):
+                with self.subTest(limit=limit, mida_bloc=mida_bloc):
+                    self.assertEqual(self.seleccionar(iter(files), limit, mida_bloc), esperat)
+
+    def test_cataleg_buit(self):
+        self.assertEqual(self.seleccionar(iter([]), 5, 100), [])
+
+    def pic_memoria(self, n):
+        tracemalloc.start()
+        try:
+            self.seleccionar(files_sintetiques(n), limit=10, mida_bloc=motor_recomanacio.MIDA_BLOC)
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    def test_memoria_constant_amb_200k_mascotes(self):
+        pic_petit = self.pic_memoria(20_000)
+        pic_gran = self.pic_memoria(200_000)
+        # 10x més mascotes no ha de fer créixer el pic (marge per soroll de l'allocator)
+        self.assertLess(pic_gran, pic_petit * 1.25 + 256 * 1024)
+        self.assertLess(pic_gran, 8 * 1024 * 1024)
+
+
+class CompatibilitatSQLTests(TestCase):
+    """El pre-filtre SQL ha d'excloure exactament les mateixes mascotes que la FASE 1 en Python."""
+
+    SITUACIO = ('tiene_ninos', 'tiene_perros', 'tiene_gatos', 'tiene_otros_animales',
+                'es_primerizo', 'tiene_licencia_ppp')
+
+    @classmethod
+    def setUpTestData(cls):
+        protectora = Usuario.objects.create_user(
+            username='protectora', email='protectora@test.com', password='test1234', role='protectora',
+        )
+        cls.usuari = Usuario.objects.create_user(username='usuari', email='usuari@test.com', password='test1234')
+        # Una mascota per a cada combinació de les tres característiques de compatibilitat
+        for apto_ninos, compania, experiencia in itertools.product(
+            _opcions(Mascota.NINOS_CHOICES),
+            _opcions(Mascota.COMPANIA_ANIMAL_CHOICES),
+            _opcions(Mascota.NIVEL_EXPERIENCIA_CHOICES),
+        ):
+            Mascota.objects.create(
+                nombre='Combi', especie='GATO', raza_gato='EUROPEO', foto='mascotas/test.jpg',
+                protectora=protectora, apto_ninos=apto_ninos,
+                necesita_compania_animal=compania, nivel_experiencia=experiencia,
+            )
+
+    def test_totes_les_situacions(self):
+        mascotes = list(Mascota.objects.all())
+        for valors in itertools.product([False, True], repeat=len(self.SITUACIO)):
+            perfil = self.usuari.perfil_usuario
+            for camp, valor in zip(self.SITUACIO, valors):
+                setattr(perfil, camp, valor)
+            perfil.save()
+            pref_explicites = obtenir_preferencies_explicites(Usuario.objects.get(pk=self.usuari.pk))
+
+            with self.subTest(**dict(zip(self.SITUACIO, valors))):
+                compatibles_python = {
+                    m.id for m in mascotes
+                    if calcular_score_preferencies_explicites(m, pref_explicites) != -1
+                }
+                compatibles_sql = set(
+                    Mascota.objects.compatibles_con(perfil).values_list('id', flat=True)
+                )
+                self.assertEqual(compatibles_sql, compatibles_python)
+                self.assertEqual(
+                    set(Mascota.objects.compatibles_con(pref_explicites).values_list('id', flat=True)),
+                    compatibles_python,
+                )
+
+    def test_sense_perfil_no_filtra(self):
+        self.assertEqual(Mascota.objects.compatibles_con(None).count(), Mascota.objects.count())
+
+
+class CacheRecomanacionsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        rng = random.Random(99)
+        cls.protectora = Usuario.objects.create_user(
+            username='protectora', email='protectora@test.com', password='test1234', role='protectora',
+        )
+        cls.usuari = Usuario.objects.create_user(username='usuari', email='usuari@test.com', password='test1234')
+        cls.mascotes = [crear_mascota_aleatoria(rng, cls.protectora) for _ in range(12)]
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuari)
+
+    def recomanar(self, limit=3):
+        resposta = self.client.get(f'/api/ia/recomendacion/?limit={limit}')
+        self.assertEqual(resposta['X-Cache'], resposta.data['cache'].upper())
+        return resposta.data['cache'], [r['id'] for r in resposta.data['recomendaciones']]
+
+    def test_segona_peticio_es_hit(self):
+        estat, ids = self.recomanar()
+        self.assertEqual(estat, 'miss')
+        self.assertEqual(self.recomanar(), ('hit', ids))
+        self.assertEqual(cache_recomanacions.estadistiques()['hits'], 1)
+        self.assertEqual(cache_recomanacions.estadistiques()['misses'], 1)
+
+    def test_hit_igual_que_calcul_directe(self):
+        self.recomanar(limit=5)
+        _, ids = self.recomanar(limit=5)
+        self.assertEqual(ids, [r['mascota'].id for r in obtenir_recomanacions_ia(self.usuari, limit=5)])
+
+    def test_dislike_treu_la_mascota_sense_recalcular(self):
+        _, ids = self.recomanar()
+        self.client.post('/api/petmatch/action/', {'mascota_id': ids[0], 'action': 'dislike'}, format='json')
+        estat, nous = self.recomanar()
+        self.assertEqual(estat, 'hit')
+        self.assertNotIn(ids[0], nous)
+        self.assertEqual(nous[:2], ids[1:])
+
+    def test_like_invalida(self):
+        _, ids = self.recomanar()
+        self.client.post('/api/petmatch/action/', {'mascota_id': ids[0], 'action': 'like'}, format='json')
+        estat, nous = self.recomanar()
+        self.assertEqual(estat, 'miss')
+        self.assertNotIn(ids[0], nous)
+
+    def test_like_que_passa_a_dislike_invalida(self):
+        _, ids = self.recomanar()
+        for i, (ruta, cos) in enumerate([
+            ('/api/petmatch/action/', lambda accio: {'mascota_id': ids[0], 'action': accio}),
+            ('/api/petmatch/action/bulk/', lambda accio: {'swipes': [{'mascota_id': ids[1], 'action': accio}]}),
+        ]):
+            with self.subTest(ruta=ruta):
+                self.client.post(ruta, cos('like'), format='json')
+                self.recomanar()
+                RecomendacionPrecalculada.objects.create(
+                    usuario=self.usuari, ranquing=[[ids[2], 1.0, 1.0, 0.0]], fecha_calculo=timezone.now(),
+                )
+                # El like surt de l'histograma implícit: el rànquing s'ha de tornar a puntuar
+                self.client.post(ruta, cos('dislike'), format='json')
+                self.assertEqual(self.recomanar()[0], 'miss')
+                self.assertFalse(RecomendacionPrecalculada.objects.filter(usuario=self.usuari).exists())
+
+    def test_editar_perfil_invalida(self):
+        self.recomanar()
+        perfil = self.usuari.perfil_usuario
+        perfil.preferencias_especie = ['GATO']
+        perfil.save()
+        self.assertEqual(self.recomanar()[0], 'miss')
+
+    def test_canvis_del_cataleg_invaliden(self):
+        _, ids = self.recomanar()
+        mascota = Mascota.objects.get(pk=ids[0])
+        mascota.adoptado = True
+        mascota.save()
+        estat, nous = self.recomanar()
+        self.assertEqual(estat, 'miss')
+        self.assertNotIn(ids[0], nous)
+
+        self.recomanar()
+        crear_mascota_aleatoria(random.Random(1), self.protectora)
+        self.assertEqual(self.recomanar()[0], 'miss')
+
+    def test_limit_mes_gran_que_la_cache_recalcula(self):
+        with self.settings(RECOMANACIONS_CACHE_MIDA=3):
+            self.recomanar(limit=3)
+            self.assertEqual(self.recomanar(limit=5)[0], 'miss')
+            self.assertEqual(self.recomanar(limit=5)[0], 'hit')
+
+
+class PrecalculTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        rng = random.Random(7)
+        cls.protectora = Usuario.objects.create_user(
+            username='protectora', email='protectora@test.com', password='test1234', role='protectora',
+        )
+        cls.usuaris = [
+            Usuario.objects.create_user(username=f'usuari{i}', email=f'usuari{i}@test.com', password='test1234')
+            for i in range(4)
+        ]
+        cls.mascotes = [crear_mascota_aleatoria(rng, cls.protectora) for _ in range(15)]
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuaris[0])
+
+    def precalcular(self, **opcions):
+        sortida = StringIO()
+        call_command('precompute_recommendations', workers=1, top=10, stdout=sortida, **opcions)
+        return sortida.getvalue()
+
+    def recomanar(self, limit=3):
+        resposta = self.client.get(f'/api/ia/recomendacion/?limit={limit}')
+        return resposta.data['cache'], [r['id'] for r in resposta.data['recomendaciones']]
+
+    def test_desa_el_top_de_cada_usuari_actiu(self):
+        self.assertIn('usuaris/s', self.precalcular())
+        self.assertEqual(
+            set(RecomendacionPrecalculada.objects.values_list('usuario_id', flat=True)),
+            {u.pk for u in self.usuaris},
+        )
+        fila = RecomendacionPrecalculada.objects.get(usuario=self.usuaris[1])
+        self.assertEqual([tuple(f) for f in fila.ranquing], calcular_ranquing_ia(self.usuaris[1], limit=10))
+        self.assertEqual(fila.completo, len(fila.ranquing) < 10)
+
+    def test_rang_d_ids(self):
+        ids = sorted(u.pk for u in self.usuaris)
+        self.precalcular(id_min=ids[1], id_max=ids[2])
+        self.assertEqual(
+            sorted(RecomendacionPrecalculada.objects.values_list('usuario_id', flat=True)), ids[1:3],
+        )
+
+    def test_la_vista_serveix_el_precalculat(self):
+        self.precalcular()
+        estat, ids = self.recomanar()
+        self.assertEqual(estat, 'precalculat')
+        self.assertEqual(ids, [r[0] for r in calcular_ranquing_ia(self.usuaris[0], limit=3)])
+        self.assertEqual(self.recomanar()[0], 'hit')
+
+    def test_dislike_es_filtra_sense_invalidar(self):
+        self.precalcular()
+        primer = RecomendacionPrecalculada.objects.get(usuario=self.usuaris[0]).ranquing[0][0]
+        self.client.post('/api/petmatch/action/', {'mascota_id': primer, 'action': 'dislike'}, format='json')
+        estat, ids = self.recomanar()
+        self.assertEqual(estat, 'precalculat')
+        self.assertNotIn(primer, ids)
+
+    def test_like_i_canvis_al_cataleg_el_fan_caducar(self):
+        self.precalcular()
+        primer = RecomendacionPrecalculada.objects.get(usuario=self.usuaris[0]).ranquing[0][0]
+        self.client.post('/api/petmatch/action/', {'mascota_id': primer, 'action': 'like'}, format='json')
+        self.assertFalse(RecomendacionPrecalculada.objects.filter(usuario=self.usuaris[0]).exists())
+
+        self.precalcular()
+        cache.clear()
+        ranquing = [mascota_id for mascota_id, *_ in RecomendacionPrecalculada.objects.get(usuario=self.usuaris[0]).ranquing]
+        Mascota.objects.get(pk=ranquing[0]).save()
+        self.assertEqual(self.recomanar()[0], 'miss')
+
+    def test_mascota_nova_el_fa_caducar(self):
+        self.precalcular()
+        ranquing = [mascota_id for mascota_id, *_ in RecomendacionPrecalculada.objects.get(usuario=self.usuaris[0]).ranquing]
+        altra = next(m for m in self.mascotes if m.pk not in ranquing)
+        altra.nombre = 'Editada'
+        altra.save()
+        self.assertEqual(self.recomanar()[0], 'precalculat')
+
+        cache.clear()
+        crear_mascota_aleatoria(random.Random(3), self.protectora)
+        self.assertEqual(self.recomanar()[0], 'miss')
+
+    def test_caducat_per_ttl(self):
+        self.precalcular()
+        RecomendacionPrecalculada.objects.update(
+            fecha_calculo=RecomendacionPrecalculada.objects.get(usuario=self.usuaris[0]).fecha_calculo
+            - timedelta(days=2)
+        )
+        self.assertEqual(self.recomanar()[0], 'miss')
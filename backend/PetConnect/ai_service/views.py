@@ -10,7 +10,9 @@ from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from nltk.tokenize import RegexpTokenizer
 from .chatbot_faq import FAQ_BOT
-from mascotas.models import Mascota, Interaccion 
+from . import cache_recomanacions, motor_recomanacio, precalcul
+from mascotas.models import Mascota
+from mascotas import preferencias, serialitzacio_rapida
 
 # --- Lógica de Ayuda Global y Carga de Dataset (IA 3: El Entrenamiento) ---
 
@@ -455,59 +457,12 @@ def obtenir_preferencies_explicites(usuario):
 
 def obtenir_preferencies_implicites(usuario):
     """
-    Analitza els likes anteriors de l'usuari per inferir preferències implícites.
-    Retorna None si l'usuari no té likes.
+    Preferències implícites inferides dels likes anteriors de l'usuari.
+    Es llegeixen de l'histograma persistit (mascotas.preferencias), que es
+    manté incrementalment a cada swipe: una sola consulta, no depèn del
+    nombre de likes. Retorna None si l'usuari no té likes.
     """
-    likes = Interaccion.objects.filter(
-        usuario=usuario, 
-        accion='like'
-    ).select_related('mascota')
-    
-    if not likes.exists():
-        return None
-    
-    preferencies = {
-        'especie': {},
-        'tamano': {},
-        'edad_clasificacion': {},
-        'sexo': {},
-        'convivencia': {},
-        'estado_salud': {},
-        'total_likes': likes.count()
-    }
-    
-    for interaccion in likes:
-        mascota = interaccion.mascota
-        
-        # Espècie
-        esp = mascota.especie or 'DESCONOCIDO'
-        preferencies['especie'][esp] = preferencies['especie'].get(esp, 0) + 1
-        
-        # Tamany
-        tam = getattr(mascota, 'tamano', None) or 'DESCONOCIDO'
-        preferencies['tamano'][tam] = preferencies['tamano'].get(tam, 0) + 1
-        
-        # Edat (classificació)
-        edad_cls = getattr(mascota, 'edad_clasificacion', None) or 'DESCONOCIDO'
-        preferencies['edad_clasificacion'][edad_cls] = preferencies['edad_clasificacion'].get(edad_cls, 0) + 1
-        
-        # Sexe/Gènere
-        sexo = mascota.genero or 'DESCONOCIDO'
-        preferencies['sexo'][sexo] = preferencies['sexo'].get(sexo, 0) + 1
-        
-        # Convivència (apto_con)
-        apto_con = getattr(mascota, 'apto_con', None)
-        if apto_con:
-            for apt in apto_con:
-                preferencies['convivencia'][apt] = preferencies['convivencia'].get(apt, 0) + 1
-        
-        # Estat de salut
-        estado = getattr(mascota, 'estado_legal_salud', None)
-        if estado:
-            for est in estado:
-                preferencies['estado_salud'][est] = preferencies['estado_salud'].get(est, 0) + 1
-    
-    return preferencies
+    return preferencias.preferencies_implicites(usuario)
 
 
 def calcular_score_preferencies_explicites(mascota, pref_explicites):
@@ -699,9 +654,12 @@ def calcular_score_preferencies_implicites(mascota, pref_implicites):
     return score / total_weight if total_weight > 0 else 0.0
 
 
-def obtenir_recomanacions_ia(usuario, limit=5):
+def obtenir_recomanacions_ia_iteratiu(usuario, limit=5):
     """
-    IA 2: Motor de recomanació HÍBRID.
+    IA 2: Motor de recomanació HÍBRID (versió iterativa, mascota a mascota).
+
+    Es manté com a referència per als tests de paritat i el benchmark del
+    motor vectoritzat (`obtenir_recomanacions_ia`).
     
     Combina:
     - 60% preferències explícites (PerfilUsuario)
@@ -713,18 +671,11 @@ def obtenir_recomanacions_ia(usuario, limit=5):
     """
     from mascotas.serializers import MascotaSerializer
     
-    # Obtenir IDs de mascotes ja vistes
-    mascotas_vistas_ids = Interaccion.objects.filter(
-        usuario=usuario
-    ).values_list('mascota_id', flat=True)
-    
-    # Mascotes disponibles
+    # Mascotes disponibles (sense les ja vistes)
     mascotas_disponibles = Mascota.objects.filter(
         adoptado=False,
         oculto=False
-    ).exclude(
-        id__in=mascotas_vistas_ids
-    )
+    ).no_vistes_per(usuario)
     
     if not mascotas_disponibles.exists():
         return []
@@ -766,11 +717,8 @@ def obtenir_recomanacions_ia(usuario, limit=5):
         
         score_base = (weight_explicites * score_explicites) + (weight_implicites * score_implicites)
         
-        # Bonus per popularitat (nombre de likes globals de la mascota)
-        total_likes_mascota = Interaccion.objects.filter(
-            mascota=mascota, 
-            accion='like'
-        ).count()
+        # Bonus per popularitat (comptador desnormalitzat de likes globals)
+        total_likes_mascota = mascota.total_likes
         popularity_bonus = min(0.1, total_likes_mascota * 0.02)  # Max 10%
         
         # Bonus per proximitat geogràfica (codi postal)
@@ -811,6 +759,91 @@ def obtenir_recomanacions_ia(usuario, limit=5):
     return mascotas_con_score[:limit]
 
 
+def calcular_ranquing_ia(usuario, limit=5):
+    """
+    IA 2: Motor de recomanació HÍBRID (versió vectoritzada).
+
+    Mateixes regles i mateix rànquing que `obtenir_recomanacions_ia_iteratiu`,
+    però el catàleg es llegeix per blocs, cada bloc es codifica com a matriu
+    numèrica i es puntua amb NumPy, i només es manté un heap amb els `limit`
+    millors (vegeu `ai_service.motor_recomanacio`).
+
+    Retorna una llista de tuples (mascota_id, score, score_explicites, score_implicites).
+    """
+    # Obtenir preferències
+    pref_explicites = obtenir_preferencies_explicites(usuario)
+
+    # Mascotes disponibles, no vistes i compatibles (les exclusions forçoses es fan a la BD)
+    mascotas_disponibles = Mascota.objects.filter(
+        adoptado=False,
+        oculto=False
+    ).no_vistes_per(usuario).compatibles_con(pref_explicites)
+
+    pref_implicites = obtenir_preferencies_implicites(usuario)
+    codigo_postal_usuario = pref_explicites.get('codigo_postal') if pref_explicites else None
+
+    # Els candidats es llegeixen i puntuen per blocs; només es guarden els `limit` millors
+    files = mascotas_disponibles.values_list(*motor_recomanacio.CAMPS_CATALEG).iterator(
+        chunk_size=motor_recomanacio.MIDA_BLOC
+    )
+    return motor_recomanacio.seleccionar_top_streaming(
+        files, pref_explicites, pref_implicites, codigo_postal_usuario, limit=limit,
+    )
+
+
+def hidratar_recomanacions(ranquing, files=False):
+    """
+    Converteix un rànquing d'ids en el format de `obtenir_recomanacions_ia` (amb
+    instàncies de Mascota, o files de `serialitzacio_rapida.files` amb `files`).
+    """
+    visibles = Mascota.objects.filter(adoptado=False, oculto=False)
+    ids = [mascota_id for mascota_id, *_ in ranquing]
+    if files:
+        mascotes = {fila['id']: fila for fila in serialitzacio_rapida.files(visibles.filter(pk__in=ids))}
+    else:
+        mascotes = visibles.per_serialitzar().in_bulk(ids)
+    return [
+        {
+            'mascota': mascotes[mascota_id],
+            'score': score,
+            'score_explicites': score_explicites,
+            'score_implicites': score_implicites,
+        }
+        for mascota_id, score, score_explicites, score_implicites in ranquing
+        if mascota_id in mascotes
+    ]
+
+
+def obtenir_recomanacions_ia(usuario, limit=5):
+    """IA 2: recomanacions híbrides per a l'usuari (vegeu `calcular_ranquing_ia`)."""
+    return hidratar_recomanacions(calcular_ranquing_ia(usuario, limit=limit))
+
+
+def obtenir_recomanacions_amb_cache(usuario, limit=5, files=False):
+    """
+    Com `obtenir_recomanacions_ia`, però reutilitza el rànquing cachejat de
+    l'usuari o el precalculat offline (`precompute_recommendations`).
+    Retorna (recomanacions, 'hit' | 'precalculat' | 'miss'). `files`: vegeu
+    `hidratar_recomanacions`.
+    """
+    ranquing = cache_recomanacions.llegir(usuario.pk, limit)
+    if ranquing is not None:
+        return hidratar_recomanacions(ranquing[:limit], files), 'hit'
+
+    precalculat = precalcul.llegir(usuario, limit)
+    if precalculat is not None:
+        ranquing, complet = precalculat
+        cache_recomanacions.desar(usuario.pk, ranquing, complet)
+        return hidratar_recomanacions(ranquing[:limit], files), 'precalculat'
+
+    # Es calcula i es desa un rànquing més llarg del demanat perquè la
+    # entrada sobrevisqui a uns quants swipes (vegeu cache_recomanacions.treure_mascota)
+    mida = max(limit, cache_recomanacions.mida_ranquing())
+    ranquing = calcular_ranquing_ia(usuario, limit=mida)
+    cache_recomanacions.desar(usuario.pk, ranquing, len(ranquing) < mida)
+    return hidratar_recomanacions(ranquing[:limit], files), 'miss'
+
+
 # --- VISTAS API ---
 
 class GenerarBioIAView(APIView):
@@ -872,25 +905,33 @@ class RecomendacionIAView(APIView):
     
     Query params opcionals:
     - limit: nombre màxim de recomanacions (default: 5)
+
+    El rànquing es cacheja per usuari (ai_service.cache_recomanacions); la
+    resposta indica 'cache': 'hit' | 'precalculat' | 'miss' (i la capçalera
+    X-Cache). 'precalculat' vol dir que s'ha servit el top-N calculat offline.
     """
     permission_classes = [IsAuthenticated]
     
     def get(self, request, *args, **kwargs):
-        from mascotas.serializers import MascotaSerializer
+        from mascotas.serializers import serializer_per_vista
         
         usuario = request.user
         limit = int(request.query_params.get('limit', 5))
+        rapida = serialitzacio_rapida.activa(request)
         
-        # Obtenir recomanacions
-        recomanacions = obtenir_recomanacions_ia(usuario, limit=limit)
+        # Obtenir recomanacions (rànquing cachejat per usuari)
+        recomanacions, estat_cache = obtenir_recomanacions_amb_cache(usuario, limit=limit, files=rapida)
         
         if recomanacions:
+            if rapida:
+                dades_mascotes = serialitzacio_rapida.serialitzar([rec['mascota'] for rec in recomanacions], request)
+            else:
+                dades_mascotes = [
+                    serializer_per_vista(request)(rec['mascota'], context={'request': request}).data
+                    for rec in recomanacions
+                ]
             resultado = []
-            for rec in recomanacions:
-                mascota_data = MascotaSerializer(
-                    rec['mascota'], 
-                    context={'request': request}
-                ).data
+            for rec, mascota_data in zip(recomanacions, dades_mascotes):
                 mascota_data['recomendacion_score'] = rec['score']
                 mascota_data['match_percentage'] = int(rec['score'] * 100)
                 mascota_data['score_preferencias'] = rec['score_explicites']
@@ -900,14 +941,16 @@ class RecomendacionIAView(APIView):
             return Response({
                 'recomendaciones': resultado,
                 'total': len(resultado),
+                'cache': estat_cache,
                 'mensaje': f'Hem trobat {len(resultado)} mascotes que podrien interessar-te!'
-            }, status=status.HTTP_200_OK)
+            }, status=status.HTTP_200_OK, headers={'X-Cache': estat_cache.upper()})
         else:
             return Response({
                 'recomendaciones': [],
                 'total': 0,
+                'cache': estat_cache,
                 'mensaje': 'No hi ha més mascotes disponibles. Has revisat totes!'
-            }, status=status.HTTP_200_OK)
+            }, status=status.HTTP_200_OK, headers={'X-Cache': estat_cache.upper()})
 
 
 class DebugKeysIAView(APIView):
@@ -1,6 +1,23 @@
 from django.contrib import admin
-from .models import Mascota, Interaccion
+from .models import (
+    Mascota, Interaccion, PreferenciaImplicita, RecomendacionPrecalculada, Baraja, SwipePendiente, camps_edicio,
+)
+
+
+class MascotaAdmin(admin.ModelAdmin):
+
+    def save_model(self, request, obj, form, change):
+        # Edicions: només els camps del formulari que han canviat, sense els comptadors de popularitat
+        if change:
+            obj.save(update_fields=camps_edicio(form.changed_data))
+        else:
+            obj.save()
+
 
 # Registra los modelos 
-admin.site.register(Mascota)
-admin.site.register(Interaccion)
\ No newline at end of file
+admin.site.register(Mascota, MascotaAdmin)
+admin.site.register(Interaccion)
+admin.site.register(PreferenciaImplicita)
+admin.site.register(RecomendacionPrecalculada)
+admin.site.register(Baraja)
+admin.site.register(SwipePendiente)
@@ -0,0 +1,214 @@
+"""
+Baralla persistent per usuari per al feed de swipe (substitueix `order_by('?')`).
+
+Cada usuari té una finestra de fins a `MIDA_BARAJA` ids de mascotes
+elegibles, barrejats un cop en construir-la, i un cursor. La carta actual és
+la primera carta viva des del cursor: no es mou fins que l'usuari la
+swipeja, així que tots els dispositius veuen la mateixa carta.
+
+- Les mascotes adoptades, ocultes o ja swipejades es salten (i el cursor hi
+  passa per sobre).
+- Les mascotes noves (id > `ultima_mascota_id`) es barregen a posicions
+  aleatòries de la resta de la baralla la propera vegada que es llegeix.
+- Quan no queden prou cartes vives, la finestra s'amplia amb una nova mostra
+  aleatòria (sense repetir les cartes que encara hi són).
+- Les mostres són uniformes i es prenen a la BD sense llegir tots els ids
+  elegibles: se sortegen ids del rang de claus primàries i uns quants
+  sondejos (`id IN (...)`) comproven quins són elegibles. El cost no creix
+  amb el catàleg.
+- El feed filtrat (`?compatibles=1`) fa servir la mateixa baralla i hi desa
+  les mascotes noves i les ampliacions, però no n'avança el cursor: la
+  baralla sempre es construeix i s'amplia amb totes les mascotes elegibles,
+  i el filtre només s'aplica en triar les cartes. Així l'ordre és el mateix
+  entre peticions i dispositius, i les cartes filtrades continuen vives per
+  al feed sense filtre.
+
+Per demanar cartes per lots, el client rep un cursor opac
+(`codificar_cursor`) que apunta a l'última carta rebuda: el lot següent
+comença després d'aquesta carta encara que no s'hagi swipejat.
+"""
+import base64
+import binascii
+import json
+import random
+
+from django.db.models import Max, Min
+
+from .models import Mascota, Baraja
+from . import serialitzacio_rapida
+
+
+MIDA_BARAJA = 200
+# Ids sortejats que comprova cada sondeig de `_mostra`
+MIDA_SONDEIG = 1000
+MAX_SONDEJOS = 8
+
+
+def _elegibles(usuario):
+    return Mascota.objects.filter(adoptado=False, oculto=False).no_vistes_per(usuario)
+
+
+def _mostra(candidates, excloure, rng):
+    """
+    Fins a `MIDA_BARAJA` ids de `candidates` (menys `excloure`): una mostra
+    uniforme, en ordre aleatori.
+
+    Se sortegen ids sense repetició de tot el rang de claus primàries i cada
+    sondeig comprova quins `MIDA_SONDEIG` d'aquests ids són candidats (cerques
+    a l'índex de clau primària). Tots els candidats tenen la mateixa
+    probabilitat de sortir, tinguin o no forats al davant. Si el rang és prou
+    petit, els sondejos el recorren sencer.
+
+    Si cap sondeig no troba cap candidat i el rang no s'ha recorregut sencer,
+    els candidats són escassos dins del rang: es trien amb `ORDER BY random()`,
+    que en aquest cas només ordena unes poques files.
+    """
+    limits = Mascota.objects.aggregate(minim=Min('id'), maxim=Max('id'))
+    if limits['maxim'] is None:
+        return []
+    disponibles = candidates.exclude(id__in=excloure) if excloure else candidates
+    rang = range(limits['minim'], limits['maxim'] + 1)
+    sortejats = rng.sample(rang, min(len(rang), MIDA_SONDEIG * MAX_SONDEJOS))
+    ids = []
+    for inici in range(0, len(sortejats), MIDA_SONDEIG):
+        sondeig = sortejats[inici:inici + MIDA_SONDEIG]
+        trobats = set(disponibles.filter(id__in=sondeig).order_by().values_list('id', flat=True))
+        # L'ordre del sorteig ja és aleatori
+        ids += [mascota_id for mascota_id in sondeig if mascota_id in trobats]
+        if len(ids) >= MIDA_BARAJA:
+            return ids[:MIDA_BARAJA]
+    if not ids and len(sortejats) < len(rang):
+        ids = list(disponibles.order_by('?').values_list('id', flat=True)[:MIDA_BARAJA])
+    return ids
+
+
+def _ultima_mascota_id():
+    return Mascota.objects.aggregate(ultima=Max('id'))['ultima'] or 0
+
+
+def construir(usuario, rng=random):
+    """(Re)construeix la baralla de l'usuari amb una mostra barrejada de mascotes elegibles."""
+    baraja, _ = Baraja.objects.update_or_create(
+        usuario=usuario,
+        defaults={
+            'cartas': _mostra(_elegibles(usuario), set(), rng),
+            'cursor': 0,
+            'ultima_mascota_id': _ultima_mascota_id(),
+        },
+    )
+    return baraja
+
+
+def _barrejar_noves(baraja, elegibles, rng):
+    """Insereix les mascotes noves (i no swipejades) en posicions aleatòries després de la carta actual."""
+    noves = list(
+        elegibles.filter(pk__gt=baraja.ultima_mascota_id).order_by('pk').values_list('pk', flat=True)[:MIDA_BARAJA]
+    )
+    if not noves:
+        return False
+    for mascota_id in noves:
+        inici = min(baraja.cursor + 1, len(baraja.cartas))
+        baraja.cartas.insert(rng.randint(inici, len(baraja.cartas)), mascota_id)
+    baraja.ultima_mascota_id = noves[-1]
+    return True
+
+
+def _ampliar(baraja, elegibles, rng):
+    """
+    Descarta les cartes ja consumides i afegeix una nova mostra al final.
+    Retorna False (sense tocar la baralla) si no hi ha cap mascota nova per afegir.
+    """
+    restants = baraja.cartas[baraja.cursor:]
+    nova = _mostra(elegibles, set(restants), rng)
+    if not nova:
+        return False
+    baraja.cartas = restants + nova
+    baraja.cursor = 0
+    baraja.ultima_mascota_id = max(baraja.ultima_mascota_id, _ultima_mascota_id())
+    return True
+
+
+def _posicions_vives(baraja, candidates):
+    """Posicions (des del cursor) de les cartes que són dins de `candidates`, en ordre de baralla."""
+    restants = baraja.cartas[baraja.cursor:]
+    if not restants:
+        return []
+    vives = set(candidates.filter(id__in=restants).values_list('id', flat=True))
+    return [
+        posicio for posicio, mascota_id in enumerate(restants, start=baraja.cursor)
+        if mascota_id in vives
+    ]
+
+
+def seguents_mascotes(usuario, count=1, despres_de=None, perfil_compatibles=None, rng=random, files=False):
+    """
+    Les `count` properes mascotes de la baralla de l'usuari (en ordre de
+    baralla, amb la protectora carregada). Pot retornar-ne menys si no en queden.
+
+    - `despres_de`: id de l'última carta que ja té el client (cursor del lot
+      anterior); si ja no és a la baralla, es comença per la carta actual.
+    - `files`: files de `serialitzacio_rapida.files` en lloc d'instàncies.
+    - `perfil_compatibles`: només mascotes compatibles amb la situació del
+      perfil (`MascotaQuerySet.compatibles_con`). El cursor de la baralla no
+      avança, així que les cartes filtrades continuen vives per al feed sense
+      filtre; les mascotes noves i les ampliacions sí que es desen.
+    """
+    elegibles = _elegibles(usuario)
+    filtrat = perfil_compatibles is not None
+    candidates = elegibles.compatibles_con(perfil_compatibles) if filtrat else elegibles
+
+    baraja = Baraja.objects.filter(usuario=usuario).first()
+    if baraja is None:
+        baraja = construir(usuario, rng=rng)
+        canviada = False
+    else:
+        canviada = _barrejar_noves(baraja, elegibles, rng)
+
+    for intent in range(2):
+        posicions = _posicions_vives(baraja, candidates)
+        if not filtrat and posicions and posicions[0] != baraja.cursor:
+            baraja.cursor = posicions[0]
+            canviada = True
+
+        inici = baraja.cursor
+        if despres_de in baraja.cartas[baraja.cursor:]:
+            inici = baraja.cartas.index(despres_de, baraja.cursor) + 1
+        seleccionades = [posicio for posicio in posicions if posicio >= inici][:count]
+
+        # L'ampliació sempre és amb totes les elegibles, també al feed filtrat
+        if len(seleccionades) == count or intent == 1 or not _ampliar(baraja, elegibles, rng):
+            break
+        canviada = True
+
+    if canviada:
+        baraja.save(update_fields=['cartas', 'cursor', 'ultima_mascota_id', 'fecha_actualizacion'])
+
+    ids = [baraja.cartas[posicio] for posicio in seleccionades]
+    if files:
+        mascotes = {fila['id']: fila for fila in serialitzacio_rapida.files(Mascota.objects.filter(pk__in=ids))}
+    else:
+        mascotes = Mascota.objects.per_serialitzar().in_bulk(ids)
+    return [mascotes[mascota_id] for mascota_id in ids if mascota_id in mascotes]
+
+
+def seguent_mascota(usuario, perfil_compatibles=None, rng=random):
+    """Mascota de la carta actual de l'usuari, o None si no en queda cap."""
+    mascotes = seguents_mascotes(usuario, 1, perfil_compatibles=perfil_compatibles, rng=rng)
+    return mascotes[0] if mascotes else None
+
+
+def codificar_cursor(mascota_id):
+    """Cursor opac que apunta a la carta `mascota_id` (l'última del lot retornat)."""
+    return base64.urlsafe_b64encode(json.dumps({'d': mascota_id}).encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    """Id de mascota d'un cursor de `codificar_cursor`. Llença ValueError si no és vàlid."""
+    try:
+        dades = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        mascota_id = dades['d']
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError, KeyError) as exc:
+        raise ValueError('Cursor no vàlid.') from exc
+    if not isinstance(mascota_id, int):
+        raise ValueError('Cursor no vàlid.')
+    return mascota_id
@@ -0,0 +1,120 @@
+"""
+Utilitats compartides pels benchmarks (comandes `benchmark_*`).
+"""
+import statistics
+import subprocess
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+def commit_actual():
+    """Hash curt del commit actual (per a les metadades dels informes), o None."""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+            cwd=settings.BASE_DIR,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def host_client():
+    """Host acceptat per ALLOWED_HOSTS per a les peticions del client de proves."""
+    hosts = [h for h in settings.ALLOWED_HOSTS if h and not h.startswith('.')]
+    return 'localhost' if 'localhost' in hosts or '*' in hosts or not hosts else hosts[0]
+
+
+def percentil(valors, p):
+    """Percentil `p` (0-100) per interpolació lineal sobre valors ja mesurats."""
+    if not valors:
+        return 0.0
+    ordenats = sorted(valors)
+    k = (len(ordenats) - 1) * (p / 100)
+    inferior = int(k)
+    superior = min(inferior + 1, len(ordenats) - 1)
+    return ordenats[inferior] + (ordenats[superior] - ordenats[inferior]) * (k - inferior)
+
+
+def resum_temps(temps_ms):
+    """Resum estadístic d'una llista de temps en mil·lisegons."""
+    return {
+        'n': len(temps_ms),
+        'mitjana_ms': round(statistics.fmean(temps_ms), 3) if temps_ms else 0.0,
+        'p50_ms': round(percentil(temps_ms, 50), 3),
+        'p95_ms': round(percentil(temps_ms, 95), 3),
+        'p99_ms': round(percentil(temps_ms, 99), 3),
+        'max_ms': round(max(temps_ms), 3) if temps_ms else 0.0,
+    }
+
+
+def cronometrar(funcio, repeticions=5, escalfament=1):
+    """Executa `funcio` diverses vegades i retorna (últim resultat, temps en ms)."""
+    resultat = None
+    for _ in range(escalfament):
+        resultat = funcio()
+    temps_ms = []
+    for _ in range(repeticions):
+        inici = time.perf_counter()
+        resultat = funcio()
+        temps_ms.append((time.perf_counter() - inici) * 1000)
+    return resultat, temps_ms
+
+
+def mesurar_endpoint(client, metode, ruta, repeticions=20, escalfament=2, dades=None, preparar=None):
+    """
+    Mesura un endpoint amb el client de test de Django/DRF.
+
+    `ruta` i `dades` poden ser callables (reben el número d'iteració) per
+    variar la petició; `preparar(i)` s'executa abans de cada petició, fora
+    del cronòmetre. Retorna latències, consultes SQL per petició, pic de
+    memòria (tracemalloc, en una passada a part) i mida de la resposta.
+    """
+    def cridar(i):
+        return getattr(client, metode)(
+            ruta(i) if callable(ruta) else ruta,
+            dades(i) if callable(dades) else dades,
+            format='json',
+        )
+
+    i = 0
+    for _ in range(escalfament):
+        if preparar:
+            preparar(i)
+        cridar(i)
+        i += 1
+
+    temps_ms, consultes, estats = [], [], set()
+    resposta = None
+    for _ in range(repeticions):
+        if preparar:
+            preparar(i)
+        with CaptureQueriesContext(connection) as capturades:
+            inici = time.perf_counter()
+            resposta = cridar(i)
+            temps_ms.append((time.perf_counter() - inici) * 1000)
+        consultes.append(len(capturades.captured_queries))
+        estats.add(resposta.status_code)
+        i += 1
+
+    # El pic de memòria es mesura a part: tracemalloc alenteix molt les peticions
+    if preparar:
+        preparar(i)
+    tracemalloc.start()
+    try:
+        cridar(i)
+        pic = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        **resum_temps(temps_ms),
+        'consultes_min': min(consultes, default=0),
+        'consultes_max': max(consultes, default=0),
+        'pic_memoria_kb': round(pic / 1024, 1),
+        'bytes_resposta': len(resposta.content) if resposta is not None else 0,
+        'estats_http': sorted(estats),
+    }
@@ -0,0 +1,161 @@
+"""
+Cache de les respostes anònimes del catàleg públic (`/api/mascota/`).
+
+Es guarden les dades ja serialitzades (abans del renderer) del llistat i del
+detall per a peticions sense usuari, que veuen totes el mateix catàleg:
+- detall: `cataleg:detall:<id>`.
+- llistat: `cataleg:llistat:<generació>:<hash>`, amb el hash dels paràmetres
+  normalitzats (ordenats, sense buits ni `format`) i del host, que surt als
+  enllaços `next` / `previous`.
+
+Invalidació (receptors a `mascotas.signals`), sense buidar tota la cache:
+- Cada mascota té una versió, `cataleg:versio:<id>`, que s'incrementa (amb
+  `incr`, atòmic) quan la mascota canvia, i quan canvia el nom o la ciutat
+  de la seva protectora, que surten a les respostes. Cada entrada desada
+  porta les versions de les seves mascotes i en llegir-la es comparen amb
+  les actuals (un `get_many`): si alguna ha canviat, l'entrada ja no val.
+- Si el canvi pot moure mascotes entre pàgines (alta, baixa, ocultació,
+  adopció o un camp pel qual es filtra o es cerca), a més s'incrementa la
+  generació dels llistats i totes les pàgines anteriors deixen de valdre. Els
+  detalls de la resta de mascotes es mantenen.
+
+El detall llegeix la versió abans de calcular la resposta, així que una
+edició que arribi mentrestant la invalida. Les mascotes d'una pàgina només
+se saben després de calcular-la: el desfasament d'una edició que arribi
+mentre es calcula una pàgina, i el dels comptadors de popularitat
+(`total_likes`..., que s'actualitzen amb `update()` sense senyals), queda
+acotat per `CATALEG_CACHE_TTL`.
+
+Només fa servir get / set / add / incr, així que funciona igual amb
+LocMemCache i FileBasedCache.
+"""
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+PREFIX = 'cataleg'
+CLAU_GENERACIO = f'{PREFIX}:generacio_llistats'
+CLAUS_ESTADISTIQUES = {'hit': f'{PREFIX}:hits', 'miss': f'{PREFIX}:misses'}
+# No canvien les dades de la resposta (només com es renderitza)
+PARAMETRES_IGNORATS = {'format'}
+# Camps que decideixen si una mascota surt en un llistat, i on: canviar-los
+# pot moure mascotes entre pàgines. Dels de selecció múltiple es compara la
+# màscara (`Mascota.save()` l'omple abans del pre_save), que no depèn de l'ordre
+CAMPS_LLISTAT = (
+    'oculto', 'adoptado', 'fecha_creacion', 'nombre', 'especie', 'tamano', 'genero', 'edad',
+    'edad_clasificacion', 'raza_perro', 'raza_gato', 'apto_con_bits', 'estado_legal_salud_bits',
+)
+# Camps de la protectora que surten a les respostes (`protectora_nombre`, `protectora_ciudad`)
+CAMPS_PROTECTORA = ('username', 'city')
+
+
+def ttl():
+    return getattr(settings, 'CATALEG_CACHE_TTL', 300)
+
+
+def cachejable(request):
+    return request.method == 'GET' and not request.user.is_authenticated
+
+
+def _incrementar(clau, inicial=1):
+    try:
+        return cache.incr(clau)
+    except ValueError:
+        if cache.add(clau, inicial, timeout=None):
+            return inicial
+        return cache.incr(clau)
+
+
+def _versio_inicial():
+    # Una versió que la cache ha descartat i torna a aparèixer no recomença
+    # per un valor que una entrada desada abans pugui tenir apuntat
+    return time.time_ns()
+
+
+def generacio_llistats():
+    generacio = cache.get(CLAU_GENERACIO)
+    if generacio is None:
+        cache.add(CLAU_GENERACIO, 1, timeout=None)
+        generacio = cache.get(CLAU_GENERACIO, 1)
+    return generacio
+
+
+def clau_detall(mascota_id):
+    return f'{PREFIX}:detall:{mascota_id}'
+
+
+def clau_versio(mascota_id):
+    return f'{PREFIX}:versio:{mascota_id}'
+
+
+def versions(mascota_ids):
+    """Versió actual de cada mascota (`{id: versió}`); les que no en tenen encara se'n creen."""
+    claus = {clau_versio(mascota_id): mascota_id for mascota_id in mascota_ids}
+    valors = cache.get_many(claus)
+    if len(valors) < len(claus):
+        for clau in claus.keys() - valors.keys():
+            cache.add(clau, _versio_inicial(), timeout=None)
+        valors = cache.get_many(claus)
+    return {mascota_id: valors.get(clau) for clau, mascota_id in claus.items()}
+
+
+def clau_llistat(request):
+    parametres = sorted(
+        (nom, valor)
+        for nom in request.query_params
+        if nom not in PARAMETRES_IGNORATS
+        for valor in request.query_params.getlist(nom)
+        if valor
+    )
+    resum = hashlib.sha1(f'{request.get_host()}?{urlencode(parametres)}'.encode()).hexdigest()
+    return f'{PREFIX}:llistat:{generacio_llistats()}:{resum}'
+
+
+def llegir(clau):
+    """Dades desades a `clau`, o None (no hi són o alguna mascota ha canviat). Registra el hit / miss."""
+    entrada = cache.get(clau)
+    if entrada is not None:
+        actuals = cache.get_many([clau_versio(mascota_id) for mascota_id in entrada['versions']])
+        if any(actuals.get(clau_versio(mascota_id)) != versio for mascota_id, versio in entrada['versions'].items()):
+            entrada = None
+    registrar('miss' if entrada is None else 'hit')
+    return None if entrada is None else entrada['dades']
+
+
+def desar(clau, dades, versions_mascotes):
+    """Desa una resposta amb les versions (`versions`) de les mascotes que conté."""
+    cache.set(clau, {'dades': dades, 'versions': versions_mascotes}, timeout=ttl())
+
+
+def invalidar_mascota(mascota_id, canvia_llistats):
+    """
+    Invalida el detall i les pàgines que contenen la mascota; amb
+    `canvia_llistats`, també totes les pàgines de llistat.
+    """
+    _incrementar(clau_versio(mascota_id), inicial=_versio_inicial())
+    if canvia_llistats:
+        _incrementar(CLAU_GENERACIO)
+
+
+def invalidar_protectora(protectora_id):
+    """El nom i la ciutat de la protectora surten a les respostes de totes les seves mascotes."""
+    from .models import Mascota
+    for mascota_id in Mascota.objects.filter(protectora_id=protectora_id).values_list('pk', flat=True).iterator():
+        invalidar_mascota(mascota_id, canvia_llistats=False)
+
+
+def registrar(resultat):
+    _incrementar(CLAUS_ESTADISTIQUES[resultat])
+
+
+def estadistiques():
+    """Comptadors globals de hits / misses (i la taxa d'encert)."""
+    valors = cache.get_many(CLAUS_ESTADISTIQUES.values())
+    hits = valors.get(CLAUS_ESTADISTIQUES['hit'], 0)
+    misses = valors.get(CLAUS_ESTADISTIQUES['miss'], 0)
+    total = hits + misses
+    return {'hits': hits, 'misses': misses, 'taxa_encert': hits / total if total else 0.0}
@@ -65,4 +65,7 @@ ESTADO_LEGAL_SALUD_CHOICES = [
     ('ESTERILIZADO', 'Esterilizado/Castrado'),
     ('VACUNADO', 'Vacunado'),
     ('MICROCHIP', 'Identificado con Microchip'),
-]
\ No newline at end of file
+]
+
+# Rang de la clau primària de Mascota (BigAutoField): els ids de fora no poden existir
+MAX_PK = 2 ** 63 - 1
@@ -0,0 +1,292 @@
+"""
+Generador de dades sintètiques per a proves de càrrega.
+
+Tot es genera a partir d'un `random.Random(seed)`: amb la mateixa llavor i
+una BD buida el resultat és idèntic. Les files s'escriuen amb `bulk_create`
+per blocs, així que no es disparen els signals: els comptadors de
+popularitat i els histogrames implícits es reconstrueixen al final
+(`reconciliar_comptadors` / `preferencias.reconstruir_tots`).
+"""
+import itertools
+import random
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+
+from chat.models import Chat, Mensaje
+from mascotas.constants import EDAD_CHOICES, ESPECIE_CHOICES, SEXO_CHOICES, TAMANO_CHOICES
+from usuarios.models import Usuario, PerfilUsuario, PerfilProtectora
+from . import preferencias
+from .models import Mascota, Interaccion
+from .popularidad import reconciliar_comptadors
+
+
+NOMS = [
+    'Max', 'Luna', 'Toby', 'Rocky', 'Nala', 'Coco', 'Kira', 'Simba', 'Lola', 'Thor',
+    'Bruno', 'Mia', 'Leo', 'Nina', 'Zeus', 'Chispa', 'Canela', 'Lucas', 'Maya', 'Oreo',
+    'Pelusa', 'Misha', 'Bimba', 'Rufo', 'Sombra', 'Tara', 'Duna', 'Golfo', 'Kiara', 'Pipa',
+]
+
+# Codis postals de les quatre províncies catalanes (prefix de 2 dígits)
+PROVINCIES = ['08', '17', '25', '43']
+
+EDATS = {
+    '0': (0, 0), '1_2': (1, 2), '3_6': (3, 6), '7_10': (7, 10), '11_14': (11, 14), '15_MAS': (15, 18),
+}
+
+FRASES_XAT = [
+    'Hola! Encara està disponible?',
+    "M'agradaria conèixer-lo aquest cap de setmana.",
+    'Sí, encara busca família. Quan et va bé venir?',
+    'Com es porta amb altres animals?',
+    "És molt sociable, t'enviem més fotos.",
+    'Perfecte, gràcies!',
+]
+
+
+def _opcions(choices):
+    return [valor for valor, _ in choices]
+
+
+def _blocs(iterable, mida):
+    iterador = iter(iterable)
+    while True:
+        bloc = list(itertools.islice(iterador, mida))
+        if not bloc:
+            return
+        yield bloc
+
+
+def _escriure(model, objectes, chunk_size, dates=None):
+    """
+    `bulk_create` per blocs de `chunk_size` (una transacció per bloc). Retorna el nombre de files.
+
+    `dates` és un camp `auto_now_add`: bulk_create hi posa l'hora actual, així que
+    els valors generats es tornen a escriure amb un `bulk_update` del mateix bloc.
+    """
+    total = 0
+    for bloc in _blocs(objectes, chunk_size):
+        generades = [getattr(objecte, dates) for objecte in bloc] if dates else None
+        with transaction.atomic():
+            model.objects.bulk_create(bloc, batch_size=chunk_size)
+            if dates:
+                for objecte, data in zip(bloc, generades):
+                    setattr(objecte, dates, data)
+                model.objects.bulk_update(bloc, [dates], batch_size=chunk_size)
+        total += len(bloc)
+    return total
+
+
+def _codi_postal(rng):
+    return f'{rng.choice(PROVINCIES)}{rng.randint(0, 999):03d}'
+
+
+def _ids_usuaris(prefix, role):
+    return list(
+        Usuario.objects.filter(username__startswith=f'{prefix}_{role}_').order_by('pk').values_list('pk', flat=True)
+    )
+
+
+def crear_usuaris(rng, prefix, role, n, chunk_size):
+    """Crea `n` usuaris del rol indicat (amb el seu perfil) i en retorna els ids."""
+    # Hash calculat una sola vegada: és el pas més lent de crear un usuari
+    password = make_password(f'{prefix}-password')
+    _escriure(Usuario, (
+        Usuario(
+            username=f'{prefix}_{role}_{i}',
+            email=f'{prefix}_{role}_{i}@petconnect.test',
+            password=password,
+            role=role,
+            city=rng.choice(['Barcelona', 'Girona', 'Lleida', 'Tarragona']),
+        )
+        for i in range(n)
+    ), chunk_size)
+    ids = _ids_usuaris(prefix, role)
+
+    if role == 'protectora':
+        perfils = (
+            PerfilProtectora(usuario_id=usuario_id, codigo_postal_refugio=_codi_postal(rng))
+            for usuario_id in ids
+        )
+        _escriure(PerfilProtectora, perfils, chunk_size)
+    else:
+        _escriure(PerfilUsuario, (_perfil_usuari(rng, usuario_id) for usuario_id in ids), chunk_size)
+    return ids
+
+
+def _perfil_usuari(rng, usuario_id):
+    tiene_perros = rng.random() < 0.3
+    tiene_gatos = rng.random() < 0.25
+    return PerfilUsuario(
+        usuario_id=usuario_id,
+        tiene_ninos=rng.random() < 0.35,
+        tiene_perros=tiene_perros,
+        tiene_gatos=tiene_gatos,
+        tiene_otros_animales=rng.random() < 0.1,
+        es_primerizo=not (tiene_perros or tiene_gatos) and rng.random() < 0.7,
+        tiene_licencia_ppp=rng.random() < 0.05,
+        codigo_postal=_codi_postal(rng) if rng.random() < 0.8 else None,
+        preferencias_especie=rng.sample(_opcions(ESPECIE_CHOICES), rng.randint(0, 1)),
+        preferencias_tamano=rng.sample(_opcions(TAMANO_CHOICES), rng.randint(0, 2)),
+        preferencias_edad=rng.sample(_opcions(EDAD_CHOICES), rng.randint(0, 2)),
+        preferencias_sexo=rng.sample(_opcions(SEXO_CHOICES), rng.randint(0, 1)),
+        preferencias_estado_basico=rng.sample(_opcions(Mascota.ESTADO_LEGAL_SALUD_CHOICES), rng.randint(0, 2)),
+        acepta_condicion_especial=rng.random() < 0.3,
+    )
+
+
+def _mascota(rng, protectora_id, ara):
+    """Una mascota amb una combinació vàlida de choices (camps de l'espècie corresponent)."""
+    especie = rng.choice(['PERRO', 'PERRO', 'GATO'])
+    edad_clasificacion = rng.choice(_opcions(Mascota.EDAD_CHOICES))
+    adoptado = rng.random() < 0.1
+    fecha_creacion = ara - timedelta(minutes=rng.randint(0, 365 * 24 * 60))
+    dades = {
+        'nombre': rng.choice(NOMS),
+        'especie': especie,
+        'genero': rng.choice(_opcions(Mascota.GENERO_CHOICES)),
+        'tamano': rng.choice(_opcions(Mascota.TAMANO_CHOICES)),
+        'edad_clasificacion': edad_clasificacion,
+        'edad': rng.randint(*EDATS[edad_clasificacion]),
+        'apto_ninos': rng.choice(_opcions(Mascota.NINOS_CHOICES)),
+        'necesita_compania_animal': rng.choice(_opcions(Mascota.COMPANIA_ANIMAL_CHOICES)),
+        'nivel_experiencia': rng.choice(_opcions(Mascota.NIVEL_EXPERIENCIA_CHOICES)),
+        'apto_con': rng.sample(_opcions(Mascota.APTO_CON_CHOICES), rng.randint(0, 3)),
+        'estado_legal_salud': rng.sample(_opcions(Mascota.ESTADO_LEGAL_SALUD_CHOICES), rng.randint(0, 4)),
+        'oculto': rng.random() < 0.05,
+        'adoptado': adoptado,
+        'fecha_adopcion': (fecha_creacion + timedelta(days=rng.randint(1, 60))).date() if adoptado else None,
+        'fecha_creacion': fecha_creacion,
+        'protectora_id': protectora_id,
+    }
+    if especie == 'PERRO':
+        dades.update(
+            foto='mascotas/gos.jpg',
+            raza_perro=rng.choice(_opcions(Mascota.RAZAS_PERRO_CHOICES)),
+            color_pelaje_perro=rng.sample(_opcions(Mascota.COLOR_PELAJE_PERRO_CHOICES), rng.randint(1, 2)),
+            caracter_perro=rng.sample(_opcions(Mascota.CARACTER_MANEJO_CHOICES_PERRO), rng.randint(1, 4)),
+            condicion_especial_perro=rng.sample(
+                _opcions(Mascota.CONDICION_ESPECIAL_PERRO_CHOICES), 1 if rng.random() < 0.1 else 0
+            ),
+        )
+    else:
+        dades.update(
+            foto='mascotas/gat.jpg',
+            raza_gato=rng.choice(_opcions(Mascota.RAZAS_GATO_CHOICES)),
+            color_pelaje_gato=rng.sample(_opcions(Mascota.COLOR_PELAJE_GATO_CHOICES), rng.randint(1, 2)),
+            caracter_gato=rng.sample(_opcions(Mascota.CARACTER_CHOICES_GATO), rng.randint(1, 4)),
+            condicion_especial_gato=rng.sample(
+                _opcions(Mascota.CONDICION_ESPECIAL_GATO_CHOICES), 1 if rng.random() < 0.1 else 0
+            ),
+        )
+    return Mascota(**dades)
+
+
+def crear_mascotes(rng, protectores_ids, n, chunk_size, ara):
+    """Crea `n` mascotes repartides entre les protectores i en retorna els ids (amb la protectora)."""
+    maxim_anterior = Mascota.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+    _escriure(
+        Mascota, (_mascota(rng, rng.choice(protectores_ids), ara) for _ in range(n)), chunk_size,
+        dates='fecha_creacion',
+    )
+    return list(
+        Mascota.objects.filter(pk__gt=maxim_anterior).order_by('pk').values_list('pk', 'protectora_id')
+    )
+
+
+def crear_swipes(rng, usuaris_ids, mascotes_ids, total, chunk_size, ara, ratio_likes=0.35):
+    """
+    Reparteix `total` swipes entre els usuaris (sense repetir mascota per usuari).
+    Retorna (swipes escrits, parelles (usuario_id, mascota_id) que són like).
+    """
+    if not usuaris_ids or not mascotes_ids:
+        return 0, []
+    per_usuari = min(len(mascotes_ids), max(1, total // len(usuaris_ids)))
+    likes = []
+
+    def interaccions():
+        for usuario_id in usuaris_ids:
+            for index in rng.sample(range(len(mascotes_ids)), per_usuari):
+                accion = 'like' if rng.random() < ratio_likes else 'dislike'
+                if accion == 'like':
+                    likes.append((usuario_id, mascotes_ids[index]))
+                yield Interaccion(
+                    usuario_id=usuario_id,
+                    mascota_id=mascotes_ids[index],
+                    accion=accion,
+                    fecha=ara - timedelta(seconds=rng.randint(0, 90 * 24 * 3600)),
+                )
+
+    return _escriure(Interaccion, interaccions(), chunk_size, dates='fecha'), likes
+
+
+def crear_xats(rng, likes, protectora_de, n, missatges_per_xat, chunk_size, ara):
+    """Obre `n` xats a partir de likes (com fa el swipe) i hi afegeix missatges alterns."""
+    seleccionats = rng.sample(likes, min(n, len(likes)))
+    maxim_anterior = Chat.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+    _escriure(Chat, (
+        Chat(
+            mascota_id=mascota_id,
+            adoptante_id=usuario_id,
+            protectora_id=protectora_de[mascota_id],
+            fecha_creacion=ara - timedelta(seconds=rng.randint(0, 60 * 24 * 3600)),
+        )
+        for usuario_id, mascota_id in seleccionats
+    ), chunk_size, dates='fecha_creacion')
+    xats = Chat.objects.filter(pk__gt=maxim_anterior).values_list('pk', 'adoptante_id', 'protectora_id', 'fecha_creacion')
+
+    def missatges():
+        for chat_id, adoptante_id, protectora_id, fecha_creacion in xats.iterator(chunk_size=chunk_size):
+            for i in range(rng.randint(0, missatges_per_xat * 2)):
+                yield Mensaje(
+                    chat_id=chat_id,
+                    remitente_id=adoptante_id if i % 2 == 0 else protectora_id,
+                    contenido=rng.choice(FRASES_XAT),
+                    fecha_envio=fecha_creacion + timedelta(minutes=10 * (i + 1)),
+                    leido=rng.random() < 0.7,
+                )
+
+    return len(seleccionats), _escriure(Mensaje, missatges(), chunk_size, dates='fecha_envio')
+
+
+def generar(seed=42, prefix='sint', protectores=20, usuaris=1000, mascotes=10000, swipes=100000,
+            xats=2000, missatges_per_xat=5, chunk_size=5000, derivats=True, informar=None):
+    """
+    Genera un dataset complet i retorna un diccionari amb els recomptes.
+    `informar(missatge)` rep el progrés de cada fase.
+    """
+    informar = informar or (lambda missatge: None)
+    rng = random.Random(seed)
+    ara = timezone.now()
+
+    protectores_ids = crear_usuaris(rng, prefix, 'protectora', protectores, chunk_size)
+    informar(f'{len(protectores_ids)} protectores')
+    usuaris_ids = crear_usuaris(rng, prefix, 'usuario', usuaris, chunk_size)
+    informar(f'{len(usuaris_ids)} usuaris amb perfil')
+
+    mascotes_creades = crear_mascotes(rng, protectores_ids, mascotes, chunk_size, ara)
+    protectora_de = dict(mascotes_creades)
+    mascotes_ids = [mascota_id for mascota_id, _ in mascotes_creades]
+    informar(f'{len(mascotes_ids)} mascotes')
+
+    total_swipes, likes = crear_swipes(rng, usuaris_ids, mascotes_ids, swipes, chunk_size, ara)
+    informar(f'{total_swipes} swipes ({len(likes)} likes)')
+
+    total_xats, total_missatges = crear_xats(rng, likes, protectora_de, xats, missatges_per_xat, chunk_size, ara)
+    informar(f'{total_xats} xats, {total_missatges} missatges')
+
+    if derivats:
+        reconciliar_comptadors(chunk_size=chunk_size)
+        preferencias.reconstruir_tots(chunk_size=max(1, chunk_size // 10))
+        informar('comptadors de popularitat i preferències implícites reconstruïts')
+
+    return {
+        'protectores': len(protectores_ids),
+        'usuaris': len(usuaris_ids),
+        'mascotes': len(mascotes_ids),
+        'swipes': total_swipes,
+        'xats': total_xats,
+        'missatges': total_missatges,
+    }
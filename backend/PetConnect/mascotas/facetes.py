@@ -0,0 +1,122 @@
+"""
+Recomptes per faceta del catàleg (`/api/mascota/facets/`).
+
+Per a cada valor de les facetes, quantes mascotes (regles de rol i filtres
+aplicats) el tenen. Els recomptes són disjuntius: cada faceta es compta amb
+tots els filtres menys el seu (`PARAMETRES_FACETA`), així que diuen quantes
+mascotes sortirien triant aquell valor en lloc de l'actual. Les facetes sense
+filtre actiu surten d'una sola consulta d'agregació amb un
+`COUNT(*) FILTER (WHERE ...)` per valor, i cada faceta filtrada d'una més:
+les facetes simples comparen la columna i les de selecció múltiple consulten
+la màscara de bits (`mascotas.mascares`).
+
+El resultat es cacheja per conjunt de filtres normalitzat durant
+`FACETES_CACHE_TTL` segons. La clau inclou la generació dels llistats del
+catàleg (`mascotas.cache_cataleg`), que s'incrementa quan una mascota es
+crea, s'esborra o canvia un camp pel qual es filtra; la resta d'edicions i
+els swipes no afecten aquests recomptes.
+"""
+import hashlib
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from . import cache_cataleg, mascares
+
+
+PREFIX = 'facetes'
+FACETES_MASCARA = ('apto_con', 'estado_legal_salud')
+# Paràmetres del llistat que filtren per cada faceta: no s'apliquen en comptar-la
+PARAMETRES_FACETA = {
+    'especie': ('especie',),
+    'tamano': ('tamano',),
+    'genero': ('genero',),
+    'edad_clasificacion': ('edad_clasificacion', 'edad'),
+    'apto_con': ('apto_con',),
+    'estado_legal_salud': ('estado_salud',),
+}
+# Paràmetres que no canvien el conjunt filtrat
+PARAMETRES_IGNORATS = {'page', 'cursor', 'paginacio', 'format'}
+
+
+def ttl():
+    return getattr(settings, 'FACETES_CACHE_TTL', 60)
+
+
+def _alies(faceta, valor):
+    return f'{faceta}__{valor}'
+
+
+def _agregats(facetes):
+    """Un recompte condicional per cada valor de les `facetes`, més el total."""
+    from .models import Mascota
+    agregats = {'total': Count('pk')}
+    for faceta in facetes:
+        if faceta in FACETES_MASCARA:
+            for valor, bit in mascares.bits(faceta).items():
+                agregats[_alies(faceta, valor)] = Count(
+                    'pk', filter=Q(**{f'{mascares.camp_bits(faceta)}__conte_tots': bit})
+                )
+        else:
+            for valor, _ in Mascota._meta.get_field(faceta).choices:
+                agregats[_alies(faceta, valor)] = Count('pk', filter=Q(**{faceta: valor}))
+    return agregats
+
+
+def _valors(faceta):
+    from .models import Mascota
+    if faceta in FACETES_MASCARA:
+        return list(mascares.bits(faceta))
+    return [valor for valor, _ in Mascota._meta.get_field(faceta).choices]
+
+
+def calcular(filtrat_sense, query_params):
+    """
+    `{'total': n, 'facetes': {faceta: {valor: n}}}`. `filtrat_sense(parametres)`
+    retorna el queryset filtrat sense els `parametres` donats.
+
+    Una consulta per a les facetes sense filtre actiu (i el total) i una per
+    cada faceta filtrada.
+    """
+    actives = [
+        faceta for faceta in PARAMETRES_FACETA if any(query_params.get(nom) for nom in PARAMETRES_FACETA[faceta])
+    ]
+    consultes = [((), [faceta for faceta in PARAMETRES_FACETA if faceta not in actives])]
+    consultes += [(PARAMETRES_FACETA[faceta], [faceta]) for faceta in actives]
+
+    total, facetes = None, {}
+    for parametres, grup in consultes:
+        recomptes = filtrat_sense(parametres).order_by().aggregate(**_agregats(grup))
+        if total is None:
+            total = recomptes['total']
+        for faceta in grup:
+            facetes[faceta] = {valor: recomptes[_alies(faceta, valor)] for valor in _valors(faceta)}
+    return {'total': total, 'facetes': {faceta: facetes[faceta] for faceta in PARAMETRES_FACETA}}
+
+
+def clau(abast, query_params):
+    """
+    Clau de cache d'un conjunt de filtres: paràmetres ordenats, sense els de
+    paginació ni els buits, i l'abast de visibilitat (`public` / `protectora`).
+    """
+    parametres = sorted(
+        (nom, valor)
+        for nom in query_params
+        if nom not in PARAMETRES_IGNORATS
+        for valor in query_params.getlist(nom)
+        if valor
+    )
+    resum = hashlib.sha1(urlencode(parametres).encode()).hexdigest()
+    return f'{PREFIX}:{cache_cataleg.generacio_llistats()}:{abast}:{resum}'
+
+
+def obtenir(filtrat_sense, abast, query_params):
+    """Recomptes cachejats per (abast, filtres); es calculen si no hi són."""
+    clau_cache = clau(abast, query_params)
+    resultat = cache.get(clau_cache)
+    if resultat is None:
+        resultat = calcular(filtrat_sense, query_params)
+        cache.set(clau_cache, resultat, timeout=ttl())
+    return resultat
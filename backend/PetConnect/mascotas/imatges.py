@@ -0,0 +1,222 @@
+"""
+Derivades redimensionades de les fotos de les mascotes.
+
+Quan es desa una mascota amb una foto nova (`foto`, `foto2`, `foto3`), es
+generen variants WebP i JPEG a `AMPLADES` píxels d'amplada (mai més grans que
+l'original), amb l'orientació EXIF aplicada i sense metadades EXIF. El
+redimensionament es fa en un pool de processos (`IMATGES_PROCESSOS`), fora del
+fil de la petició i un cop confirmada la transacció; el procés web només llegeix
+l'original, desa els fitxers resultants i n'apunta els camins a
+`Mascota.fotos_derivades`:
+
+    {'foto': {'original': 'mascotas/x.jpg', 'webp': {'320': 'mascotas/derivades/x_320.webp', ...},
+              'jpeg': {...}}, ...}
+
+Les entrades d'una foto que ja no és la del camp (`original` diferent)
+s'ignoren fins que es regeneren. `srcset(mascota, request)` en fa el mapa que
+exposa el serializer. Amb `IMATGES_DERIVADES_MODE = 'sincron'` tot es fa al
+mateix fil; amb `'desactivat'` no se'n genera cap. Les fotos anteriors a aquest
+mecanisme es processen amb la comanda `generar_derivades_fotos`.
+"""
+import io
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps
+
+
+logger = logging.getLogger(__name__)
+
+CAMPS_FOTO = ('foto', 'foto2', 'foto3')
+AMPLADES = (320, 640, 1280)
+# Format -> (extensió, opcions de PIL)
+FORMATS = {
+    'webp': ('webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+DIRECTORI = 'mascotas/derivades'
+
+_executor = None
+_pendents = set()
+_bloqueig = threading.Lock()
+
+
+def mode():
+    return getattr(settings, 'IMATGES_DERIVADES_MODE', 'proces')
+
+
+def generar_variants(original, amplades=AMPLADES):
+    """
+    Variants d'una imatge (bytes) com a {format: {amplada: bytes}}. Funció pura
+    (només PIL): s'executa als processos del pool.
+    """
+    with Image.open(io.BytesIO(original)) as imatge:
+        imatge = ImageOps.exif_transpose(imatge)
+        if imatge.mode not in ('RGB', 'L'):
+            imatge = imatge.convert('RGB')
+        # Sense ampliar: si l'original és més estret, una sola variant a la seva amplada
+        amplades = sorted({min(amplada, imatge.width) for amplada in amplades})
+        variants = {format_: {} for format_ in FORMATS}
+        for amplada in amplades:
+            alcada = max(1, round(imatge.height * amplada / imatge.width))
+            reduida = imatge.resize((amplada, alcada), Image.LANCZOS) if amplada != imatge.width else imatge
+            for format_, (_, opcions) in FORMATS.items():
+                sortida = io.BytesIO()
+                # Sense `exif=`: PIL no copia les metadades de l'original
+                reduida.save(sortida, format=format_.upper(), **opcions)
+                variants[format_][amplada] = sortida.getvalue()
+    return variants
+
+
+def executor():
+    global _executor
+    with _bloqueig:
+        if _executor is None:
+            # 'spawn': els processos no hereten connexions ni fils del procés web
+            _executor = ProcessPoolExecutor(
+                max_workers=getattr(settings, 'IMATGES_PROCESSOS', 2),
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+    return _executor
+
+
+def pendents_de(mascota):
+    """Camps amb foto que no tenen derivades de la foto actual."""
+    derivades = mascota.fotos_derivades or {}
+    return [
+        camp for camp in CAMPS_FOTO
+        if getattr(mascota, camp) and derivades.get(camp, {}).get('original') != getattr(mascota, camp).name
+    ]
+
+
+def programar(mascota):
+    """Encua les derivades de les fotos noves de la mascota per quan es confirmi la transacció."""
+    if mode() == 'desactivat':
+        return
+    for camp in pendents_de(mascota):
+        nom = getattr(mascota, camp).name
+        transaction.on_commit(lambda camp=camp, nom=nom: generar(mascota.pk, camp, nom))
+
+
+def llegir_original(nom):
+    """Bytes de la foto original, o None si no es pot llegir."""
+    try:
+        with default_storage.open(nom, 'rb') as fitxer:
+            return fitxer.read()
+    except OSError:
+        logger.warning('No es pot llegir la foto %s', nom)
+        return None
+
+
+def generar(mascota_id, camp, nom):
+    """Genera les derivades de la foto `nom` del camp (al pool o al mateix fil, segons `mode()`)."""
+    clau = (mascota_id, camp, nom)
+    with _bloqueig:
+        if clau in _pendents:
+            return
+        _pendents.add(clau)
+    original = llegir_original(nom)
+    if original is None:
+        _pendents.discard(clau)
+        return
+
+    if mode() == 'sincron':
+        try:
+            desar_variants(mascota_id, camp, nom, generar_variants(original))
+        finally:
+            _pendents.discard(clau)
+        return
+
+    futur = executor().submit(generar_variants, original)
+    futur.add_done_callback(lambda futur: _en_acabar(clau, futur))
+
+
+def _en_acabar(clau, futur):
+    """S'executa en un fil del procés web quan el pool acaba una foto."""
+    try:
+        desar_variants(*clau, futur.result())
+    except Exception:
+        logger.exception('Error generant les derivades de %s', clau)
+    finally:
+        _pendents.discard(clau)
+        close_old_connections()
+
+
+def desar_variants(mascota_id, camp, nom, variants):
+    """Desa els fitxers de `generar_variants` i els apunta a la mascota si la foto no ha canviat."""
+    from . import cache_cataleg
+    from .models import Mascota
+
+    base = os.path.splitext(os.path.basename(nom))[0]
+    entrada = {'original': nom}
+    for format_, per_amplada in variants.items():
+        extensio = FORMATS[format_][0]
+        entrada[format_] = {}
+        for amplada, contingut in per_amplada.items():
+            cami = f'{DIRECTORI}/{base}_{amplada}.{extensio}'
+            if default_storage.exists(cami):
+                default_storage.delete(cami)
+            entrada[format_][str(amplada)] = default_storage.save(cami, ContentFile(contingut))
+
+    with transaction.atomic():
+        mascota = Mascota.objects.select_for_update().filter(pk=mascota_id).only('pk', camp, 'fotos_derivades').first()
+        if mascota is None or getattr(mascota, camp).name != nom:
+            # La mascota s'ha esborrat o la foto ha canviat mentrestant
+            _esborrar(entrada)
+            return
+        anterior = (mascota.fotos_derivades or {}).get(camp)
+        derivades = {**(mascota.fotos_derivades or {}), camp: entrada}
+        # update(): sense tornar a disparar els senyals de Mascota
+        Mascota.objects.filter(pk=mascota_id).update(fotos_derivades=derivades)
+    if anterior and anterior.get('original') != nom:
+        _esborrar(anterior, conservar=entrada)
+    cache_cataleg.invalidar_mascota(mascota_id, canvia_llistats=False)
+
+
+def _camins(entrada):
+    return {cami for format_ in FORMATS for cami in (entrada or {}).get(format_, {}).values()}
+
+
+def _esborrar(entrada, conservar=None):
+    for cami in _camins(entrada) - _camins(conservar):
+        default_storage.delete(cami)
+
+
+def srcset(mascota, request=None):
+    """
+    {camp: {'webp': 'url 320w, url 640w', 'jpeg': ..., 'miniatura': url}} de les
+    fotos amb derivades al dia. Les fotos sense derivades no hi surten (es fa
+    servir l'original).
+    """
+    def url(cami):
+        relativa = default_storage.url(cami)
+        return request.build_absolute_uri(relativa) if request is not None else relativa
+
+    fotos = {camp: getattr(mascota, camp).name for camp in CAMPS_FOTO}
+    return srcset_de(mascota.fotos_derivades, fotos, url)
+
+
+def srcset_de(derivades, fotos, url):
+    """`srcset` a partir de `fotos_derivades`, els noms actuals de les fotos i una funció camí -> URL."""
+    resultat = {}
+    for camp in CAMPS_FOTO:
+        entrada = (derivades or {}).get(camp)
+        nom = fotos.get(camp)
+        if not entrada or not nom or entrada.get('original') != nom:
+            continue
+        resultat[camp] = {
+            format_: ', '.join(
+                f'{url(cami)} {amplada}w' for amplada, cami in sorted(entrada[format_].items(), key=lambda e: int(e[0]))
+            )
+            for format_ in FORMATS
+        }
+        mes_petita = min(entrada['jpeg'], key=int)
+        resultat[camp]['miniatura'] = url(entrada['jpeg'][mes_petita])
+    return resultat
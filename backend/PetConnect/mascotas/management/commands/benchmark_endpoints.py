@@ -0,0 +1,158 @@
+import json
+import platform
+from pathlib import Path
+
+import django
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Count
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from chat.models import Chat
+from mascotas.benchmark import commit_actual, host_client, mesurar_endpoint
+from mascotas.dades_sintetiques import generar
+from mascotas.models import Mascota
+from mascotas.pagination import MascotaCursorPagination, codificar_cursor
+from usuarios.models import Usuario
+
+
+PREFIX = 'bench'
+# Swipes per petició a petmatch_action_bulk (per comparar amb N crides a petmatch_action)
+MIDA_LOT_SWIPES = 20
+MIDA_PAGINA = MascotaCursorPagination.page_size
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark dels endpoints principals (petmatch, catàleg, recomanacions, xat) sobre un dataset '
+        'sintètic: percentils de latència, consultes SQL i pic de memòria, en un informe JSON. '
+        'Les dades es creen dins d\'una transacció que es desfà en acabar.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--protectores', type=int, default=20)
+        parser.add_argument('--usuaris', type=int, default=200)
+        parser.add_argument('--mascotes', type=int, default=5000)
+        parser.add_argument('--swipes', type=int, default=20000)
+        parser.add_argument('--xats', type=int, default=500)
+        parser.add_argument('--repeticions', type=int, default=30, help='Peticions mesurades per endpoint.')
+        parser.add_argument('--escalfament', type=int, default=3, help='Peticions prèvies no mesurades.')
+        parser.add_argument(
+            '--sortida',
+            default='benchmark_endpoints.json',
+            help="Fitxer de l'informe JSON (per defecte benchmark_endpoints.json)."
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            dataset = generar(
+                seed=options['seed'],
+                prefix=PREFIX,
+                protectores=options['protectores'],
+                usuaris=options['usuaris'],
+                mascotes=options['mascotes'],
+                swipes=options['swipes'],
+                xats=options['xats'],
+            )
+            cache.clear()
+            resultats = self._mesurar(options)
+            transaction.set_rollback(True)
+        cache.clear()
+
+        informe = {
+            'metadades': {
+                'commit': commit_actual(),
+                'data': timezone.now().isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'base_de_dades': connection.vendor,
+                'repeticions': options['repeticions'],
+                'dataset': dataset,
+            },
+            'endpoints': resultats,
+        }
+        Path(options['sortida']).write_text(json.dumps(informe, indent=2, sort_keys=True, ensure_ascii=False) + '\n')
+
+        for nom, r in resultats.items():
+            self.stdout.write(
+                f"{nom:<26} p50 {r['p50_ms']:8.1f} ms  p95 {r['p95_ms']:8.1f} ms  "
+                f"{r['consultes_max']:3d} consultes  {r['pic_memoria_kb']:9.1f} KB"
+            )
+        self.stdout.write(self.style.SUCCESS(f"Informe desat a {options['sortida']}"))
+
+    def _mesurar(self, options):
+        # L'adoptant amb més xats (així el llistat i el detall tenen contingut)
+        usuari = (
+            Usuario.objects.filter(username__startswith=f'{PREFIX}_usuario_')
+            .annotate(num_xats=Count('chats_como_adoptante'))
+            .order_by('-num_xats', 'pk').first()
+        )
+        chat = Chat.objects.filter(adoptante=usuari).order_by('pk').first()
+
+        client = APIClient(HTTP_HOST=host_client())
+        client.force_authenticate(usuari)
+        anonim = APIClient(HTTP_HOST=host_client())
+
+        # Mascotes que l'usuari encara no ha swipejat, per a les accions
+        pendents = list(
+            Mascota.objects.filter(adoptado=False, oculto=False).no_vistes_per(usuari)
+            .order_by('pk').values_list('pk', flat=True)
+        )
+        # Última pàgina del catàleg públic, per número de pàgina i per cursor
+        visibles = Mascota.objects.filter(adoptado=False, oculto=False).order_by('-fecha_creacion', '-id')
+        pagina_final = max(1, -(-visibles.count() // MIDA_PAGINA))
+        ultima_anterior = visibles[(pagina_final - 1) * MIDA_PAGINA - 1] if pagina_final > 1 else None
+        cursor_final = f'&cursor={codificar_cursor(ultima_anterior)}' if ultima_anterior else ''
+
+        sense_cache = {'preparar': lambda i: cache.clear()}
+        mesura = {'repeticions': options['repeticions'], 'escalfament': options['escalfament']}
+        total_peticions = options['repeticions'] + options['escalfament'] + 1
+
+        endpoints = {
+            'petmatch_next': (client, 'get', '/api/petmatch/next/', {}),
+            'petmatch_action': (client, 'post', '/api/petmatch/action/', {
+                'dades': lambda i: {
+                    'mascota_id': pendents[i % len(pendents)] if pendents else 0,
+                    'action': 'like' if i % 3 == 0 else 'dislike',
+                },
+            }),
+            # Sense la cache de respostes anònimes (es buida abans de cada petició)...
+            'mascota_list': (anonim, 'get', '/api/mascota/', sense_cache),
+            'mascota_list_filtres': (anonim, 'get', '/api/mascota/?especie=PERRO&tamano=GRANDE', sense_cache),
+            'mascota_list_pagina_final': (anonim, 'get', f'/api/mascota/?page={pagina_final}', sense_cache),
+            'mascota_list_cursor_final': (
+                anonim, 'get', f'/api/mascota/?paginacio=cursor{cursor_final}', sense_cache,
+            ),
+            # ... i servida des de la cache
+            'mascota_list_cache': (anonim, 'get', '/api/mascota/', {}),
+            'ia_recomendacion': (client, 'get', '/api/ia/recomendacion/', {}),
+            'ia_recomendacion_freda': (client, 'get', '/api/ia/recomendacion/', {
+                'preparar': lambda i: cache.clear(),
+            }),
+            'chat_list': (client, 'get', '/api/chat/chats/', {}),
+            'chat_detail': (client, 'get', f'/api/chat/chats/{chat.pk if chat else 0}/', {}),
+            # L'últim: consumeix moltes mascotes pendents i alteraria la resta de mesures
+            'petmatch_action_bulk': (client, 'post', '/api/petmatch/action/bulk/', {
+                'dades': lambda i: {'swipes': [
+                    {
+                        'mascota_id': pendents[(total_peticions + i * MIDA_LOT_SWIPES + j) % len(pendents)]
+                        if pendents else 0,
+                        'action': 'like' if j % 3 == 0 else 'dislike',
+                    }
+                    for j in range(MIDA_LOT_SWIPES)
+                ]},
+            }),
+        }
+        if len(pendents) < total_peticions * (1 + MIDA_LOT_SWIPES):
+            self.stdout.write(self.style.WARNING(
+                f'Només hi ha {len(pendents)} mascotes pendents per a petmatch_action(_bulk): es repetiran.'
+            ))
+
+        resultats = {}
+        for nom, (client_endpoint, metode, ruta, extra) in endpoints.items():
+            self.stdout.write(f'Mesurant {nom}...')
+            resultats[nom] = mesurar_endpoint(client_endpoint, metode, ruta, **mesura, **extra)
+        return resultats
@@ -0,0 +1,149 @@
+import json
+import platform
+import random
+from pathlib import Path
+
+import django
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from mascotas import preferencias
+from mascotas.benchmark import commit_actual, cronometrar, host_client, mesurar_endpoint, resum_temps
+from mascotas.dades_sintetiques import crear_swipes, crear_usuaris, generar
+from mascotas.models import Mascota, Interaccion, Baraja
+from usuarios.models import Usuario
+
+
+PREFIX = 'vistes'
+
+
+def _nivells(valor):
+    try:
+        nivells = sorted({int(n) for n in valor.split(',') if n.strip()})
+    except ValueError as exc:
+        raise CommandError('--swipes ha de ser una llista d\'enters separats per comes.') from exc
+    if not nivells or nivells[0] < 0:
+        raise CommandError('--swipes ha de contenir enters no negatius.')
+    return nivells
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesura com escala l'exclusió de mascotes ja swipejades amb la longitud de l'historial: "
+        'NOT IN (abans) contra NOT EXISTS (`no_vistes_per`), i els endpoints que la fan servir. '
+        'Les dades es creen dins d\'una transacció que es desfà en acabar.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument(
+            '--mascotes',
+            type=int,
+            default=60000,
+            help='Mida del catàleg (ha de superar el nivell de swipes més alt).'
+        )
+        parser.add_argument(
+            '--swipes',
+            default='10,1000,50000',
+            help='Swipes per usuari de cada nivell, separats per comes (per defecte 10,1000,50000).'
+        )
+        parser.add_argument('--repeticions', type=int, default=10)
+        parser.add_argument('--escalfament', type=int, default=2)
+        parser.add_argument(
+            '--sortida',
+            default='benchmark_exclusio_vistes.json',
+            help="Fitxer de l'informe JSON (per defecte benchmark_exclusio_vistes.json)."
+        )
+
+    def handle(self, *args, **options):
+        nivells = _nivells(options['swipes'])
+        if nivells[-1] >= options['mascotes']:
+            raise CommandError('--mascotes ha de ser més gran que el nivell de swipes més alt.')
+
+        with transaction.atomic():
+            self.stdout.write(f"Creant {options['mascotes']} mascotes i {len(nivells)} usuaris...")
+            usuaris = self._sembrar(options, nivells)
+            cache.clear()
+            resultats = {str(swipes): self._mesurar(usuari, options) for swipes, usuari in usuaris.items()}
+            transaction.set_rollback(True)
+        cache.clear()
+
+        informe = {
+            'metadades': {
+                'commit': commit_actual(),
+                'data': timezone.now().isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'base_de_dades': connection.vendor,
+                'mascotes': options['mascotes'],
+                'repeticions': options['repeticions'],
+            },
+            'nivells': resultats,
+        }
+        Path(options['sortida']).write_text(json.dumps(informe, indent=2, sort_keys=True, ensure_ascii=False) + '\n')
+
+        self.stdout.write(f"{'swipes':>8} {'consulta':<28} {'p50 ms':>9} {'p95 ms':>9}")
+        for swipes, mesures in resultats.items():
+            for nom, r in mesures.items():
+                if isinstance(r, dict):
+                    self.stdout.write(f"{swipes:>8} {nom:<28} {r['p50_ms']:9.1f} {r['p95_ms']:9.1f}")
+            if not mesures['mateix_resultat']:
+                self.stdout.write(self.style.ERROR(f'{swipes} swipes: NOT IN i NOT EXISTS NO coincideixen!'))
+        self.stdout.write(self.style.SUCCESS(f"Informe desat a {options['sortida']}"))
+
+    def _sembrar(self, options, nivells):
+        """Un usuari per nivell, amb exactament aquell nombre de swipes."""
+        generar(
+            seed=options['seed'], prefix=PREFIX, protectores=5, usuaris=0,
+            mascotes=options['mascotes'], swipes=0, xats=0, derivats=False,
+        )
+        mascotes_ids = list(
+            Mascota.objects.filter(protectora__username__startswith=f'{PREFIX}_')
+            .order_by('pk').values_list('pk', flat=True)
+        )
+        rng = random.Random(options['seed'])
+        ara = timezone.now()
+        usuaris = {}
+        for swipes in nivells:
+            [usuario_id] = crear_usuaris(rng, f'{PREFIX}{swipes}', 'usuario', 1, chunk_size=5000)
+            if swipes:
+                crear_swipes(rng, [usuario_id], mascotes_ids, swipes, chunk_size=5000, ara=ara)
+            preferencias.reconstruir(usuario_id)
+            usuaris[swipes] = usuario_id
+        per_id = Usuario.objects.in_bulk(list(usuaris.values()))
+        return {swipes: per_id[usuario_id] for swipes, usuario_id in usuaris.items()}
+
+    def _mesurar(self, usuari, options):
+        disponibles = Mascota.objects.filter(adoptado=False, oculto=False)
+        not_in = disponibles.exclude(
+            id__in=Interaccion.objects.filter(usuario=usuari).values('mascota_id')
+        )
+        not_exists = disponibles.no_vistes_per(usuari)
+        mesura = {'repeticions': options['repeticions'], 'escalfament': options['escalfament']}
+
+        resultats, obtinguts = {}, []
+        for nom, consulta in (('not_in', not_in), ('not_exists', not_exists)):
+            # Primera pàgina (com el feed) i recompte complet (com el motor de recomanació)
+            pagina, temps_pagina = cronometrar(
+                lambda: list(consulta.order_by('pk').values_list('pk', flat=True)[:20]), **mesura
+            )
+            recompte, temps_recompte = cronometrar(consulta.count, **mesura)
+            resultats[f'{nom}_pagina'] = resum_temps(temps_pagina)
+            resultats[f'{nom}_recompte'] = resum_temps(temps_recompte)
+            obtinguts.append((pagina, recompte))
+        resultats['mateix_resultat'] = obtinguts[0] == obtinguts[1]
+        resultats['candidates'] = obtinguts[1][1]
+
+        client = APIClient(HTTP_HOST=host_client())
+        client.force_authenticate(usuari)
+        resultats['ia_recomendacion_freda'] = mesurar_endpoint(
+            client, 'get', '/api/ia/recomendacion/', preparar=lambda i: cache.clear(), **mesura
+        )
+        resultats['petmatch_next_baralla_nova'] = mesurar_endpoint(
+            client, 'get', '/api/petmatch/next/',
+            preparar=lambda i: Baraja.objects.filter(usuario=usuari).delete(), **mesura
+        )
+        return resultats
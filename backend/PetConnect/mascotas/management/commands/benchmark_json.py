@@ -0,0 +1,141 @@
+import io
+import json
+import platform
+from pathlib import Path
+
+import django
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Count
+from django.utils import timezone
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from chat.models import Chat
+from mascotas.benchmark import commit_actual, cronometrar, host_client, percentil, resum_temps
+from mascotas.dades_sintetiques import generar
+from PetConnect import json_rapid
+from usuarios.models import Usuario
+
+
+PREFIX = 'json'
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara el renderer i el parser JSON de DRF (stdlib) amb els de PetConnect.json_rapid (orjson) '
+        'sobre les respostes més grans de l\'API (catàleg, lot del feed, recomanacions, historial de xat), '
+        'en un informe JSON. Les dades es creen dins d\'una transacció que es desfà en acabar.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--mascotes', type=int, default=1000)
+        parser.add_argument('--missatges', type=int, default=300, help='Missatges per xat (historial del xat).')
+        parser.add_argument('--repeticions', type=int, default=50)
+        parser.add_argument('--escalfament', type=int, default=5)
+        parser.add_argument(
+            '--sortida',
+            default='benchmark_json.json',
+            help="Fitxer de l'informe JSON (per defecte benchmark_json.json)."
+        )
+
+    def handle(self, *args, **options):
+        if not json_rapid.disponible():
+            self.stdout.write(self.style.WARNING(
+                'orjson no està instal·lat: el renderer ràpid fa servir la stdlib i no hi haurà diferència.'
+            ))
+        with transaction.atomic():
+            generar(
+                seed=options['seed'], prefix=PREFIX, protectores=5, usuaris=20,
+                mascotes=options['mascotes'], swipes=0, xats=20, missatges_per_xat=options['missatges'],
+                derivats=False,
+            )
+            cache.clear()
+            respostes = self._respostes()
+            transaction.set_rollback(True)
+        cache.clear()
+
+        resultats = {nom: self._mesurar(dades, options) for nom, dades in respostes.items()}
+        informe = {
+            'metadades': {
+                'commit': commit_actual(),
+                'data': timezone.now().isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'base_de_dades': connection.vendor,
+                'orjson': getattr(json_rapid.orjson, '__version__', None),
+                'repeticions': options['repeticions'],
+            },
+            'endpoints': resultats,
+        }
+        Path(options['sortida']).write_text(json.dumps(informe, indent=2, sort_keys=True, ensure_ascii=False) + '\n')
+
+        self.stdout.write(
+            f"{'endpoint':<20} {'bytes':>9} {'render drf':>11} {'ràpid':>9} {'x':>6} "
+            f"{'parse drf':>10} {'ràpid':>9} {'x':>6}"
+        )
+        for nom, r in resultats.items():
+            estil = self.style.SUCCESS if r['mateix_json'] else self.style.ERROR
+            self.stdout.write(estil(
+                f"{nom:<20} {r['bytes']:9d} {r['render']['drf']['p50_ms']:9.2f}ms "
+                f"{r['render']['rapid']['p50_ms']:7.2f}ms {r['render']['acceleracio']:6.1f} "
+                f"{r['parse']['drf']['p50_ms']:8.2f}ms {r['parse']['rapid']['p50_ms']:7.2f}ms "
+                f"{r['parse']['acceleracio']:6.1f}" + ('' if r['mateix_json'] else '  JSON DIFERENT')
+            ))
+        self.stdout.write(self.style.SUCCESS(f"Informe desat a {options['sortida']}"))
+
+    def _respostes(self):
+        """`response.data` (abans del renderer) de les respostes més grans de l'API."""
+        # L'adoptant amb més xats, com a benchmark_endpoints
+        usuari = (
+            Usuario.objects.filter(username__startswith=f'{PREFIX}_usuario_')
+            .annotate(num_xats=Count('chats_como_adoptante'))
+            .order_by('-num_xats', 'pk').first()
+        )
+        chat = Chat.objects.filter(adoptante=usuari).order_by('pk').first()
+        client = APIClient(HTTP_HOST=host_client())
+        client.force_authenticate(usuari)
+        anonim = APIClient(HTTP_HOST=host_client())
+
+        rutes = {
+            'mascota_list': (anonim, '/api/mascota/'),
+            'mascota_facets': (anonim, '/api/mascota/facets/'),
+            'petmatch_next_lot': (client, '/api/petmatch/next/?count=50'),
+            'ia_recomendacion': (client, '/api/ia/recomendacion/?limit=50'),
+            'chat_detail': (client, f'/api/chat/chats/{chat.pk if chat else 0}/'),
+        }
+        respostes = {}
+        for nom, (client_ruta, ruta) in rutes.items():
+            resposta = client_ruta.get(ruta)
+            if resposta.status_code == 200:
+                respostes[nom] = resposta.data
+            else:
+                self.stdout.write(self.style.WARNING(f'{nom}: {resposta.status_code}, no es mesura.'))
+        return respostes
+
+    def _mesurar(self, dades, options):
+        mesura = {'repeticions': options['repeticions'], 'escalfament': options['escalfament']}
+        drf, rapid = JSONRenderer(), json_rapid.JSONRapidRenderer()
+        cos_drf, temps_drf = cronometrar(lambda: drf.render(dades), **mesura)
+        cos_rapid, temps_rapid = cronometrar(lambda: rapid.render(dades), **mesura)
+
+        parser_drf, parser_rapid = JSONParser(), json_rapid.JSONRapidParser()
+        llegit_drf, parse_drf = cronometrar(lambda: parser_drf.parse(io.BytesIO(cos_drf)), **mesura)
+        llegit_rapid, parse_rapid = cronometrar(lambda: parser_rapid.parse(io.BytesIO(cos_drf)), **mesura)
+
+        def comparacio(temps_base, temps_nou):
+            return {
+                'drf': resum_temps(temps_base),
+                'rapid': resum_temps(temps_nou),
+                'acceleracio': round(percentil(temps_base, 50) / max(percentil(temps_nou, 50), 1e-6), 1),
+            }
+
+        return {
+            'bytes': len(cos_drf),
+            'mateix_json': cos_rapid == cos_drf and llegit_rapid == llegit_drf,
+            'render': comparacio(temps_drf, temps_rapid),
+            'parse': comparacio(parse_drf, parse_rapid),
+        }
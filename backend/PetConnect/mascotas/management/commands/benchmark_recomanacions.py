@@ -0,0 +1,100 @@
+import random
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from ai_service.views import obtenir_recomanacions_ia, obtenir_recomanacions_ia_iteratiu
+from mascotas.benchmark import cronometrar, resum_temps
+from mascotas.models import Mascota, Interaccion
+from usuarios.models import Usuario
+
+
+def _opcions(choices):
+    return [valor for valor, _ in choices]
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara el motor de recomanació iteratiu amb el vectoritzat sobre un catàleg sintètic. '
+        'Les dades es creen dins d\'una transacció que es desfà en acabar.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mascotes', type=int, default=5000, help='Mida del catàleg sintètic.')
+        parser.add_argument('--likes', type=int, default=50, help='Likes de l\'usuari de prova.')
+        parser.add_argument('--limit', type=int, default=5, help='Nombre de recomanacions.')
+        parser.add_argument('--repeticions', type=int, default=3)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            usuari = self._sembrar(options)
+
+            resultat_iteratiu, temps_iteratiu = cronometrar(
+                lambda: obtenir_recomanacions_ia_iteratiu(usuari, limit=options['limit']),
+                repeticions=options['repeticions'],
+            )
+            resultat_vectoritzat, temps_vectoritzat = cronometrar(
+                lambda: obtenir_recomanacions_ia(usuari, limit=options['limit']),
+                repeticions=options['repeticions'],
+            )
+
+            transaction.set_rollback(True)
+
+        iteratiu = resum_temps(temps_iteratiu)
+        vectoritzat = resum_temps(temps_vectoritzat)
+        self.stdout.write(f"Catàleg: {options['mascotes']} mascotes, {options['likes']} likes")
+        self.stdout.write(f"Iteratiu:     p50 {iteratiu['p50_ms']:.1f} ms  (max {iteratiu['max_ms']:.1f} ms)")
+        self.stdout.write(f"Vectoritzat:  p50 {vectoritzat['p50_ms']:.1f} ms  (max {vectoritzat['max_ms']:.1f} ms)")
+        if vectoritzat['p50_ms'] > 0:
+            self.stdout.write(f"Speedup:      x{iteratiu['p50_ms'] / vectoritzat['p50_ms']:.1f}")
+
+        mateix_ranquing = (
+            [(r['mascota'].id, r['score']) for r in resultat_iteratiu] ==
+            [(r['mascota'].id, r['score']) for r in resultat_vectoritzat]
+        )
+        if mateix_ranquing:
+            self.stdout.write(self.style.SUCCESS('Rànquings idèntics.'))
+        else:
+            self.stdout.write(self.style.ERROR('Els rànquings NO coincideixen!'))
+
+    def _sembrar(self, options):
+        rng = random.Random(options['seed'])
+        protectora = Usuario.objects.create_user(
+            username='bench_protectora', email='bench_protectora@example.com',
+            password='bench', role='protectora',
+        )
+        mascotes = []
+        for i in range(options['mascotes']):
+            especie = rng.choice(['PERRO', 'GATO'])
+            mascotes.append(Mascota(
+                nombre=f'Bench {i}',
+                especie=especie,
+                genero=rng.choice(_opcions(Mascota.GENERO_CHOICES)),
+                tamano=rng.choice(_opcions(Mascota.TAMANO_CHOICES)),
+                edad_clasificacion=rng.choice(_opcions(Mascota.EDAD_CHOICES)),
+                apto_ninos=rng.choice(_opcions(Mascota.NINOS_CHOICES)),
+                necesita_compania_animal=rng.choice(_opcions(Mascota.COMPANIA_ANIMAL_CHOICES)),
+                nivel_experiencia=rng.choice(_opcions(Mascota.NIVEL_EXPERIENCIA_CHOICES)),
+                apto_con=rng.sample(_opcions(Mascota.APTO_CON_CHOICES), rng.randint(0, 3)),
+                estado_legal_salud=rng.sample(_opcions(Mascota.ESTADO_LEGAL_SALUD_CHOICES), rng.randint(0, 4)),
+                foto='mascotas/bench.jpg',
+                protectora=protectora,
+            ))
+        mascotes = Mascota.objects.bulk_create(mascotes, batch_size=1000)
+
+        usuari = Usuario.objects.create_user(
+            username='bench_usuari', email='bench_usuari@example.com', password='bench',
+        )
+        perfil = usuari.perfil_usuario
+        perfil.tiene_ninos = True
+        perfil.tiene_perros = True
+        perfil.preferencias_especie = ['PERRO']
+        perfil.preferencias_tamano = ['MEDIANO', 'GRANDE']
+        perfil.save()
+
+        Interaccion.objects.bulk_create([
+            Interaccion(usuario=usuari, mascota=mascota, accion='like')
+            for mascota in rng.sample(mascotes, min(options['likes'], len(mascotes)))
+        ])
+        return usuari
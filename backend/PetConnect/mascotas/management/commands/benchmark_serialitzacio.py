@@ -0,0 +1,126 @@
+import json
+import platform
+from pathlib import Path
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from mascotas import serialitzacio_rapida
+from mascotas.benchmark import commit_actual, cronometrar, host_client, percentil, resum_temps
+from mascotas.dades_sintetiques import generar
+from mascotas.models import Mascota
+from mascotas.serializers import MascotaSerializer, serializer_per_vista
+
+
+PREFIX = 'serial'
+
+# Paràmetres de cada representació mesurada
+VARIANTS = {
+    'complet': {},
+    'omit': {'omit': 'descripcion,caracter_perro,caracter_gato,condicion_especial_perro,condicion_especial_gato'},
+    'fields': {'fields': 'id,nombre,especie,edad,tamano,foto'},
+    'tarjeta': {'vista': 'tarjeta'},
+}
+
+
+def _mides(valor):
+    try:
+        mides = sorted({int(n) for n in valor.split(',') if n.strip()})
+    except ValueError as exc:
+        raise CommandError("--mides ha de ser una llista d'enters separats per comes.") from exc
+    if not mides or mides[0] <= 0:
+        raise CommandError('--mides ha de contenir enters positius.')
+    return mides
+
+
+class Command(BaseCommand):
+    help = (
+        'Mesura el temps de serialització i la mida del JSON de les mascotes per a cada representació '
+        '(completa, ?omit=, ?fields=, ?vista=tarjeta i la serialització ràpida), en un informe JSON. '
+        'Les dades es creen dins d\'una transacció que es desfà en acabar.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--mides', default='12,100', help='Mascotes per resposta, separades per comes.')
+        parser.add_argument('--repeticions', type=int, default=30)
+        parser.add_argument('--escalfament', type=int, default=3)
+        parser.add_argument(
+            '--sortida',
+            default='benchmark_serialitzacio.json',
+            help="Fitxer de l'informe JSON (per defecte benchmark_serialitzacio.json)."
+        )
+
+    def handle(self, *args, **options):
+        mides = _mides(options['mides'])
+        with transaction.atomic():
+            generar(
+                seed=options['seed'], prefix=PREFIX, protectores=5, usuaris=0,
+                mascotes=mides[-1], swipes=0, xats=0, derivats=False,
+            )
+            cataleg = Mascota.objects.per_serialitzar().order_by('-fecha_creacion', '-id')[:mides[-1]]
+            mascotes, files = list(cataleg), list(serialitzacio_rapida.files(cataleg))
+            resultats = {str(mida): self._mesurar(mascotes[:mida], files[:mida], options) for mida in mides}
+            transaction.set_rollback(True)
+
+        informe = {
+            'metadades': {
+                'commit': commit_actual(),
+                'data': timezone.now().isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'base_de_dades': connection.vendor,
+                'repeticions': options['repeticions'],
+            },
+            'mides': resultats,
+        }
+        Path(options['sortida']).write_text(json.dumps(informe, indent=2, sort_keys=True, ensure_ascii=False) + '\n')
+
+        self.stdout.write(f"{'mida':>5} {'variant':<10} {'p50 ms':>9} {'p95 ms':>9} {'bytes':>9} {'vs complet':>10}")
+        for mida, variants in resultats.items():
+            for nom, r in variants.items():
+                self.stdout.write(
+                    f"{mida:>5} {nom:<10} {r['p50_ms']:9.2f} {r['p95_ms']:9.2f} "
+                    f"{r['bytes']:9d} {r['bytes_relatius']:10.0%}"
+                )
+            rapida = variants['rapida']
+            estil = self.style.SUCCESS if rapida['mateix_json'] else self.style.ERROR
+            self.stdout.write(estil(
+                f"{mida:>5} serialització ràpida: x{rapida['acceleracio']} "
+                f"({'mateix JSON' if rapida['mateix_json'] else 'JSON DIFERENT'})"
+            ))
+        self.stdout.write(self.style.SUCCESS(f"Informe desat a {options['sortida']}"))
+
+    def _mesurar(self, mascotes, files, options):
+        factory = APIRequestFactory(SERVER_NAME=host_client())
+        renderer = JSONRenderer()
+        mesura = {'repeticions': options['repeticions'], 'escalfament': options['escalfament']}
+        resultats = {}
+        for nom, parametres in VARIANTS.items():
+            request = Request(factory.get('/api/mascota/', parametres))
+            serializer_class = serializer_per_vista(request)
+            dades, temps_ms = cronometrar(
+                lambda: serializer_class(mascotes, many=True, context={'request': request}).data, **mesura,
+            )
+            resultats[nom] = {**resum_temps(temps_ms), 'bytes': len(renderer.render(dades))}
+
+        # Representació completa amb la serialització ràpida (files de .values())
+        request = Request(factory.get('/api/mascota/'))
+        dades, temps_ms = cronometrar(lambda: serialitzacio_rapida.serialitzar(files, request), **mesura)
+        json_rapid = renderer.render(dades)
+        resultats['rapida'] = {
+            **resum_temps(temps_ms),
+            'bytes': len(json_rapid),
+            'mateix_json': json_rapid == renderer.render(
+                MascotaSerializer(mascotes, many=True, context={'request': request}).data
+            ),
+            'acceleracio': round(resultats['complet']['p50_ms'] / max(percentil(temps_ms, 50), 1e-6), 1),
+        }
+        for resultat in resultats.values():
+            resultat['bytes_relatius'] = round(resultat['bytes'] / resultats['complet']['bytes'], 3)
+        return resultats
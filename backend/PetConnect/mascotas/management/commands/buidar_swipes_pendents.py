@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from mascotas.swipes import MIDA_LOT_BUIDAT, buidar_pendents
+
+
+class Command(BaseCommand):
+    help = (
+        'Aplica els swipes desats en mode write-behind (swipes_pendientes): els agrupa per '
+        '(usuari, mascota) i els escriu per lots a interacciones, amb comptadors i xats. '
+        'Amb --continu es queda buidant cada --interval segons.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lot',
+            type=int,
+            default=MIDA_LOT_BUIDAT,
+            help=f'Esdeveniments per transacció (per defecte {MIDA_LOT_BUIDAT}).'
+        )
+        parser.add_argument('--continu', action='store_true', help='No acaba: torna a buidar periòdicament.')
+        parser.add_argument('--interval', type=float, default=1.0, help='Segons entre buidatges amb --continu.')
+
+    def handle(self, *args, **options):
+        if options['lot'] <= 0 or options['interval'] <= 0:
+            raise CommandError('--lot i --interval han de ser positius.')
+
+        while True:
+            inici = time.perf_counter()
+            processats, aplicats = buidar_pendents(mida_lot=options['lot'])
+            if processats or not options['continu']:
+                self.stdout.write(self.style.SUCCESS(
+                    f'{processats} swipes pendents aplicats com a {aplicats} interaccions '
+                    f'en {time.perf_counter() - inici:.2f} s.'
+                ))
+            if not options['continu']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from ai_service import cache_recomanacions
+from mascotas import cache_cataleg
+
+
+class Command(BaseCommand):
+    help = 'Mostra els comptadors de hits / misses de la cache del catàleg públic i de la de recomanacions.'
+
+    def handle(self, *args, **options):
+        for nom, modul in (('cataleg', cache_cataleg), ('recomanacions', cache_recomanacions)):
+            e = modul.estadistiques()
+            self.stdout.write(f"{nom:<14} {e['hits']:8d} hits  {e['misses']:8d} misses  {e['taxa_encert']:6.1%} encert")
@@ -0,0 +1,150 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from ai_service import motor_recomanacio
+from mascotas import mascares
+from mascotas.dades_sintetiques import generar
+from mascotas.models import Mascota, Interaccion
+from usuarios.models import Usuario
+
+
+PREFIX = 'explain'
+
+# Recorreguts seqüencials d'una taula sencera al pla de cada motor de BD
+PATRONS_SCAN = {
+    'postgresql': re.compile(r'Seq Scan on (\w+)'),
+    'sqlite': re.compile(r'\bSCAN (\w+)\b(?! USING)'),
+}
+
+
+def consultes_principals(usuari, protectora):
+    """
+    Les consultes dels endpoints principals, amb la mateixa forma que les fa
+    el codi. Cada entrada és (nom, queryset, si un recorregut complet és esperat).
+    """
+    visibles = Mascota.objects.per_serialitzar().filter(adoptado=False, oculto=False).order_by('-fecha_creacion')
+    return [
+        ('mascota_list', visibles[:12], False),
+        (
+            'mascota_list_cursor',
+            visibles.order_by('-fecha_creacion', '-id')
+            .filter(
+                Q(fecha_creacion__lte=timezone.now()),
+                Q(fecha_creacion__lt=timezone.now()) | Q(fecha_creacion=timezone.now(), id__lt=1),
+            )[:12],
+            False,
+        ),
+        ('mascota_list_especie', visibles.filter(especie='PERRO')[:12], False),
+        ('mascota_list_especie_tamano', visibles.filter(especie='PERRO', tamano='GRANDE')[:12], False),
+        ('mascota_list_edad', visibles.filter(edad_clasificacion='3_6')[:12], False),
+        (
+            'mascota_list_apto_con',
+            mascares.filtrar(visibles, 'apto_con', ['NINOS', 'PERROS', 'GATOS'])[:12],
+            False,
+        ),
+        ('mascota_list_estado_salud', mascares.filtrar(visibles, 'estado_legal_salud', ['MICROCHIP'])[:12], False),
+        (
+            'mis_mascotas',
+            Mascota.objects.per_serialitzar().filter(protectora=protectora).order_by('-fecha_creacion'),
+            False,
+        ),
+        (
+            'favoritos',
+            Mascota.objects.per_serialitzar().filter(
+                id__in=Interaccion.objects.filter(usuario=usuari, accion='like').values_list('mascota_id', flat=True)
+            ),
+            False,
+        ),
+        (
+            'precalcul_altes',
+            Mascota.objects.filter(adoptado=False, oculto=False, fecha_creacion__gt=timezone.now()).order_by(),
+            False,
+        ),
+        (
+            'precalcul_frescor',
+            Mascota.objects.filter(id__in=list(range(1, 51)), adoptado=False, oculto=False)
+            .no_vistes_per(usuari).values_list('id', 'fecha_actualizacion').order_by(),
+            False,
+        ),
+        # Un sondeig de la mostra de la baralla: ids sortejats, per clau primària
+        (
+            'baralla_mostra',
+            Mascota.objects.filter(adoptado=False, oculto=False, id__in=list(range(1, 1001, 20)))
+            .no_vistes_per(usuari).values_list('id', flat=True).order_by(),
+            False,
+        ),
+        # El motor de recomanació llegeix tots els candidats: el recorregut del
+        # catàleg és inherent, però no el de `interacciones`
+        (
+            'recomanacions_cataleg',
+            Mascota.objects.filter(adoptado=False, oculto=False).no_vistes_per(usuari)
+            .values_list(*motor_recomanacio.CAMPS_CATALEG).order_by(),
+            True,
+        ),
+    ]
+
+
+def taules_recorregudes(pla, vendor):
+    """Taules que el pla recorre seqüencialment."""
+    patro = PATRONS_SCAN.get(vendor)
+    return sorted(set(patro.findall(pla))) if patro else []
+
+
+class Command(BaseCommand):
+    help = (
+        'Executa EXPLAIN (ANALYZE a PostgreSQL) de les consultes dels endpoints principals sobre un '
+        'dataset sintètic i avisa dels recorreguts seqüencials. Les dades es desfan en acabar.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--protectores', type=int, default=20)
+        parser.add_argument('--usuaris', type=int, default=200)
+        parser.add_argument('--mascotes', type=int, default=20000)
+        parser.add_argument('--swipes', type=int, default=50000)
+        parser.add_argument('--plans', action='store_true', help='Mostra el pla complet de cada consulta.')
+        parser.add_argument(
+            '--estricte',
+            action='store_true',
+            help='Acaba amb error si alguna consulta té un recorregut seqüencial no esperat.'
+        )
+
+    def handle(self, *args, **options):
+        vendor = connection.vendor
+        opcions_explain = {'analyze': True} if vendor == 'postgresql' else {}
+
+        with transaction.atomic():
+            generar(
+                seed=options['seed'], prefix=PREFIX, protectores=options['protectores'],
+                usuaris=options['usuaris'], mascotes=options['mascotes'], swipes=options['swipes'], xats=0,
+            )
+            # Estadístiques actualitzades perquè el planificador triï com ho faria en producció
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+            usuari = Usuario.objects.filter(username__startswith=f'{PREFIX}_usuario_').order_by('pk').first()
+            protectora = Usuario.objects.filter(username__startswith=f'{PREFIX}_protectora_').order_by('pk').first()
+
+            avisos = []
+            for nom, queryset, complet_esperat in consultes_principals(usuari, protectora):
+                pla = queryset.explain(**opcions_explain)
+                taules = taules_recorregudes(pla, vendor)
+                inesperades = [t for t in taules if not (complet_esperat and t == Mascota._meta.db_table)]
+
+                if inesperades:
+                    avisos.append(nom)
+                    self.stdout.write(self.style.WARNING(f"{nom:<28} recorregut seqüencial: {', '.join(inesperades)}"))
+                else:
+                    self.stdout.write(self.style.SUCCESS(f'{nom:<28} ok'))
+                if options['plans'] or inesperades:
+                    self.stdout.write('    ' + pla.replace('\n', '\n    '))
+
+            transaction.set_rollback(True)
+
+        if avisos and options['estricte']:
+            raise CommandError(f"Recorreguts seqüencials no esperats a: {', '.join(avisos)}")
+        self.stdout.write(f'{len(avisos)} consultes amb recorreguts seqüencials no esperats.')
@@ -0,0 +1,51 @@
+from concurrent.futures import as_completed
+
+from django.core.management.base import BaseCommand, CommandError
+
+from mascotas import imatges
+from mascotas.models import Mascota
+
+
+class Command(BaseCommand):
+    help = (
+        'Genera les variants redimensionades (WebP i JPEG) de les fotos de mascotes que encara no en '
+        'tenen, o que són d\'una foto anterior, amb el pool de processos de mascotas.imatges.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lot', type=int, default=200, help='Mascotes per bloc (per defecte 200).')
+
+    def handle(self, *args, **options):
+        if options['lot'] <= 0:
+            raise CommandError('--lot ha de ser positiu.')
+
+        generades = errors = 0
+        ultim_id = 0
+        while True:
+            bloc = list(
+                Mascota.objects.filter(pk__gt=ultim_id).order_by('pk')
+                .only('pk', 'fotos_derivades', *imatges.CAMPS_FOTO)[:options['lot']]
+            )
+            if not bloc:
+                break
+            ultim_id = bloc[-1].pk
+
+            futurs = {}
+            for mascota in bloc:
+                for camp in imatges.pendents_de(mascota):
+                    nom = getattr(mascota, camp).name
+                    original = imatges.llegir_original(nom)
+                    if original is None:
+                        errors += 1
+                        continue
+                    futurs[imatges.executor().submit(imatges.generar_variants, original)] = (mascota.pk, camp, nom)
+
+            for futur in as_completed(futurs):
+                try:
+                    imatges.desar_variants(*futurs[futur], futur.result())
+                    generades += 1
+                except Exception as exc:
+                    errors += 1
+                    self.stdout.write(self.style.WARNING(f'{futurs[futur]}: {exc}'))
+
+        self.stdout.write(self.style.SUCCESS(f'{generades} fotos amb derivades noves, {errors} errors.'))
@@ -0,0 +1,94 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from ai_service import precalcul
+
+
+def _inicialitzar_worker():
+    # Amb 'spawn' el procés fill arrenca sense Django configurat
+    if not apps.ready:
+        django.setup()
+
+
+def _lots_usuaris(id_min, id_max, mida_lot):
+    """Ids d'usuaris actius del rang [id_min, id_max], per lots (paginació per clau)."""
+    usuaris = precalcul.usuaris_actius().order_by('pk')
+    if id_max is not None:
+        usuaris = usuaris.filter(pk__lte=id_max)
+    ultim_id = id_min - 1
+    while True:
+        ids = list(usuaris.filter(pk__gt=ultim_id).values_list('pk', flat=True)[:mida_lot])
+        if not ids:
+            return
+        yield ids
+        ultim_id = ids[-1]
+
+
+class Command(BaseCommand):
+    help = (
+        'Precalcula el top-N de recomanacions de cada usuari actiu (en paral·lel) i el desa a '
+        'recomendaciones_precalculadas. Amb --id-min / --id-max diversos nodes es poden repartir la feina.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--top',
+            type=int,
+            default=getattr(settings, 'RECOMANACIONS_CACHE_MIDA', 50),
+            help='Nombre de recomanacions desades per usuari (per defecte RECOMANACIONS_CACHE_MIDA).'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Processos en paral·lel (per defecte, un per CPU). Amb 1 es calcula en aquest procés."
+        )
+        parser.add_argument(
+            '--lot',
+            type=int,
+            default=100,
+            help="Usuaris per unitat de feina (per defecte 100)."
+        )
+        parser.add_argument('--id-min', type=int, default=1, help="Primer id d'usuari del rang (inclòs).")
+        parser.add_argument('--id-max', type=int, default=None, help="Últim id d'usuari del rang (inclòs).")
+
+    def handle(self, *args, **options):
+        top, workers, mida_lot = options['top'], options['workers'], options['lot']
+        if top <= 0 or workers <= 0 or mida_lot <= 0:
+            raise CommandError('--top, --workers i --lot han de ser positius.')
+
+        if workers > 1 and connections['default'].vendor == 'sqlite':
+            # SQLite només admet un escriptor alhora: els processos es bloquejarien entre ells
+            self.stdout.write(self.style.WARNING('SQLite no admet escriptures concurrents: es fa servir 1 procés.'))
+            workers = 1
+
+        lots = _lots_usuaris(options['id_min'], options['id_max'], mida_lot)
+        inici = time.perf_counter()
+        processats = 0
+
+        if workers == 1:
+            for ids in lots:
+                processats += precalcul.calcular_lot(ids, top)
+        else:
+            # Els lots es llegeixen abans de crear el pool: els fills (fork) no
+            # poden heretar cap connexió oberta del pare
+            lots = list(lots)
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=workers, initializer=_inicialitzar_worker) as pool:
+                pendents = [pool.submit(precalcul.calcular_lot, ids, top) for ids in lots]
+                for pendent in pendents:
+                    processats += pendent.result()
+
+        durada = time.perf_counter() - inici
+        rang = f"{options['id_min']}..{options['id_max'] if options['id_max'] is not None else '∞'}"
+        self.stdout.write(self.style.SUCCESS(
+            f'Recomanacions precalculades per a {processats} usuaris (ids {rang}) en {durada:.1f} s '
+            f'({processats / durada if durada else 0:.1f} usuaris/s, {workers} processos).'
+        ))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from mascotas.popularidad import reconciliar_comptadors
+
+
+class Command(BaseCommand):
+    help = 'Reconstrueix total_likes, total_dislikes i tendencia de totes les mascotes a partir de les interaccions.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Nombre de mascotes recalculades per bloc (per defecte 1000).'
+        )
+
+    def handle(self, *args, **options):
+        processades = reconciliar_comptadors(chunk_size=options['chunk_size'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Comptadors de popularitat reconstruïts per a {processades} mascotes.')
+        )
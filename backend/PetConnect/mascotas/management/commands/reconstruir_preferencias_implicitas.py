@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from mascotas.preferencias import reconstruir_tots
+
+
+class Command(BaseCommand):
+    help = 'Construeix (o reconstrueix) l\'histograma de preferències implícites de tots els usuaris a partir dels seus likes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help='Nombre d\'usuaris processats per bloc (per defecte 500).'
+        )
+
+    def handle(self, *args, **options):
+        processats = reconstruir_tots(chunk_size=options['chunk_size'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Preferències implícites reconstruïdes per a {processats} usuaris.')
+        )
@@ -0,0 +1,133 @@
+"""
+Màscares de bits dels camps de selecció múltiple de `Mascota`.
+
+`apto_con`, `estado_legal_salud`, `caracter_*` i `condicion_especial_*` es
+guarden com a text separat per comes (MultiSelectField). Filtrar-los amb
+`__contains` és un `LIKE '%VALOR%'` que no pot fer servir cap índex i dona
+falsos positius per subcadenes (`NINOS` també troba `SIN_NINOS`). Per això
+cada camp té també una columna entera `<camp>_bits` amb un bit per valor, en
+l'ordre de les choices (el primer valor és el bit 0), i els filtres i el motor
+de recomanació consulten aquesta columna amb operacions de bits.
+
+Una condició de bits (`(col & m) = m`) no pot fer servir cap índex. Per als
+camps amb poques choices, `filtrar` la reescriu com a `col IN (...)` amb
+totes les màscares possibles que contenen `m` (com a molt
+`MAX_MASCARES_IN`), que sí que pot anar per l'índex de la columna:
+`apto_con_bits` i `estado_legal_salud_bits`, els filtres del catàleg, en
+tenen un (parcial, de les visibles). El planificador només el tria si el
+filtre és selectiu; un valor que tenen la majoria de mascotes continua
+llegint-les totes.
+
+Les columnes es mantenen a `Mascota.save()` i a `bulk_create` / `bulk_update`
+/ `update` de `MascotaQuerySet`. Com que el bit depèn de la posició, les
+choices noves s'han d'afegir al final; si mai se'n reordenen o esborren, cal
+tornar a omplir les màscares (`omplir_mascares`).
+"""
+from functools import lru_cache
+
+from django.db import models
+
+
+CAMPS = (
+    'apto_con',
+    'estado_legal_salud',
+    'caracter_gato',
+    'caracter_perro',
+    'condicion_especial_gato',
+    'condicion_especial_perro',
+)
+
+# Màscares com a màxim a l'`IN (...)` de `filtrar`; amb més, es filtra amb `conte_tots`
+MAX_MASCARES_IN = 256
+
+
+def camp_bits(camp):
+    return f'{camp}_bits'
+
+
+def bits_de_choices(choices):
+    """Assigna un bit a cada valor d'unes choices, en ordre."""
+    return {valor: 1 << i for i, (valor, _) in enumerate(choices)}
+
+
+@lru_cache(maxsize=None)
+def bits(camp):
+    """Bits de cada valor del camp `camp` de Mascota."""
+    from .models import Mascota
+    return bits_de_choices(Mascota._meta.get_field(camp).choices)
+
+
+def _valors(valor):
+    """Valors d'un MultiSelectField, tant si és una llista com el text separat per comes."""
+    if not valor:
+        return []
+    if isinstance(valor, str):
+        return [v.strip() for v in valor.split(',') if v.strip()]
+    return list(valor)
+
+
+def mascara(bits_camp, valors):
+    """Màscara dels `valors` (els que no són a les choices s'ignoren)."""
+    resultat = 0
+    for valor in _valors(valors):
+        resultat |= bits_camp.get(valor, 0)
+    return resultat
+
+
+def omplir(mascota):
+    """Recalcula totes les columnes `<camp>_bits` d'una instància (sense desar-la)."""
+    for camp in CAMPS:
+        setattr(mascota, camp_bits(camp), mascara(bits(camp), getattr(mascota, camp)))
+
+
+def superconjunts(bits_camp, mascara_valors):
+    """Totes les màscares possibles del camp que contenen `mascara_valors`, en ordre creixent."""
+    lliures = sum(bits_camp.values()) & ~mascara_valors
+    resultat, subconjunt = [], lliures
+    while True:
+        resultat.append(mascara_valors | subconjunt)
+        if not subconjunt:
+            return sorted(resultat)
+        subconjunt = (subconjunt - 1) & lliures
+
+
+def filtrar(queryset, camp, valors):
+    """
+    Mascotes que tenen TOTS els `valors` (llista o text separat per comes) al
+    camp `camp`. Si algun valor no és a les choices, cap mascota no el pot tenir.
+    """
+    valors = _valors(valors)
+    bits_camp = bits(camp)
+    if any(valor not in bits_camp for valor in valors):
+        return queryset.none()
+    mascara_valors = mascara(bits_camp, valors)
+    lliures = len(bits_camp) - bin(mascara_valors).count('1')
+    if 2 ** lliures <= MAX_MASCARES_IN:
+        return queryset.filter(**{f'{camp_bits(camp)}__in': superconjunts(bits_camp, mascara_valors)})
+    return queryset.filter(**{f'{camp_bits(camp)}__conte_tots': mascara_valors})
+
+
+class MascaraBitsField(models.BigIntegerField):
+    """Columna entera amb la màscara de bits d'un MultiSelectField."""
+
+
+@MascaraBitsField.register_lookup
+class ConteTots(models.Lookup):
+    """`camp_bits__conte_tots=m`: tots els bits de `m` són actius."""
+    lookup_name = 'conte_tots'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'({lhs} & {rhs}) = {rhs}', [*lhs_params, *rhs_params, *rhs_params]
+
+
+@MascaraBitsField.register_lookup
+class ConteAlgun(models.Lookup):
+    """`camp_bits__conte_algun=m`: almenys un bit de `m` és actiu."""
+    lookup_name = 'conte_algun'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'({lhs} & {rhs}) <> 0', [*lhs_params, *rhs_params]
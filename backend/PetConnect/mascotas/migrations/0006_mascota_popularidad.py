@@ -0,0 +1,28 @@
+# Generated by Django 5.2.8 on 2026-10-18 17:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mascotas', '0005_mascota_apto_ninos_mascota_necesita_compania_animal_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mascota',
+            name='tendencia',
+            field=models.FloatField(default=0.0, editable=False, help_text='Likes amb decaïment temporal, en escala de EPOCA_TENDENCIA (vegeu mascotas.popularidad)'),
+        ),
+        migrations.AddField(
+            model_name='mascota',
+            name='total_dislikes',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='mascota',
+            name='total_likes',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.8 on 2026-10-18 17:19
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mascotas', '0006_mascota_popularidad'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PreferenciaImplicita',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_likes', models.PositiveIntegerField(default=0)),
+                ('especie', models.JSONField(blank=True, default=dict)),
+                ('tamano', models.JSONField(blank=True, default=dict)),
+                ('edad_clasificacion', models.JSONField(blank=True, default=dict)),
+                ('sexo', models.JSONField(blank=True, default=dict)),
+                ('convivencia', models.JSONField(blank=True, default=dict)),
+                ('estado_salud', models.JSONField(blank=True, default=dict)),
+                ('fecha_actualizacion', models.DateTimeField(auto_now=True)),
+                ('usuario', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='preferencia_implicita', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Preferencia implícita',
+                'verbose_name_plural': 'Preferencias implícitas',
+                'db_table': 'preferencias_implicitas',
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.8 on 2026-10-18 17:25
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mascotas', '0007_preferencia_implicita'),
+        ('usuarios', '0003_remove_perfilprotectora_nombre_protectora'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecomendacionPrecalculada',
+            fields=[
+                ('usuario', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='recomendacion_precalculada', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('ranquing', models.JSONField(blank=True, default=list)),
+                ('completo', models.BooleanField(default=False)),
+                ('fecha_calculo', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'Recomendación precalculada',
+                'verbose_name_plural': 'Recomendaciones precalculadas',
+                'db_table': 'recomendaciones_precalculadas',
+            },
+        ),
+    ]
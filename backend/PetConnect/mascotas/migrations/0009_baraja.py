@@ -0,0 +1,32 @@
+# Generated by Django 5.2.8 on 2026-10-18 17:35
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mascotas', '0008_recomendacion_precalculada'),
+        ('usuarios', '0003_remove_perfilprotectora_nombre_protectora'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Baraja',
+            fields=[
+                ('usuario', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='baraja', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('cartas', models.JSONField(blank=True, default=list)),
+                ('cursor', models.PositiveIntegerField(default=0)),
+                ('ultima_mascota_id', models.BigIntegerField(default=0)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('fecha_actualizacion', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Baraja',
+                'verbose_name_plural': 'Barajas',
+                'db_table': 'barajas',
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.8 on 2026-10-18 17:49
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mascotas', '0009_baraja'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SwipePendiente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('accion', models.CharField(choices=[('like', 'Like'), ('dislike', 'Dislike')], max_length=10)),
+                ('fecha', models.DateTimeField(default=django.utils.timezone.now)),
+                ('mascota', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='swipes_pendientes', to='mascotas.mascota')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='swipes_pendientes', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Swipe pendiente',
+                'verbose_name_plural': 'Swipes pendientes',
+                'db_table': 'swipes_pendientes',
+                'indexes': [models.Index(fields=['usuario', 'mascota'], name='swipes_pend_usuario_mascota')],
+            },
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.8 on 2026-10-18 17:53
+
+import mascotas.mascares
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mascotas', '0010_swipe_pendiente'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mascota',
+            name='apto_con_bits',
+            field=mascotas.mascares.MascaraBitsField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='mascota',
+            name='caracter_gato_bits',
+            field=mascotas.mascares.MascaraBitsField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='mascota',
+            name='caracter_perro_bits',
+            field=mascotas.mascares.MascaraBitsField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='mascota',
+            name='condicion_especial_gato_bits',
+            field=mascotas.mascares.MascaraBitsField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='mascota',
+            name='condicion_especial_perro_bits',
+            field=mascotas.mascares.MascaraBitsField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='mascota',
+            name='estado_legal_salud_bits',
+            field=mascotas.mascares.MascaraBitsField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,41 @@
+from django.db import migrations, transaction
+
+from mascotas.mascares import CAMPS, bits_de_choices, camp_bits, mascara
+
+
+MIDA_BLOC = 1000
+
+
+def omplir_mascares(apps, schema_editor):
+    """Omple les columnes `<camp>_bits` de les mascotes existents, per blocs de `MIDA_BLOC`."""
+    Mascota = apps.get_model('mascotas', 'Mascota')
+    bits = {camp: bits_de_choices(Mascota._meta.get_field(camp).choices) for camp in CAMPS}
+    camps_bits = [camp_bits(camp) for camp in CAMPS]
+
+    ultim_id = 0
+    while True:
+        bloc = list(
+            Mascota.objects.filter(pk__gt=ultim_id).order_by('pk').only('pk', *CAMPS)[:MIDA_BLOC]
+        )
+        if not bloc:
+            return
+        for mascota in bloc:
+            for camp in CAMPS:
+                setattr(mascota, camp_bits(camp), mascara(bits[camp], getattr(mascota, camp)))
+        # Una transacció per bloc: la migració no bloqueja la taula sencera
+        with transaction.atomic():
+            Mascota.objects.bulk_update(bloc, camps_bits, batch_size=MIDA_BLOC)
+        ultim_id = bloc[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('mascotas', '0011_mascota_mascares_bits'),
+    ]
+
+    operations = [
+        migrations.RunPython(omplir_mascares, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.8 on 2026-10-18 17:56
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mascotas', '0012_omplir_mascares_bits'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='interaccion',
+            index=models.Index(condition=models.Q(('accion', 'like')), fields=['usuario', 'mascota'], name='interacciones_likes'),
+        ),
+        migrations.AddIndex(
+            model_name='mascota',
+            index=models.Index(condition=models.Q(('adoptado', False), ('oculto', False)), fields=['-fecha_creacion', '-id'], name='mascotas_visibles_recents'),
+        ),
+        migrations.AddIndex(
+            model_name='mascota',
+            index=models.Index(condition=models.Q(('adoptado', False), ('oculto', False)), fields=['especie', 'tamano', '-fecha_creacion'], name='mascotas_visibles_especie'),
+        ),
+        migrations.AddIndex(
+            model_name='mascota',
+            index=models.Index(condition=models.Q(('adoptado', False), ('oculto', False)), fields=['edad_clasificacion', '-fecha_creacion'], name='mascotas_visibles_edad'),
+        ),
+        migrations.AddIndex(
+            model_name='mascota',
+            index=models.Index(fields=['protectora', '-fecha_creacion'], name='mascotas_protectora_recents'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 18:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mascotas', '0013_indexos_cataleg'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mascota',
+            name='fotos_derivades',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-18 19:02
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mascotas', '0014_mascota_fotos_derivades'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='mascota',
+            index=models.Index(condition=models.Q(('adoptado', False), ('oculto', False)), fields=['apto_con_bits'], name='mascotas_visibles_apto_con'),
+        ),
+        migrations.AddIndex(
+            model_name='mascota',
+            index=models.Index(condition=models.Q(('adoptado', False), ('oculto', False)), fields=['estado_legal_salud_bits'], name='mascotas_visibles_salud'),
+        ),
+    ]
@@ -4,8 +4,138 @@ from django.conf import settings
 from django.utils import timezone
 from multiselectfield import MultiSelectField 
 
+from . import mascares
+from .mascares import MascaraBitsField
+
+# Comptadors de Mascota que només es modifiquen amb UPDATE ... F() (mascotas.popularidad):
+# les edicions desen només els camps que canvien (`camps_edicio`) per no sobreescriure'ls
+CAMPS_POPULARITAT = ('total_likes', 'total_dislikes', 'tendencia')
+
+
+def camps_edicio(camps):
+    """`update_fields` per desar una edició de Mascota dels `camps` donats (sense els comptadors)."""
+    return (set(camps) - set(CAMPS_POPULARITAT)) | {'fecha_actualizacion'}
+
+
+def situacion_personal(perfil):
+    """Extreu la situació personal d'un PerfilUsuario (mateixes claus i defaults que pref_explicites)."""
+    return {
+        'tiene_ninos': getattr(perfil, 'tiene_ninos', False),
+        'tiene_perros': getattr(perfil, 'tiene_perros', False),
+        'tiene_gatos': getattr(perfil, 'tiene_gatos', False),
+        'tiene_otros_animales': getattr(perfil, 'tiene_otros_animales', False),
+        'es_primerizo': getattr(perfil, 'es_primerizo', True),
+        'tiene_licencia_ppp': getattr(perfil, 'tiene_licencia_ppp', False),
+    }
+
+
+def q_incompatibles(situacion):
+    """
+    Tradueix les exclusions forçoses (FASE 1 de calcular_score_preferencies_explicites)
+    a un Q que selecciona les mascotes INCOMPATIBLES amb la situació de l'usuari.
+    Retorna None si cap regla aplica.
+    """
+    condiciones = []
+
+    # 1. Nens: l'usuari té nens i la mascota no és apta
+    if situacion.get('tiene_ninos', False):
+        condiciones.append(models.Q(apto_ninos='NO_APTO_NINOS'))
+
+    # 2. Companyia animal: la mascota la necessita i l'usuari no té altres animals
+    tiene_animales = (
+        situacion.get('tiene_perros', False) or
+        situacion.get('tiene_gatos', False) or
+        situacion.get('tiene_otros_animales', False)
+    )
+    if not tiene_animales:
+        condiciones.append(models.Q(necesita_compania_animal='NECESITA_COMPANIA'))
+
+    # 3. Experiència: l'usuari és primerizo
+    if situacion.get('es_primerizo', True):
+        condiciones.append(models.Q(nivel_experiencia__in=['EXPERIENCIA', 'LICENCIA_PPP']))
+
+    # 4. Llicència PPP
+    if not situacion.get('tiene_licencia_ppp', False):
+        condiciones.append(models.Q(nivel_experiencia='LICENCIA_PPP'))
+
+    if not condiciones:
+        return None
+    q = condiciones[0]
+    for condicion in condiciones[1:]:
+        q |= condicion
+    return q
+
+
+class MascotaQuerySet(models.QuerySet):
+
+    def bulk_create(self, objs, *args, **kwargs):
+        # bulk_create no crida save(): les màscares de bits s'omplen aquí
+        objs = list(objs)
+        for mascota in objs:
+            mascares.omplir(mascota)
+        return super().bulk_create(objs, *args, **kwargs)
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        camps_bits = [mascares.camp_bits(camp) for camp in mascares.CAMPS if camp in fields]
+        if camps_bits:
+            objs = list(objs)
+            for mascota in objs:
+                mascares.omplir(mascota)
+            fields = [*fields, *(camp for camp in camps_bits if camp not in fields)]
+        return super().bulk_update(objs, fields, *args, **kwargs)
+
+    def update(self, **kwargs):
+        # update() tampoc crida save(): si canvia un camp amb màscara, també se n'escriu la columna de bits
+        for camp in mascares.CAMPS:
+            if camp in kwargs and mascares.camp_bits(camp) not in kwargs:
+                if hasattr(kwargs[camp], 'resolve_expression'):
+                    raise ValueError(
+                        f"update() no pot calcular {mascares.camp_bits(camp)} a partir d'una expressió: "
+                        "feu servir save() o bulk_update()."
+                    )
+                kwargs[mascares.camp_bits(camp)] = mascares.mascara(mascares.bits(camp), kwargs[camp])
+        return super().update(**kwargs)
+
+    def compatibles_con(self, perfil):
+        """
+        Exclou a la BD les mascotes incompatibles amb la situació personal de l'usuari.
+
+        `perfil` pot ser un PerfilUsuario, un diccionari amb les mateixes claus
+        que `obtenir_preferencies_explicites` o None (sense filtre).
+        """
+        if perfil is None:
+            return self
+        situacion = perfil if isinstance(perfil, dict) else situacion_personal(perfil)
+        q = q_incompatibles(situacion)
+        return self.exclude(q) if q is not None else self
+
+    def per_serialitzar(self):
+        """
+        Carrega la protectora amb un JOIN: `MascotaSerializer` en llegeix el nom
+        i la ciutat, i sense això cada mascota d'una llista faria una consulta més.
+        Tot queryset que alimenti el serialitzador ha de passar per aquí.
+        """
+        return self.select_related('protectora')
+
+    def no_vistes_per(self, usuario):
+        """
+        Exclou les mascotes que l'usuari ja ha swipejat.
+
+        És un NOT EXISTS correlacionat (anti-join) que consulta l'índex únic
+        (usuario, mascota) d'`interacciones` per a cada candidata, en lloc d'un
+        NOT IN sobre tots els ids vistos: el cost no creix amb l'historial de l'usuari.
+        També compten com a vistos els swipes encara pendents d'aplicar (`SwipePendiente`).
+        """
+        return self.filter(
+            ~models.Exists(Interaccion.objects.filter(usuario=usuario, mascota=models.OuterRef('pk'))),
+            ~models.Exists(SwipePendiente.objects.filter(usuario=usuario, mascota=models.OuterRef('pk'))),
+        )
+
+
 class Mascota(models.Model):
 
+    objects = MascotaQuerySet.as_manager()
+
     ESPECIES_CHOICES = [
         ('PERRO', 'Perro'),
         ('GATO', 'Gato'),
@@ -435,6 +565,8 @@ class Mascota(models.Model):
     foto = models.ImageField(upload_to='mascotas/', verbose_name="Foto")
     foto2 = models.ImageField(upload_to='mascotas/', verbose_name="Foto 2", blank=True, null=True)
     foto3 = models.ImageField(upload_to='mascotas/', verbose_name="Foto 3", blank=True, null=True)
+    # Variants redimensionades de les fotos, generades en segon pla (mascotas.imatges)
+    fotos_derivades = models.JSONField(default=dict, blank=True, editable=False)
     
     # Descripción/Biografía del animal 
     descripcion = models.TextField(
@@ -462,9 +594,34 @@ class Mascota(models.Model):
             # Si se desmarca como adoptado, limpia la fecha
             elif not self.adoptado and self.fecha_adopcion:
                 self.fecha_adopcion = None
-                
+
+            # Màscares de bits dels camps de selecció múltiple (mascotas.mascares)
+            mascares.omplir(self)
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | {
+                    mascares.camp_bits(camp) for camp in mascares.CAMPS if camp in update_fields
+                } | ({'fecha_adopcion'} if 'adoptado' in update_fields else set())
+
             super().save(*args, **kwargs)    
 
+    # Popularitat desnormalitzada (mantinguda per mascotas.signals / mascotas.popularidad)
+    total_likes = models.PositiveIntegerField(default=0, editable=False)
+    total_dislikes = models.PositiveIntegerField(default=0, editable=False)
+    tendencia = models.FloatField(
+        default=0.0,
+        editable=False,
+        help_text="Likes amb decaïment temporal, en escala de EPOCA_TENDENCIA (vegeu mascotas.popularidad)"
+    )
+
+    # Màscares de bits dels camps de selecció múltiple, per filtrar-los a la BD (mascotas.mascares)
+    apto_con_bits = MascaraBitsField(default=0, editable=False)
+    estado_legal_salud_bits = MascaraBitsField(default=0, editable=False)
+    caracter_gato_bits = MascaraBitsField(default=0, editable=False)
+    caracter_perro_bits = MascaraBitsField(default=0, editable=False)
+    condicion_especial_gato_bits = MascaraBitsField(default=0, editable=False)
+    condicion_especial_perro_bits = MascaraBitsField(default=0, editable=False)
+
     # Fechas
     fecha_creacion = models.DateTimeField(auto_now_add=True)
     fecha_actualizacion = models.DateTimeField(auto_now=True)
@@ -488,6 +645,42 @@ class Mascota(models.Model):
         verbose_name = "Mascota"
         verbose_name_plural = "Mascotas"
         ordering = ['-fecha_creacion']
+        # Dissenyats a partir de les consultes reals (vegeu la comanda `explicar_consultes`).
+        # Els parcials només indexen les mascotes visibles (no adoptades ni ocultes),
+        # que són les que llisten el catàleg públic, el feed i les recomanacions.
+        indexes = [
+            # Llistat públic: visibles per data de creació (amb id per desempatar)
+            models.Index(
+                fields=['-fecha_creacion', '-id'],
+                condition=models.Q(adoptado=False, oculto=False),
+                name='mascotas_visibles_recents',
+            ),
+            # Filtres ?especie= i ?especie=&tamano= del llistat
+            models.Index(
+                fields=['especie', 'tamano', '-fecha_creacion'],
+                condition=models.Q(adoptado=False, oculto=False),
+                name='mascotas_visibles_especie',
+            ),
+            # Filtre ?edad= del llistat
+            models.Index(
+                fields=['edad_clasificacion', '-fecha_creacion'],
+                condition=models.Q(adoptado=False, oculto=False),
+                name='mascotas_visibles_edad',
+            ),
+            # Filtres ?apto_con= i ?estado_salud= (mascares.filtrar: `IN` de màscares)
+            models.Index(
+                fields=['apto_con_bits'],
+                condition=models.Q(adoptado=False, oculto=False),
+                name='mascotas_visibles_apto_con',
+            ),
+            models.Index(
+                fields=['estado_legal_salud_bits'],
+                condition=models.Q(adoptado=False, oculto=False),
+                name='mascotas_visibles_salud',
+            ),
+            # mis_mascotas i la vista de protectora: totes les seves, per data
+            models.Index(fields=['protectora', '-fecha_creacion'], name='mascotas_protectora_recents'),
+        ]
 
 
 class Interaccion(models.Model):
@@ -519,6 +712,128 @@ class Interaccion(models.Model):
         verbose_name_plural = "Interacciones"
         unique_together = ('usuario', 'mascota')  
         ordering = ['-fecha']
+        indexes = [
+            # Likes d'un usuari (favoritos, preferits, histograma implícit) sense llegir la taula
+            models.Index(
+                fields=['usuario', 'mascota'],
+                condition=models.Q(accion='like'),
+                name='interacciones_likes',
+            ),
+        ]
     
     def __str__(self):
         return f"{self.usuario.username} - {self.accion} - {self.mascota.nombre}"
+
+
+class PreferenciaImplicita(models.Model):
+    """
+    Histograma persistent dels likes d'un usuari (preferències implícites de la IA 2).
+    Es manté incrementalment des de mascotas.signals cada cop que es crea,
+    modifica o esborra una Interaccion (vegeu mascotas.preferencias).
+    """
+    usuario = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='preferencia_implicita'
+    )
+    total_likes = models.PositiveIntegerField(default=0)
+    especie = models.JSONField(default=dict, blank=True)
+    tamano = models.JSONField(default=dict, blank=True)
+    edad_clasificacion = models.JSONField(default=dict, blank=True)
+    sexo = models.JSONField(default=dict, blank=True)
+    convivencia = models.JSONField(default=dict, blank=True)
+    estado_salud = models.JSONField(default=dict, blank=True)
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'preferencias_implicitas'
+        verbose_name = "Preferencia implícita"
+        verbose_name_plural = "Preferencias implícitas"
+
+    def __str__(self):
+        return f"{self.usuario.username} - {self.total_likes} likes"
+
+
+class RecomendacionPrecalculada(models.Model):
+    """
+    Top-N de recomanacions calculat offline (`precompute_recommendations`).
+    `ranquing` és una llista compacta de [mascota_id, score, score_explicites, score_implicites].
+    """
+    usuario = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='recomendacion_precalculada'
+    )
+    ranquing = models.JSONField(default=list, blank=True)
+    # Cert si el rànquing conté tots els candidats (n'hi havia menys que el top demanat)
+    completo = models.BooleanField(default=False)
+    fecha_calculo = models.DateTimeField()
+
+    class Meta:
+        db_table = 'recomendaciones_precalculadas'
+        verbose_name = "Recomendación precalculada"
+        verbose_name_plural = "Recomendaciones precalculadas"
+
+    def __str__(self):
+        return f"{self.usuario_id} - {len(self.ranquing)} mascotas"
+
+
+class Baraja(models.Model):
+    """
+    Baralla barrejada de mascotes pendents de l'usuari per al swipe
+    (vegeu mascotas.baraja). `cartas` és una finestra d'ids en ordre aleatori
+    i `cursor` la posició de la carta actual: la següent carta és una
+    consulta per clau primària, no un ORDER BY random() de tot el catàleg.
+    """
+    usuario = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='baraja'
+    )
+    cartas = models.JSONField(default=list, blank=True)
+    cursor = models.PositiveIntegerField(default=0)
+    # Id de mascota més alt conegut en construir/actualitzar la baralla: les
+    # mascotes amb id superior són noves i s'hi barregen en la següent lectura
+    ultima_mascota_id = models.BigIntegerField(default=0)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'barajas'
+        verbose_name = "Baraja"
+        verbose_name_plural = "Barajas"
+
+    def __str__(self):
+        return f"{self.usuario_id} - {self.cursor}/{len(self.cartas)}"
+
+
+class SwipePendiente(models.Model):
+    """
+    Swipe rebut en mode write-behind (`SWIPES_WRITE_BEHIND`) i encara no aplicat
+    a `interacciones`. És una taula de només insercions: el flusher
+    (`buidar_swipes_pendents`) agrupa els esdeveniments per (usuario, mascota),
+    els aplica per lots i els esborra.
+    """
+    usuario = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='swipes_pendientes'
+    )
+    mascota = models.ForeignKey(
+        Mascota,
+        on_delete=models.CASCADE,
+        related_name='swipes_pendientes'
+    )
+    accion = models.CharField(max_length=10, choices=Interaccion.ACCION_CHOICES)
+    fecha = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = 'swipes_pendientes'
+        verbose_name = "Swipe pendiente"
+        verbose_name_plural = "Swipes pendientes"
+        indexes = [models.Index(fields=['usuario', 'mascota'], name='swipes_pend_usuario_mascota')]
+
+    def __str__(self):
+        return f"{self.usuario_id} - {self.accion} - {self.mascota_id}"
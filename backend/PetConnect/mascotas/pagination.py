@@ -0,0 +1,102 @@
+"""
+Paginació per clau (keyset) del catàleg públic de mascotes.
+
+`PageNumberPagination` fa un `COUNT(*)` del catàleg filtrat i un `OFFSET`
+que creix amb la pàgina. En mode cursor (`?paginacio=cursor`) cada pàgina és
+`WHERE (fecha_creacion, id) < (cursor) ORDER BY fecha_creacion DESC, id DESC
+LIMIT n`, que recorre l'índex `mascotas_visibles_recents` des del punt on es
+va quedar la pàgina anterior: el cost no depèn de la profunditat.
+"""
+import base64
+import binascii
+import json
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+PARAMETRE_MODE = 'paginacio'
+PARAMETRE_CURSOR = 'cursor'
+
+
+def mode_cursor(request):
+    """Cert si la petició demana paginació per cursor."""
+    return request.query_params.get(PARAMETRE_MODE) == 'cursor' or PARAMETRE_CURSOR in request.query_params
+
+
+def codificar_cursor(mascota):
+    """Cursor opac que apunta just després de `mascota` (instància o fila de `.values()`) en l'ordre del catàleg."""
+    if isinstance(mascota, dict):
+        dades = {'f': mascota['fecha_creacion'].isoformat(), 'i': mascota['id']}
+    else:
+        dades = {'f': mascota.fecha_creacion.isoformat(), 'i': mascota.pk}
+    return base64.urlsafe_b64encode(json.dumps(dades).encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    """(fecha_creacion, id) d'un cursor de `codificar_cursor`. Llença ValueError si no és vàlid."""
+    try:
+        dades = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        fecha, mascota_id = parse_datetime(dades['f']), dades['i']
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError, KeyError) as exc:
+        raise ValueError('Cursor no vàlid.') from exc
+    if fecha is None or not isinstance(mascota_id, int):
+        raise ValueError('Cursor no vàlid.')
+    return fecha, mascota_id
+
+
+class MascotaCursorPagination(BasePagination):
+    """
+    Pàgines de `page_size` mascotes en ordre (-fecha_creacion, -id), sense
+    COUNT ni OFFSET. Respon `{'next': url | null, 'results': [...]}`; els
+    filtres (django-filter, SearchFilter i els de `get_queryset`) s'apliquen
+    abans i es conserven a l'enllaç `next`.
+    """
+    page_size = 12
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        queryset = queryset.order_by('-fecha_creacion', '-id')
+
+        cursor = request.query_params.get(PARAMETRE_CURSOR)
+        if cursor:
+            try:
+                fecha, mascota_id = decodificar_cursor(cursor)
+            except ValueError as exc:
+                raise ValidationError({PARAMETRE_CURSOR: str(exc)})
+            # El `fecha_creacion <= fecha` redundant permet començar el recorregut de
+            # l'índex al cursor (la disjunció sola no la fan servir tots els motors)
+            queryset = queryset.filter(
+                Q(fecha_creacion__lte=fecha),
+                Q(fecha_creacion__lt=fecha) | Q(fecha_creacion=fecha, id__lt=mascota_id),
+            )
+
+        # Una fila de més per saber si hi ha pàgina següent sense comptar
+        pagina = list(queryset[:self.page_size + 1])
+        self.seguent = codificar_cursor(pagina[self.page_size - 1]) if len(pagina) > self.page_size else None
+        return pagina[:self.page_size]
+
+    def get_next_link(self):
+        if self.seguent is None:
+            return None
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, PARAMETRE_MODE, 'cursor')
+        url = remove_query_param(url, 'page')
+        return replace_query_param(url, PARAMETRE_CURSOR, self.seguent)
+
+    def get_paginated_response(self, data):
+        return Response({'next': self.get_next_link(), 'results': data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
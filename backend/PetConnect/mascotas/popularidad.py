@@ -0,0 +1,137 @@
+"""
+Comptadors de popularitat desnormalitzats de `Mascota`.
+
+- `total_likes` / `total_dislikes`: nombre d'interaccions actuals de cada tipus.
+- `tendencia`: likes amb decaïment exponencial (semivida `SEMIVIDA_TENDENCIA`).
+
+Per poder actualitzar la tendència amb un simple `F('tendencia') + pes`, cada
+like suma `2 ** ((fecha - EPOCA_TENDENCIA) / SEMIVIDA_TENDENCIA)`: el valor
+guardat està en l'escala de l'època i `tendencia_actual()` el reporta a ara.
+Amb una semivida de 7 dies l'escala no desborda fins d'aquí ~19 anys.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db import transaction
+from django.db.models import Case, F, FloatField, IntegerField, Value, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import Mascota, Interaccion
+
+
+EPOCA_TENDENCIA = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+SEMIVIDA_TENDENCIA = timedelta(days=7)
+
+
+def pes_tendencia(fecha):
+    """Pes d'un like fet a `fecha`, en l'escala de l'època."""
+    return 2 ** ((fecha - EPOCA_TENDENCIA) / SEMIVIDA_TENDENCIA)
+
+
+def tendencia_actual(mascota, ara=None):
+    """Valor de tendència de la mascota reportat al moment `ara`."""
+    return mascota.tendencia / pes_tendencia(ara or timezone.now())
+
+
+def deltas_canvi_accio(accion_anterior, accion_nueva, fecha):
+    """
+    Calcula els increments dels comptadors per a un canvi d'acció.
+    `None` vol dir que la interacció no existia (creació) o deixa d'existir (esborrat).
+    """
+    deltas = {'total_likes': 0, 'total_dislikes': 0, 'tendencia': 0.0}
+    if accion_anterior == accion_nueva:
+        return deltas
+
+    pes = pes_tendencia(fecha)
+    if accion_anterior == 'like':
+        deltas['total_likes'] -= 1
+        deltas['tendencia'] -= pes
+    elif accion_anterior == 'dislike':
+        deltas['total_dislikes'] -= 1
+
+    if accion_nueva == 'like':
+        deltas['total_likes'] += 1
+        deltas['tendencia'] += pes
+    elif accion_nueva == 'dislike':
+        deltas['total_dislikes'] += 1
+    return deltas
+
+
+def aplicar_deltas(mascota_id, deltas):
+    """UPDATE atòmic dels comptadors d'una mascota (sense llegir-la abans)."""
+    if not any(deltas.values()):
+        return
+    Mascota.objects.filter(pk=mascota_id).update(
+        total_likes=Greatest(F('total_likes') + deltas['total_likes'], 0),
+        total_dislikes=Greatest(F('total_dislikes') + deltas['total_dislikes'], 0),
+        tendencia=Greatest(F('tendencia') + deltas['tendencia'], 0.0),
+    )
+
+
+def aplicar_canvi_accio(mascota_id, accion_anterior, accion_nueva, fecha):
+    aplicar_deltas(mascota_id, deltas_canvi_accio(accion_anterior, accion_nueva, fecha))
+
+
+def aplicar_deltas_en_bloc(deltas_per_mascota):
+    """
+    Com `aplicar_deltas`, però per a moltes mascotes amb un sol UPDATE
+    (un CASE per camp). `deltas_per_mascota` és {mascota_id: deltas}.
+    """
+    deltas_per_mascota = {
+        mascota_id: deltas for mascota_id, deltas in deltas_per_mascota.items() if any(deltas.values())
+    }
+    if not deltas_per_mascota:
+        return
+
+    def increment(camp, output_field):
+        return Case(
+            *[When(pk=mascota_id, then=Value(deltas[camp])) for mascota_id, deltas in deltas_per_mascota.items()],
+            default=Value(0),
+            output_field=output_field,
+        )
+
+    Mascota.objects.filter(pk__in=deltas_per_mascota).update(
+        total_likes=Greatest(F('total_likes') + increment('total_likes', IntegerField()), 0),
+        total_dislikes=Greatest(F('total_dislikes') + increment('total_dislikes', IntegerField()), 0),
+        tendencia=Greatest(F('tendencia') + increment('tendencia', FloatField()), 0.0),
+    )
+
+
+def reconciliar_comptadors(chunk_size=1000):
+    """
+    Reconstrueix els comptadors de totes les mascotes a partir de `interacciones`,
+    per blocs de `chunk_size` mascotes. Retorna el nombre de mascotes processades.
+    """
+    processades = 0
+    ultim_id = 0
+    while True:
+        ids = list(
+            Mascota.objects.filter(pk__gt=ultim_id)
+            .order_by('pk')
+            .values_list('pk', flat=True)[:chunk_size]
+        )
+        if not ids:
+            return processades
+
+        comptadors = {
+            mascota_id: {'total_likes': 0, 'total_dislikes': 0, 'tendencia': 0.0}
+            for mascota_id in ids
+        }
+        interaccions = Interaccion.objects.filter(
+            mascota_id__gte=ids[0], mascota_id__lte=ids[-1]
+        ).values_list('mascota_id', 'accion', 'fecha').order_by()
+        for mascota_id, accion, fecha in interaccions.iterator(chunk_size=chunk_size * 10):
+            if mascota_id not in comptadors:
+                continue
+            deltas = deltas_canvi_accio(None, accion, fecha)
+            for camp, valor in deltas.items():
+                comptadors[mascota_id][camp] += valor
+
+        with transaction.atomic():
+            Mascota.objects.bulk_update(
+                [Mascota(pk=mascota_id, **valors) for mascota_id, valors in comptadors.items()],
+                ['total_likes', 'total_dislikes', 'tendencia'],
+            )
+
+        processades += len(ids)
+        ultim_id = ids[-1]
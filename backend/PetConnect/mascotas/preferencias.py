@@ -0,0 +1,165 @@
+"""
+Preferències implícites persistides (histograma de likes per usuari).
+
+Cada like suma 1 als comptadors del valor de la mascota per a espècie,
+tamany, edat, sexe, convivència (apto_con) i estat de salut; quan el like
+desapareix (passa a dislike o s'esborra) es resta. El resultat és el mateix
+diccionari que calculava `obtenir_preferencies_implicites` recorrent tots
+els likes, però es llegeix amb una sola consulta.
+
+Nota: l'histograma usa els atributs que tenia la mascota en el moment del
+like. `reconstruir_preferencias_implicitas` el recalcula des de zero.
+"""
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from .models import Interaccion, PreferenciaImplicita
+
+
+HISTOGRAMES = ('especie', 'tamano', 'edad_clasificacion', 'sexo', 'convivencia', 'estado_salud')
+
+# Camps de Mascota que alimenten cada histograma (mateix ordre que HISTOGRAMES)
+CAMPS_MASCOTA = ('especie', 'tamano', 'edad_clasificacion', 'genero', 'apto_con', 'estado_legal_salud')
+
+
+def valors_histograma(especie, tamano, edad_clasificacion, genero, apto_con, estado_legal_salud):
+    """Valors que aporta una mascota a cada histograma."""
+    return {
+        'especie': [especie or 'DESCONOCIDO'],
+        'tamano': [tamano or 'DESCONOCIDO'],
+        'edad_clasificacion': [edad_clasificacion or 'DESCONOCIDO'],
+        'sexo': [genero or 'DESCONOCIDO'],
+        'convivencia': list(apto_con or []),
+        'estado_salud': list(estado_legal_salud or []),
+    }
+
+
+def valors_de_mascota(mascota):
+    return valors_histograma(*(getattr(mascota, camp, None) for camp in CAMPS_MASCOTA))
+
+
+def sumar_valors(histogrames, valors, signe):
+    """Suma (signe=1) o resta (signe=-1) els valors d'una mascota als histogrames."""
+    for clau, llista in valors.items():
+        histograma = histogrames[clau]
+        for valor in llista:
+            nou = histograma.get(valor, 0) + signe
+            if nou > 0:
+                histograma[valor] = nou
+            else:
+                histograma.pop(valor, None)
+
+
+def histogrames_buits():
+    return {clau: {} for clau in HISTOGRAMES}
+
+
+def a_preferencies(perfil):
+    """Converteix el model al diccionari de preferències implícites (None si no té likes)."""
+    if perfil is None or perfil.total_likes == 0:
+        return None
+    preferencies = {clau: dict(getattr(perfil, clau)) for clau in HISTOGRAMES}
+    preferencies['total_likes'] = perfil.total_likes
+    return preferencies
+
+
+def reconstruir(usuario_id):
+    """Recalcula des de zero l'histograma d'un usuari a partir dels seus likes."""
+    histogrames = histogrames_buits()
+    total_likes = 0
+    likes = Interaccion.objects.filter(usuario_id=usuario_id, accion='like').values_list(
+        *(f'mascota__{camp}' for camp in CAMPS_MASCOTA)
+    ).order_by()
+    for fila in likes.iterator():
+        sumar_valors(histogrames, valors_histograma(*fila), 1)
+        total_likes += 1
+
+    perfil, _ = PreferenciaImplicita.objects.update_or_create(
+        usuario_id=usuario_id,
+        defaults={'total_likes': total_likes, **histogrames},
+    )
+    return perfil
+
+
+def preferencies_implicites(usuario):
+    """Preferències implícites de l'usuari en O(1) consultes (es construeixen la primera vegada)."""
+    try:
+        perfil = PreferenciaImplicita.objects.get(usuario=usuario)
+    except PreferenciaImplicita.DoesNotExist:
+        perfil = reconstruir(usuario.pk)
+    return a_preferencies(perfil)
+
+
+def aplicar_canvi_accio(usuario_id, mascota, accion_anterior, accion_nueva, crear=True):
+    """
+    Actualitza incrementalment l'histograma quan una interacció canvia d'acció.
+    `None` vol dir interacció inexistent (creació) o esborrada.
+
+    Si l'usuari encara no té histograma i `crear` és cert, es reconstrueix
+    sencer (ja inclou el canvi actual); si no, no es fa res.
+    """
+    aplicar_canvis(usuario_id, [(mascota, accion_anterior, accion_nueva)], crear=crear)
+
+
+def aplicar_canvis(usuario_id, canvis, crear=True):
+    """
+    Com `aplicar_canvi_accio` per a diversos canvis de l'usuari alhora
+    (llista de (mascota, accion_anterior, accion_nueva)), amb una sola escriptura.
+    """
+    canvis = [
+        (mascota, (nueva == 'like') - (anterior == 'like'))
+        for mascota, anterior, nueva in canvis
+    ]
+    canvis = [(mascota, signe) for mascota, signe in canvis if signe != 0]
+    if not canvis:
+        return
+
+    with transaction.atomic():
+        perfil = PreferenciaImplicita.objects.select_for_update().filter(usuario_id=usuario_id).first()
+        if perfil is None:
+            if crear:
+                reconstruir(usuario_id)
+            return
+
+        histogrames = {clau: getattr(perfil, clau) for clau in HISTOGRAMES}
+        for mascota, signe in canvis:
+            sumar_valors(histogrames, valors_de_mascota(mascota), signe)
+            perfil.total_likes = max(0, perfil.total_likes + signe)
+        for clau, histograma in histogrames.items():
+            setattr(perfil, clau, histograma)
+        perfil.save()
+
+
+def reconstruir_tots(chunk_size=500):
+    """
+    Backfill: reconstrueix l'histograma de tots els usuaris, per blocs de
+    `chunk_size` usuaris. Retorna el nombre d'usuaris processats.
+    """
+    Usuario = get_user_model()
+    processats = 0
+    ultim_id = 0
+    while True:
+        ids = list(
+            Usuario.objects.filter(pk__gt=ultim_id).order_by('pk').values_list('pk', flat=True)[:chunk_size]
+        )
+        if not ids:
+            return processats
+
+        histogrames = {usuario_id: histogrames_buits() for usuario_id in ids}
+        totals = dict.fromkeys(ids, 0)
+        likes = Interaccion.objects.filter(usuario_id__in=ids, accion='like').values_list(
+            'usuario_id', *(f'mascota__{camp}' for camp in CAMPS_MASCOTA)
+        ).order_by()
+        for usuario_id, *fila in likes.iterator(chunk_size=chunk_size * 10):
+            sumar_valors(histogrames[usuario_id], valors_histograma(*fila), 1)
+            totals[usuario_id] += 1
+
+        with transaction.atomic():
+            PreferenciaImplicita.objects.filter(usuario_id__in=ids).delete()
+            PreferenciaImplicita.objects.bulk_create([
+                PreferenciaImplicita(usuario_id=usuario_id, total_likes=totals[usuario_id], **histogrames[usuario_id])
+                for usuario_id in ids
+            ])
+
+        processats += len(ids)
+        ultim_id = ids[-1]
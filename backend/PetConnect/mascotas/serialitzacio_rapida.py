@@ -0,0 +1,184 @@
+"""
+Serialització ràpida de `MascotaSerializer` per als endpoints de lectura més
+consultats (catàleg, lots del feed i recomanacions).
+
+DRF resol cada camp de cada mascota amb `get_attribute` + `to_representation`
+(i un `get_*_display`, un `FieldFile.url` i un `build_absolute_uri` per foto).
+Aquí el pla de camps es compila una vegada a partir dels camps del mateix
+`MascotaSerializer` (diccionaris d'etiquetes de les choices, tipus de cada
+camp) i cada mascota és una fila de `.values(*COLUMNES)` que es converteix en
+un diccionari amb funcions ja resoltes; per petició només es calcula el prefix
+absolut de les URL de media.
+
+La sortida ha de ser idèntica (byte a byte un cop renderitzada) a la de
+`MascotaSerializer`, inclosos `?fields=` / `?omit=` i els camps que es treuen
+segons l'espècie: ho comprova `SerialitzacioRapidaTests`. Si s'afegeix al
+serializer un camp d'un tipus que aquí no es coneix, `pla()` falla en lloc de
+donar una sortida diferent. `MASCOTES_SERIALITZACIO_RAPIDA = False` torna a
+fer servir DRF a tot arreu.
+"""
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.utils import timezone
+from django.utils.encoding import filepath_to_uri, force_str
+from rest_framework import ISO_8601, fields, relations
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.settings import api_settings
+
+from . import imatges
+
+
+def activa(request):
+    """Cert si la lectura es pot servir amb la serialització ràpida (representació completa)."""
+    from .serializers import MascotaSerializer, serializer_per_vista
+    return (
+        getattr(settings, 'MASCOTES_SERIALITZACIO_RAPIDA', True)
+        and request.method in SAFE_METHODS
+        and serializer_per_vista(request) is MascotaSerializer
+    )
+
+
+def _columna(source):
+    """Columna de `.values()` d'un `source` de DRF ('protectora.city' -> 'protectora__city')."""
+    return source.replace('.', '__')
+
+
+@lru_cache(maxsize=None)
+def pla():
+    """
+    Llista de (nom, columna, tipus, dades) per a cada camp de `MascotaSerializer`,
+    en el seu ordre. `tipus` indica la conversió que fa DRF per a aquell camp.
+    """
+    from .models import Mascota
+    from .serializers import MascotaSerializer
+
+    camps = []
+    for nom, camp in MascotaSerializer().fields.items():
+        if camp.write_only:
+            continue
+        if isinstance(camp, fields.SerializerMethodField):
+            if nom != 'fotos_srcset':
+                raise ImproperlyConfigured(f'Serialització ràpida: camp de mètode desconegut `{nom}`.')
+            camps.append((nom, None, 'srcset', None))
+        elif isinstance(camp, relations.PrimaryKeyRelatedField):
+            camps.append((nom, f'{camp.source}_id', 'pk', None))
+        elif camp.source.startswith('get_') and camp.source.endswith('_display'):
+            model_camp = Mascota._meta.get_field(camp.source[len('get_'):-len('_display')])
+            etiquetes = {valor: force_str(etiqueta, strings_only=True) for valor, etiqueta in model_camp.flatchoices}
+            camps.append((nom, model_camp.attname, 'display', etiquetes))
+        elif isinstance(camp, fields.ChoiceField):
+            camps.append((nom, _columna(camp.source), 'choice', camp.choice_strings_to_values))
+        elif isinstance(camp, fields.FileField):
+            camps.append((nom, _columna(camp.source), 'fitxer', None))
+        elif isinstance(camp, fields.DateTimeField):
+            if getattr(camp, 'format', api_settings.DATETIME_FORMAT) != ISO_8601:
+                raise ImproperlyConfigured('Serialització ràpida: només DATETIME_FORMAT ISO 8601.')
+            camps.append((nom, _columna(camp.source), 'data_hora', None))
+        elif isinstance(camp, fields.DateField):
+            if getattr(camp, 'format', api_settings.DATE_FORMAT) != ISO_8601:
+                raise ImproperlyConfigured('Serialització ràpida: només DATE_FORMAT ISO 8601.')
+            camps.append((nom, _columna(camp.source), 'data', None))
+        elif isinstance(camp, fields.BooleanField):
+            camps.append((nom, _columna(camp.source), 'boolea', None))
+        elif isinstance(camp, fields.IntegerField):
+            camps.append((nom, _columna(camp.source), 'enter', None))
+        elif isinstance(camp, fields.FloatField):
+            camps.append((nom, _columna(camp.source), 'real', None))
+        elif type(camp) is fields.CharField:
+            camps.append((nom, _columna(camp.source), 'text', None))
+        else:
+            raise ImproperlyConfigured(
+                f'Serialització ràpida: tipus de camp no suportat `{type(camp).__name__}` ({nom}).'
+            )
+    return camps
+
+
+@lru_cache(maxsize=None)
+def columnes():
+    """Columnes que cal demanar a `.values()` per serialitzar."""
+    resultat = ['especie']
+    for _, columna, tipus, _ in pla():
+        if tipus == 'srcset':
+            resultat += ['fotos_derivades', *imatges.CAMPS_FOTO]
+        elif columna not in resultat:
+            resultat.append(columna)
+    return tuple(dict.fromkeys(resultat))
+
+
+def files(queryset):
+    """El queryset com a files per a `serialitzar` (sense el select_related, que `.values()` no necessita)."""
+    return queryset.values(*columnes())
+
+
+def url_media(request):
+    """
+    Funció nom -> URL absoluta del fitxer, igual que `request.build_absolute_uri(fitxer.url)`.
+    Amb l'emmagatzematge local i un MEDIA_URL relatiu, el prefix es calcula un sol cop.
+    """
+    if isinstance(default_storage, FileSystemStorage) and default_storage.base_url.startswith('/'):
+        prefix = request.build_absolute_uri(default_storage.base_url)
+        return lambda nom: prefix + filepath_to_uri(nom).lstrip('/')
+    return lambda nom: request.build_absolute_uri(default_storage.url(nom))
+
+
+def _convertidor(tipus, dades, url, zona):
+    if tipus == 'pk' or tipus == 'enter':
+        return int
+    if tipus == 'text':
+        return str
+    if tipus == 'real':
+        return float
+    if tipus == 'boolea':
+        return bool
+    if tipus == 'display':
+        return lambda valor: str(dades.get(valor, valor))
+    if tipus == 'choice':
+        return lambda valor: valor if valor == '' else dades.get(str(valor), valor)
+    if tipus == 'fitxer':
+        return lambda valor: url(valor) if valor else None
+    if tipus == 'data':
+        return lambda valor: valor.isoformat() if valor else None
+    if tipus == 'data_hora':
+        def data_hora(valor):
+            if not valor:
+                return None
+            if zona is not None:
+                valor = valor.astimezone(zona)
+            text = valor.isoformat()
+            return text[:-6] + 'Z' if text.endswith('+00:00') else text
+        return data_hora
+    raise ImproperlyConfigured(f'Serialització ràpida: tipus desconegut `{tipus}`.')
+
+
+def serialitzar(files_mascotes, request):
+    """Llista de diccionaris amb la mateixa sortida que `MascotaSerializer(..., many=True).data`."""
+    from .serializers import CAMPS_EXCLOSOS_PER_ESPECIE, camps_seleccionats
+
+    url = url_media(request)
+    zona = timezone.get_current_timezone() if settings.USE_TZ else None
+    noms = set(camps_seleccionats([nom for nom, *_ in pla()], request))
+    compilat = [
+        (nom, columna, tipus == 'srcset', _convertidor(tipus, dades, url, zona) if tipus != 'srcset' else None)
+        for nom, columna, tipus, dades in pla()
+        if nom in noms
+    ]
+
+    resultat = []
+    for fila in files_mascotes:
+        excloure = CAMPS_EXCLOSOS_PER_ESPECIE.get(fila['especie'], ())
+        rep = {}
+        for nom, columna, es_srcset, convertir in compilat:
+            if nom in excloure:
+                continue
+            if es_srcset:
+                rep[nom] = imatges.srcset_de(
+                    fila['fotos_derivades'], {camp: fila[camp] for camp in imatges.CAMPS_FOTO}, url,
+                )
+                continue
+            valor = fila[columna]
+            rep[nom] = None if valor is None else convertir(valor)
+        resultat.append(rep)
+    return resultat
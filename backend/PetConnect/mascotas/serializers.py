@@ -1,10 +1,50 @@
 from rest_framework import serializers
-from .models import Mascota
+from rest_framework.fields import SkipField
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.relations import PKOnlyObject
+from .models import CAMPS_POPULARITAT, Mascota, camps_edicio
+from . import imatges, mascares
 from ai_service.views import simular_generacion_ia
 
 
+# Camps de l'altra espècie, que no s'inclouen a la representació d'una mascota
+CAMPS_NOMES_GATO = ('raza_gato', 'raza_gato_display', 'color_pelaje_gato', 'caracter_gato', 'condicion_especial_gato')
+CAMPS_NOMES_PERRO = (
+    'raza_perro', 'raza_perro_display', 'color_pelaje_perro', 'caracter_perro', 'condicion_especial_perro',
+)
+CAMPS_EXCLOSOS_PER_ESPECIE = {'PERRO': frozenset(CAMPS_NOMES_GATO), 'GATO': frozenset(CAMPS_NOMES_PERRO)}
 
-class MascotaSerializer(serializers.ModelSerializer):
+
+def _llista_parametre(valor):
+    return {nom.strip() for nom in valor.split(',') if nom.strip()} if valor else set()
+
+
+def camps_seleccionats(noms, request):
+    """Els `noms` de camp que queden després d'aplicar `?fields=` i `?omit=` (en lectures)."""
+    if request is None or request.method not in SAFE_METHODS:
+        return list(noms)
+    fields = _llista_parametre(request.query_params.get('fields'))
+    omit = _llista_parametre(request.query_params.get('omit'))
+    return [nom for nom in noms if (not fields or nom in fields) and nom not in omit]
+
+
+class CampsDinamicsMixin:
+    """
+    Conjunts de camps a demanda per a les lectures: `?fields=a,b` només inclou
+    aquests camps i `?omit=a,b` els treu. Els camps es descarten en construir
+    el serializer, abans de calcular-ne cap valor. Els noms desconeguts
+    s'ignoren; en escriptures no s'aplica (no es perden camps d'entrada).
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        seleccionats = set(camps_seleccionats(self.fields, self.context.get('request')))
+        for nom in list(self.fields):
+            if nom not in seleccionats:
+                self.fields.pop(nom)
+
+
+class MascotaSerializer(CampsDinamicsMixin, serializers.ModelSerializer):
     # Campos relacionados con la protectora
     protectora = serializers.PrimaryKeyRelatedField(read_only=True)
     protectora_nombre = serializers.CharField(source='protectora.username', read_only=True)
@@ -22,10 +62,16 @@ class MascotaSerializer(serializers.ModelSerializer):
     apto_ninos_display = serializers.CharField(source='get_apto_ninos_display', read_only=True)
     necesita_compania_animal_display = serializers.CharField(source='get_necesita_compania_animal_display', read_only=True)
     nivel_experiencia_display = serializers.CharField(source='get_nivel_experiencia_display', read_only=True)
+
+    # Variants redimensionades de les fotos com a srcset (mascotas.imatges)
+    fotos_srcset = serializers.SerializerMethodField()
     
     class Meta:
         model = Mascota
-        fields = '__all__'
+        # Els comptadors de popularitat són interns (`tendencia` en l'escala de l'època),
+        # les màscares de bits són una còpia indexable dels camps de selecció múltiple
+        # i les derivades s'exposen com a `fotos_srcset`: no s'exposen
+        exclude = (*CAMPS_POPULARITAT, 'fotos_derivades', *(mascares.camp_bits(camp) for camp in mascares.CAMPS))
         read_only_fields = (
             'id', 
             'fecha_creacion', 
@@ -42,6 +88,7 @@ class MascotaSerializer(serializers.ModelSerializer):
             'apto_ninos_display',
             'necesita_compania_animal_display',
             'nivel_experiencia_display',
+            'fotos_srcset',
         )
         extra_kwargs = {
             'foto': {'required': True},
@@ -51,6 +98,9 @@ class MascotaSerializer(serializers.ModelSerializer):
             'edad': {'required': False, 'min_value': 0, 'max_value': 30}
         }
     
+    def get_fotos_srcset(self, instance):
+        return imatges.srcset(instance, self.context.get('request'))
+
     def validate(self, data):
         """Validación condicional de razas según la especie."""
         especie = data.get('especie')
@@ -91,23 +141,61 @@ class MascotaSerializer(serializers.ModelSerializer):
     def update(self, instance, validated_data):
         # Evitar que la protectora sea modificada por la petición
         validated_data.pop('protectora', None)
-        return super().update(instance, validated_data)
+        # Només els camps editats: un save() complet sobreescriuria els comptadors
+        # de popularitat amb els valors llegits abans d'un swipe concurrent
+        for camp, valor in validated_data.items():
+            setattr(instance, camp, valor)
+        instance.save(update_fields=camps_edicio(validated_data))
+        return instance
 
     def to_representation(self, instance):
-        rep = super().to_representation(instance)
-        especie = rep.get('especie')
-        if especie == 'PERRO':
-            # Ocultar campos de gato
-            rep.pop('raza_gato', None)
-            rep.pop('raza_gato_display', None)
-            rep.pop('color_pelaje_gato', None)
-            rep.pop('caracter_gato', None)
-            rep.pop('condicion_especial_gato', None)
-        elif especie == 'GATO':
-            # Ocultar campos de perro
-            rep.pop('raza_perro', None)
-            rep.pop('raza_perro_display', None)
-            rep.pop('color_pelaje_perro', None)
-            rep.pop('caracter_perro', None)
-            rep.pop('condicion_especial_perro', None)
+        # Com ModelSerializer.to_representation, però sense calcular els camps de l'altra espècie
+        excloure = CAMPS_EXCLOSOS_PER_ESPECIE.get(instance.especie, frozenset())
+        rep = {}
+        for field in self._readable_fields:
+            if field.field_name in excloure:
+                continue
+            try:
+                attribute = field.get_attribute(instance)
+            except SkipField:
+                continue
+            check_for_none = attribute.pk if isinstance(attribute, PKOnlyObject) else attribute
+            rep[field.field_name] = None if check_for_none is None else field.to_representation(attribute)
         return rep
+
+
+class MascotaTarjetaSerializer(CampsDinamicsMixin, serializers.ModelSerializer):
+    """
+    Representació compacta per a cartes de swipe i graelles del catàleg
+    (`?vista=tarjeta`): la raça de l'espècie de la mascota i prou per pintar la
+    targeta. Només lectura.
+    """
+    raza = serializers.SerializerMethodField()
+    raza_display = serializers.SerializerMethodField()
+    fotos_srcset = serializers.SerializerMethodField()
+    protectora_ciudad = serializers.CharField(source='protectora.city', read_only=True)
+
+    class Meta:
+        model = Mascota
+        fields = (
+            'id', 'nombre', 'especie', 'genero', 'edad', 'edad_clasificacion', 'tamano',
+            'raza', 'raza_display', 'foto', 'fotos_srcset', 'protectora_ciudad', 'adoptado',
+        )
+        read_only_fields = fields
+
+    def get_raza(self, instance):
+        return instance.raza_gato if instance.especie == 'GATO' else instance.raza_perro
+
+    def get_raza_display(self, instance):
+        return instance.get_raza_gato_display() if instance.especie == 'GATO' else instance.get_raza_perro_display()
+
+    def get_fotos_srcset(self, instance):
+        # La carta només mostra la foto principal
+        return {camp: v for camp, v in imatges.srcset(instance, self.context.get('request')).items() if camp == 'foto'}
+
+
+def serializer_per_vista(request):
+    """MascotaTarjetaSerializer per a les lectures amb `?vista=tarjeta`; si no, MascotaSerializer."""
+    if request.method in SAFE_METHODS and request.query_params.get('vista') == 'tarjeta':
+        return MascotaTarjetaSerializer
+    return MascotaSerializer
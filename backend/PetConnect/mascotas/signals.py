@@ -1,2 +1,136 @@
-# Placeholder for mascotas app signals.
-# Define Django signal handlers here as needed.
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from ai_service import cache_recomanacions, precalcul
+from usuarios.models import PerfilUsuario, Usuario
+from .models import Mascota, Interaccion
+from . import cache_cataleg, imatges, popularidad, preferencias
+
+
+@receiver(pre_save, sender=Interaccion)
+def recordar_accion_anterior(sender, instance, **kwargs):
+    """
+    Guarda l'acció que tenia la interacció abans de desar-la.
+    Dins de `update_or_create` la fila ja està bloquejada (select_for_update),
+    així que la lectura és coherent amb l'actualització posterior.
+    """
+    instance._accion_anterior = None
+    if instance.pk:
+        instance._accion_anterior = (
+            Interaccion.objects.filter(pk=instance.pk).values_list('accion', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Interaccion)
+def actualizar_popularidad(sender, instance, created, **kwargs):
+    """Manté total_likes / total_dislikes / tendencia de la mascota."""
+    anterior = None if created else getattr(instance, '_accion_anterior', None)
+    popularidad.aplicar_canvi_accio(instance.mascota_id, anterior, instance.accion, instance.fecha)
+
+
+@receiver(post_delete, sender=Interaccion)
+def descontar_popularidad(sender, instance, **kwargs):
+    popularidad.aplicar_canvi_accio(instance.mascota_id, instance.accion, None, instance.fecha)
+
+
+@receiver(post_save, sender=Interaccion)
+def actualizar_preferencia_implicita(sender, instance, created, **kwargs):
+    """Suma o resta el like a l'histograma de preferències implícites de l'usuari."""
+    anterior = None if created else getattr(instance, '_accion_anterior', None)
+    preferencias.aplicar_canvi_accio(instance.usuario_id, instance.mascota, anterior, instance.accion)
+
+
+@receiver(post_delete, sender=Interaccion)
+def descontar_preferencia_implicita(sender, instance, **kwargs):
+    # crear=False: si l'usuari s'està esborrant no s'ha de tornar a crear el seu histograma
+    preferencias.aplicar_canvi_accio(instance.usuario_id, instance.mascota, instance.accion, None, crear=False)
+
+
+@receiver(post_save, sender=Interaccion)
+def actualizar_cache_recomanacions(sender, instance, created, **kwargs):
+    """
+    Un like, o un like que passa a dislike, canvia l'histograma implícit (es
+    recalcula tot); un dislike nou només treu la mascota (el rànquing
+    precalculat ja filtra les vistes en llegir-lo).
+    """
+    anterior = None if created else getattr(instance, '_accion_anterior', None)
+    if 'like' in (instance.accion, anterior):
+        cache_recomanacions.invalidar_usuari(instance.usuario_id)
+        precalcul.invalidar_usuari(instance.usuario_id)
+    else:
+        cache_recomanacions.treure_mascota(instance.usuario_id, instance.mascota_id)
+
+
+@receiver(post_delete, sender=Interaccion)
+def invalidar_cache_recomanacions_usuari(sender, instance, **kwargs):
+    # La mascota torna a ser candidata per a l'usuari
+    cache_recomanacions.invalidar_usuari(instance.usuario_id)
+    precalcul.invalidar_usuari(instance.usuario_id)
+
+
+@receiver(post_save, sender=PerfilUsuario)
+def invalidar_cache_recomanacions_perfil(sender, instance, **kwargs):
+    cache_recomanacions.invalidar_usuari(instance.usuario_id)
+    precalcul.invalidar_usuari(instance.usuario_id)
+
+
+@receiver(post_save, sender=Mascota)
+@receiver(post_delete, sender=Mascota)
+def invalidar_cache_recomanacions_cataleg(sender, **kwargs):
+    """Alta, edició, ocultació, adopció o baixa d'una mascota: canvia el catàleg per a tothom."""
+    cache_recomanacions.invalidar_cataleg()
+
+
+@receiver(pre_save, sender=Mascota)
+def recordar_camps_llistat(sender, instance, update_fields=None, **kwargs):
+    """Guarda els camps que situen la mascota als llistats abans de desar-la."""
+    instance._camps_llistat_anteriors = None
+    if instance.pk and (update_fields is None or set(update_fields) & set(cache_cataleg.CAMPS_LLISTAT)):
+        instance._camps_llistat_anteriors = (
+            Mascota.objects.filter(pk=instance.pk).values(*cache_cataleg.CAMPS_LLISTAT).first()
+        )
+
+
+@receiver(post_save, sender=Mascota)
+def invalidar_cache_cataleg(sender, instance, created, update_fields=None, **kwargs):
+    """El detall i les pàgines de la mascota; tots els llistats només si s'hi pot haver mogut."""
+    anteriors = getattr(instance, '_camps_llistat_anteriors', None)
+    if created:
+        canvia_llistats = True
+    elif anteriors is None:
+        # update_fields sense cap camp de llistat (o la fila no existia)
+        canvia_llistats = update_fields is None
+    else:
+        canvia_llistats = any(getattr(instance, camp) != valor for camp, valor in anteriors.items())
+    cache_cataleg.invalidar_mascota(instance.pk, canvia_llistats)
+
+
+@receiver(post_delete, sender=Mascota)
+def invalidar_cache_cataleg_baixa(sender, instance, **kwargs):
+    cache_cataleg.invalidar_mascota(instance.pk, canvia_llistats=True)
+
+
+@receiver(pre_save, sender=Usuario)
+def recordar_camps_protectora(sender, instance, update_fields=None, **kwargs):
+    """Guarda el nom i la ciutat d'una protectora abans de desar-la (surten a les respostes del catàleg)."""
+    instance._camps_protectora_anteriors = None
+    if (
+        instance.pk and instance.role == 'protectora'
+        and (update_fields is None or set(update_fields) & set(cache_cataleg.CAMPS_PROTECTORA))
+    ):
+        instance._camps_protectora_anteriors = (
+            Usuario.objects.filter(pk=instance.pk).values(*cache_cataleg.CAMPS_PROTECTORA).first()
+        )
+
+
+@receiver(post_save, sender=Usuario)
+def invalidar_cache_cataleg_protectora(sender, instance, created, **kwargs):
+    anteriors = getattr(instance, '_camps_protectora_anteriors', None)
+    if not created and anteriors and any(getattr(instance, camp) != valor for camp, valor in anteriors.items()):
+        cache_cataleg.invalidar_protectora(instance.pk)
+
+
+@receiver(post_save, sender=Mascota)
+def programar_derivades_fotos(sender, instance, **kwargs):
+    """Fotos noves o canviades: se'n generen les variants redimensionades en acabar la transacció."""
+    imatges.programar(instance)
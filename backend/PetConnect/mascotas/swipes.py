@@ -0,0 +1,205 @@
+"""
+Registre de swipes per lots (`/api/petmatch/action/bulk/`).
+
+Escriu totes les interaccions amb un sol `INSERT ... ON CONFLICT (usuario,
+mascota) DO UPDATE` i crea els xats dels likes amb un altre INSERT. Com que
+`bulk_create` no dispara signals, aquí s'apliquen directament els mateixos
+efectes que els receptors de `mascotas.signals` fan per a un swipe individual:
+comptadors de popularitat, histograma implícit i cache de recomanacions.
+
+Mode write-behind (`SWIPES_WRITE_BEHIND`): `swipe_action` només afegeix
+l'esdeveniment a `swipes_pendientes` i respon de seguida; `buidar_pendents`
+(comanda `buidar_swipes_pendents`) els agrupa per (usuario, mascota) i els
+aplica amb `registrar_swipes`. Mentrestant `MascotaQuerySet.no_vistes_per` ja
+els exclou del feed i de les recomanacions.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from ai_service import cache_recomanacions, precalcul
+from chat.models import Chat
+from .constants import MAX_PK
+from .models import Mascota, Interaccion, SwipePendiente
+from . import popularidad, preferencias
+
+
+MAX_SWIPES_LOT = 500
+MIDA_LOT_BUIDAT = 1000
+ACCIONS = ('like', 'dislike')
+
+
+def _mascota_id(valor):
+    """Id d'un ítem (enter o cadena de dígits ASCII) dins del rang de la clau primària, o None."""
+    if isinstance(valor, bool) or not isinstance(valor, (int, str)):
+        return None
+    if isinstance(valor, str):
+        if not (valor.isascii() and valor.isdigit()):
+            return None
+        valor = int(valor)
+    return valor if 0 < valor <= MAX_PK else None
+
+
+def _validar(items):
+    """
+    Normalitza els ítems a (mascota_id, accion) o a un missatge d'error.
+    Si la mateixa mascota apareix diverses vegades, guanya l'última.
+    """
+    normalitzats, ultima_posicio = [], {}
+    for posicio, item in enumerate(items):
+        if not isinstance(item, dict):
+            normalitzats.append('Cada ítem ha de ser un objecte.')
+            continue
+        mascota_id = _mascota_id(item.get('mascota_id', item.get('animal_id')))
+        accion = str(item.get('action', '')).lower()
+        if mascota_id is None:
+            normalitzats.append('mascota_id no vàlid.')
+            continue
+        if accion not in ACCIONS:
+            normalitzats.append('Acció no vàlida. Utilitzi "like" o "dislike".')
+            continue
+        normalitzats.append((mascota_id, accion))
+        ultima_posicio[mascota_id] = posicio
+    return normalitzats, ultima_posicio
+
+
+def registrar_swipes(usuario, items):
+    """
+    Registra una llista de `{mascota_id, action}` de l'usuari i retorna un
+    resultat per ítem, en el mateix ordre:
+    `{'mascota_id', 'status', 'is_like', 'chat_id'}` amb status `created`,
+    `updated` o `unchanged`; o bé `{'status': 'error' | 'duplicate', 'detail'}`.
+    """
+    normalitzats, ultima_posicio = _validar(items)
+    mascotes = Mascota.objects.in_bulk(list(ultima_posicio))
+
+    # Només la darrera aparició de cada mascota existent s'escriu
+    vigents = {
+        mascota_id: normalitzats[posicio][1]
+        for mascota_id, posicio in ultima_posicio.items() if mascota_id in mascotes
+    }
+
+    likes = [mascota_id for mascota_id, accion in vigents.items() if accion == 'like']
+    anteriors, chats = {}, {}
+    if vigents:
+        with transaction.atomic():
+            # Serialitza els lots del mateix usuari: dues peticions simultànies
+            # no poden comptar dues vegades la creació de la mateixa interacció
+            get_user_model().objects.select_for_update().filter(pk=usuario.pk).exists()
+            anteriors = {
+                mascota_id: (accion, fecha)
+                for mascota_id, accion, fecha in Interaccion.objects.select_for_update()
+                .filter(usuario=usuario, mascota_id__in=vigents)
+                .values_list('mascota_id', 'accion', 'fecha')
+            }
+            interaccions = [
+                Interaccion(usuario=usuario, mascota_id=mascota_id, accion=accion)
+                for mascota_id, accion in vigents.items()
+            ]
+            Interaccion.objects.bulk_create(
+                interaccions,
+                update_conflicts=True,
+                unique_fields=['usuario', 'mascota'],
+                update_fields=['accion'],
+            )
+
+            # En un conflicte la fila conserva la seva data original; en una
+            # creació, `fecha` és la que `auto_now_add` ha posat a l'objecte
+            deltas, canvis = {}, []
+            for interaccion in interaccions:
+                anterior, fecha = anteriors.get(interaccion.mascota_id, (None, interaccion.fecha))
+                deltas[interaccion.mascota_id] = popularidad.deltas_canvi_accio(anterior, interaccion.accion, fecha)
+                canvis.append((mascotes[interaccion.mascota_id], anterior, interaccion.accion))
+            popularidad.aplicar_deltas_en_bloc(deltas)
+            preferencias.aplicar_canvis(usuario.pk, canvis)
+
+            Chat.objects.bulk_create(
+                [
+                    Chat(mascota_id=mascota_id, adoptante=usuario,
+                         protectora_id=mascotes[mascota_id].protectora_id, activo=True)
+                    for mascota_id in likes
+                ],
+                ignore_conflicts=True,
+            )
+        if likes:
+            chats = dict(
+                Chat.objects.filter(adoptante=usuario, mascota_id__in=likes).values_list('mascota_id', 'id')
+            )
+        # Un like nou o un like que passa a dislike canvia l'histograma implícit
+        if likes or any(accion == 'like' for accion, _ in anteriors.values()):
+            cache_recomanacions.invalidar_usuari(usuario.pk)
+            precalcul.invalidar_usuari(usuario.pk)
+        else:
+            cache_recomanacions.treure_mascotes(usuario.pk, list(vigents))
+
+    resultats = []
+    for posicio, normalitzat in enumerate(normalitzats):
+        if isinstance(normalitzat, str):
+            resultats.append({'status': 'error', 'detail': normalitzat})
+            continue
+        mascota_id, accion = normalitzat
+        if mascota_id not in mascotes:
+            resultats.append({'mascota_id': mascota_id, 'status': 'error', 'detail': 'Mascota no trobada.'})
+        elif ultima_posicio[mascota_id] != posicio:
+            resultats.append({
+                'mascota_id': mascota_id,
+                'status': 'duplicate',
+                'detail': 'Substituït per un ítem posterior de la mateixa mascota.',
+            })
+        else:
+            anterior = anteriors.get(mascota_id, (None, None))[0]
+            resultats.append({
+                'mascota_id': mascota_id,
+                'status': 'created' if anterior is None else ('unchanged' if anterior == accion else 'updated'),
+                'is_like': accion == 'like',
+                'chat_id': chats.get(mascota_id),
+            })
+    return resultats
+
+
+def write_behind_actiu():
+    return getattr(settings, 'SWIPES_WRITE_BEHIND', False)
+
+
+def encuar_swipe(usuario, mascota, accion):
+    """
+    Desa el swipe a `swipes_pendientes` sense aplicar-lo. La mascota es treu
+    del rànquing cachejat perquè no es torni a recomanar abans del buidatge.
+    """
+    SwipePendiente.objects.create(usuario=usuario, mascota=mascota, accion=accion)
+    cache_recomanacions.treure_mascota(usuario.pk, mascota.pk)
+
+
+def buidar_pendents(mida_lot=MIDA_LOT_BUIDAT):
+    """
+    Aplica els swipes pendents per lots, del més antic al més nou. Dins de cada
+    lot només compta l'últim esdeveniment de cada (usuario, mascota). Cada lot
+    s'aplica i s'esborra en una sola transacció, així que una lectura mai veu
+    el swipe com a no fet.
+
+    Les files es bloquegen amb SKIP LOCKED (on la BD ho admet), però l'ordre
+    entre esdeveniments de la mateixa parella només es garanteix amb un sol
+    flusher. Retorna (esdeveniments processats, interaccions aplicades).
+    """
+    processats = aplicats = 0
+    while True:
+        with transaction.atomic():
+            pendents = list(
+                SwipePendiente.objects.select_for_update(skip_locked=True)
+                .order_by('pk').values_list('pk', 'usuario_id', 'mascota_id', 'accion')[:mida_lot]
+            )
+            if not pendents:
+                return processats, aplicats
+
+            per_usuari = {}
+            for _, usuario_id, mascota_id, accion in pendents:
+                per_usuari.setdefault(usuario_id, {})[mascota_id] = accion
+            usuaris = get_user_model().objects.in_bulk(list(per_usuari))
+            for usuario_id, accions in per_usuari.items():
+                registrar_swipes(usuaris[usuario_id], [
+                    {'mascota_id': mascota_id, 'action': accion} for mascota_id, accion in accions.items()
+                ])
+                aplicats += len(accions)
+
+            SwipePendiente.objects.filter(pk__in=[pk for pk, *_ in pendents]).delete()
+            processats += len(pendents)
@@ -1,3 +1,1440 @@
-from django.test import TestCase
+import importlib
+import json
+import random
+import re
+import tempfile
+from collections import Counter
+from io import BytesIO, StringIO
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.apps import apps
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.db.models import F, Sum
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from chat.models import Chat, Mensaje
+from usuarios.models import Usuario, PerfilUsuario
+from . import baraja, cache_cataleg, imatges, mascares, popularidad, preferencias
+from .models import Mascota, Interaccion, PreferenciaImplicita, Baraja, SwipePendiente
+from .popularidad import tendencia_actual
+
+
+def crear_mascota(protectora, **extra):
+    dades = {
+        'nombre': 'Max',
+        'especie': 'PERRO',
+        'raza_perro': 'LABRADOR',
+        'genero': 'MACHO',
+        'foto': 'mascotas/test.jpg',
+        'protectora': protectora,
+    }
+    dades.update(extra)
+    return Mascota.objects.create(**dades)
+
+
+class MascotaTestCase(TestCase):
+    """Base amb una protectora, un adoptant i un client API autenticat."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.protectora = Usuario.objects.create_user(
+            username='protectora', email='protectora@test.com', password='test1234', role='protectora',
+        )
+        cls.usuari = Usuario.objects.create_user(
+            username='usuari', email='usuari@test.com', password='test1234',
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuari)
+
+    def swipe(self, mascota, accion):
+        return self.client.post('/api/petmatch/action/', {'mascota_id': mascota.id, 'action': accion}, format='json')
+
+
+class PopularidadTests(MascotaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.mascota = crear_mascota(self.protectora)
+
+    def test_like_incrementa_comptadors(self):
+        self.swipe(self.mascota, 'like')
+        self.mascota.refresh_from_db()
+        self.assertEqual(self.mascota.total_likes, 1)
+        self.assertEqual(self.mascota.total_dislikes, 0)
+        self.assertGreater(tendencia_actual(self.mascota), 0.99)
+        # Comptadors interns: no surten a l'API
+        dades = self.client.get(f'/api/mascota/{self.mascota.pk}/').data
+        self.assertFalse({'total_likes', 'total_dislikes', 'tendencia'} & set(dades))
+
+    def test_like_que_passa_a_dislike(self):
+        self.swipe(self.mascota, 'like')
+        self.swipe(self.mascota, 'dislike')
+        self.mascota.refresh_from_db()
+        self.assertEqual(self.mascota.total_likes, 0)
+        self.assertEqual(self.mascota.total_dislikes, 1)
+        self.assertAlmostEqual(self.mascota.tendencia, 0.0)
+
+    def test_repetir_accio_no_duplica(self):
+        self.swipe(self.mascota, 'like')
+        self.swipe(self.mascota, 'like')
+        self.mascota.refresh_from_db()
+        self.assertEqual(self.mascota.total_likes, 1)
+
+    def test_edicio_no_perd_comptadors(self):
+        from django.contrib.admin.sites import site
+        from .serializers import MascotaSerializer
+
+        # Edicions (PATCH, admin) amb instàncies carregades abans d'un swipe
+        desfasada = Mascota.objects.get(pk=self.mascota.pk)
+        desfasada_admin = Mascota.objects.get(pk=self.mascota.pk)
+        self.swipe(self.mascota, 'like')
+
+        serializer = MascotaSerializer(desfasada, data={'nombre': 'Rex', 'adoptado': True}, partial=True)
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        serializer.save()
+        desfasada_admin.oculto = True
+        formulari = mock.Mock(changed_data=['oculto'])
+        site._registry[Mascota].save_model(None, desfasada_admin, formulari, change=True)
+
+        self.mascota.refresh_from_db()
+        self.assertEqual(self.mascota.nombre, 'Rex')
+        self.assertTrue(self.mascota.adoptado)
+        self.assertIsNotNone(self.mascota.fecha_adopcion)
+        self.assertTrue(self.mascota.oculto)
+        self.assertEqual(self.mascota.total_likes, 1)
+        self.assertGreater(self.mascota.tendencia, 0)
+
+    def test_esborrar_interaccio_descompta(self):
+        self.swipe(self.mascota, 'like')
+        Interaccion.objects.filter(mascota=self.mascota).delete()
+        self.mascota.refresh_from_db()
+        self.assertEqual(self.mascota.total_likes, 0)
+
+    def test_reconciliar_reconstrueix_comptadors(self):
+        altre = Usuario.objects.create_user(username='altre', email='altre@test.com', password='test1234')
+        self.swipe(self.mascota, 'like')
+        Interaccion.objects.create(usuario=altre, mascota=self.mascota, accion='dislike')
+        tendencia = Mascota.objects.get(pk=self.mascota.pk).tendencia
+        Mascota.objects.filter(pk=self.mascota.pk).update(total_likes=7, total_dislikes=7, tendencia=0)
+
+        call_command('reconciliar_popularidad', chunk_size=1, stdout=StringIO())
+
+        self.mascota.refresh_from_db()
+        self.assertEqual(self.mascota.total_likes, 1)
+        self.assertEqual(self.mascota.total_dislikes, 1)
+        self.assertAlmostEqual(self.mascota.tendencia, tendencia)
+
+
+class FeedCompatiblesTests(MascotaTestCase):
+
+    def test_feed_opcionalment_filtra_incompatibles(self):
+        perfil = self.usuari.perfil_usuario
+        perfil.tiene_ninos = True
+        perfil.save()
+        crear_mascota(self.protectora, apto_ninos='NO_APTO_NINOS')
+
+        resposta = self.client.get('/api/petmatch/next/')
+        self.assertIn('id', resposta.data)
+
+        resposta = self.client.get('/api/petmatch/next/?compatibles=1')
+        self.assertEqual(resposta.data['status'], 'empty')
+
+
+class ExclusioVistesTests(MascotaTestCase):
+
+    def test_no_vistes_per_es_un_anti_join(self):
+        mascotes = [crear_mascota(self.protectora, nombre=f'M{i}') for i in range(4)]
+        self.swipe(mascotes[0], 'like')
+        self.swipe(mascotes[2], 'dislike')
+
+        no_vistes = Mascota.objects.no_vistes_per(self.usuari)
+        self.assertIn('NOT EXISTS', str(no_vistes.query))
+        self.assertEqual(set(no_vistes), {mascotes[1], mascotes[3]})
+        self.assertEqual(Mascota.objects.no_vistes_per(self.protectora).count(), 4)
+
+    def test_benchmark(self):
+        with tempfile.TemporaryDirectory() as directori:
+            sortida = Path(directori) / 'informe.json'
+            call_command(
+                'benchmark_exclusio_vistes', mascotes=30, swipes='0,5,20', repeticions=2, escalfament=0,
+                sortida=str(sortida), stdout=StringIO(),
+            )
+            informe = json.loads(sortida.read_text())
+
+        nivells = informe['nivells']
+        self.assertEqual(set(nivells), {'0', '5', '20'})
+        self.assertTrue(30 >= nivells['0']['candidates'] > nivells['5']['candidates'] > nivells['20']['candidates'])
+        for mesures in nivells.values():
+            self.assertTrue(mesures['mateix_resultat'])
+            self.assertEqual(mesures['petmatch_next_baralla_nova']['estats_http'], [200])
+        self.assertFalse(Mascota.objects.exists())
+
+        with self.assertRaises(CommandError):
+            call_command('benchmark_exclusio_vistes', mascotes=10, swipes='10', stdout=StringIO())
+
+
+@override_settings(SWIPES_WRITE_BEHIND=True)
+class WriteBehindTests(MascotaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.mascotes = [crear_mascota(self.protectora, nombre=f'M{i}') for i in range(3)]
+
+    def buidar(self):
+        call_command('buidar_swipes_pendents', lot=2, stdout=StringIO())
+
+    def test_swipe_es_desa_com_a_pendent(self):
+        resposta = self.swipe(self.mascotes[0], 'like')
+        self.assertEqual(resposta.status_code, 202)
+        self.assertEqual(resposta.data['status'], 'queued')
+        self.assertFalse(Interaccion.objects.exists())
+        self.assertFalse(Chat.objects.exists())
+        self.assertEqual(SwipePendiente.objects.count(), 1)
+
+    def test_lectures_respecten_pendents(self):
+        vistes = set()
+        for _ in range(3):
+            carta = self.client.get('/api/petmatch/next/').data
+            self.assertNotIn(carta['id'], vistes)
+            vistes.add(carta['id'])
+            self.swipe(Mascota(pk=carta['id']), 'dislike')
+        self.assertEqual(self.client.get('/api/petmatch/next/').data['status'], 'empty')
+        self.assertEqual(self.client.get('/api/ia/recomendacion/').data['recomendaciones'], [])
+
+    def test_buidatge_agrupa_i_aplica(self):
+        self.swipe(self.mascotes[0], 'like')
+        self.swipe(self.mascotes[0], 'dislike')
+        self.swipe(self.mascotes[0], 'like')
+        self.swipe(self.mascotes[1], 'dislike')
+        self.buidar()
+
+        self.assertFalse(SwipePendiente.objects.exists())
+        self.assertEqual(
+            dict(Interaccion.objects.values_list('mascota_id', 'accion')),
+            {self.mascotes[0].id: 'like', self.mascotes[1].id: 'dislike'},
+        )
+        self.assertTrue(Chat.objects.filter(mascota=self.mascotes[0], adoptante=self.usuari).exists())
+        self.mascotes[0].refresh_from_db()
+        self.assertEqual((self.mascotes[0].total_likes, self.mascotes[0].total_dislikes), (1, 0))
+        self.assertEqual(PreferenciaImplicita.objects.get(usuario=self.usuari).total_likes, 1)
+
+        # Un like posterior ja té xat: es retorna en la resposta encuada
+        self.assertEqual(
+            self.swipe(self.mascotes[0], 'like').data['chat_id'],
+            Chat.objects.get(mascota=self.mascotes[0]).id,
+        )
+
+
+class ConsultesSerialitzadorTests(MascotaTestCase):
+    """
+    Les respostes amb MascotaSerializer no poden fer una consulta per mascota
+    (N+1 sobre la protectora): el nombre de consultes no ha de dependre de
+    quantes mascotes es retornen.
+    """
+
+    ENDPOINTS = {
+        'mascota_list': ('anonim', '/api/mascota/'),
+        'mascota_list_protectora': ('protectora', '/api/mascota/'),
+        'mis_mascotas': ('protectora', '/api/mascota/mis_mascotas/'),
+        'favoritos': ('usuari', '/api/favoritos/'),
+        'ia_recomendacion': ('usuari', '/api/ia/recomendacion/?limit=12'),
+        'petmatch_lot': ('usuari', '/api/petmatch/next/?count=12'),
+    }
+
+    def afegir_mascotes(self, n):
+        """n mascotes de protectores noves, n de la protectora de prova i n amb like de l'usuari."""
+        for _ in range(n):
+            numero = Usuario.objects.count()
+            altra = Usuario.objects.create_user(
+                username=f'protectora{numero}', email=f'protectora{numero}@test.com',
+                password='test1234', role='protectora',
+            )
+            crear_mascota(altra)
+            crear_mascota(self.protectora)
+            Interaccion.objects.create(usuario=self.usuari, mascota=crear_mascota(altra), accion='like')
+
+    def consultes(self, qui, ruta):
+        client = APIClient()
+        if qui != 'anonim':
+            client.force_authenticate(getattr(self, qui))
+        cache.clear()
+        Baraja.objects.all().delete()
+        with CaptureQueriesContext(connection) as consultes:
+            resposta = client.get(ruta)
+        self.assertEqual(resposta.status_code, 200)
+        return len(consultes)
+
+    def test_consultes_independents_del_nombre_de_mascotes(self):
+        self.afegir_mascotes(1)
+        poques = {nom: self.consultes(*endpoint) for nom, endpoint in self.ENDPOINTS.items()}
+        self.afegir_mascotes(3)
+        for nom, endpoint in self.ENDPOINTS.items():
+            with self.subTest(endpoint=nom):
+                self.assertEqual(self.consultes(*endpoint), poques[nom])
+
+
+class PaginacioCursorTests(MascotaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.anonim = APIClient()
+        self.mascotes = [
+            crear_mascota(self.protectora, nombre=f'Gos {i}' if i % 2 else f'Gat {i}',
+                          especie='PERRO' if i % 2 else 'GATO')
+            for i in range(30)
+        ]
+        # Empats de fecha_creacion: el desempat per id no pot perdre ni repetir mascotes
+        Mascota.objects.filter(pk__in=[m.pk for m in self.mascotes[10:20]]).update(
+            fecha_creacion=self.mascotes[10].fecha_creacion
+        )
+
+    def recorrer(self, ruta):
+        ids, pagines = [], 0
+        while ruta:
+            resposta = self.anonim.get(ruta)
+            self.assertEqual(resposta.status_code, 200)
+            self.assertNotIn('count', resposta.data)
+            ids += [m['id'] for m in resposta.data['results']]
+            ruta, pagines = resposta.data['next'], pagines + 1
+        return ids, pagines
+
+    def test_recorregut_complet_sense_repeticions(self):
+        ids, pagines = self.recorrer('/api/mascota/?paginacio=cursor')
+        esperats = list(Mascota.objects.order_by('-fecha_creacion', '-id').values_list('id', flat=True))
+        self.assertEqual(ids, esperats)
+        self.assertEqual(pagines, 3)
+
+    def test_conserva_filtres_i_cerca(self):
+        ids, _ = self.recorrer('/api/mascota/?paginacio=cursor&especie=PERRO&search=Gos')
+        esperats = Mascota.objects.filter(especie='PERRO').order_by('-fecha_creacion', '-id')
+        self.assertEqual(ids, list(esperats.values_list('id', flat=True)))
+        self.assertEqual(len(ids), 15)
+
+    def test_sense_count_ni_offset_i_cost_constant(self):
+        primera = self.anonim.get('/api/mascota/?paginacio=cursor')
+        mides = []
+        for ruta in ('/api/mascota/?paginacio=cursor', primera.data['next']):
+            cache.clear()
+            with CaptureQueriesContext(connection) as consultes:
+                self.assertEqual(self.anonim.get(ruta).status_code, 200)
+            sql = ' '.join(c['sql'] for c in consultes).upper()
+            self.assertNotIn('COUNT(', sql)
+            self.assertNotIn('OFFSET', sql)
+            mides.append(len(consultes))
+        self.assertEqual(mides[0], mides[1])
+
+    def test_cursor_invalid(self):
+        resposta = self.anonim.get('/api/mascota/?cursor=no-es-un-cursor')
+        self.assertEqual(resposta.status_code, 400)
+        self.assertIn('cursor', resposta.data)
+
+    def test_mode_per_pagina_per_defecte(self):
+        resposta = self.anonim.get('/api/mascota/?page=2')
+        self.assertEqual(resposta.data['count'], 30)
+        self.assertEqual(len(resposta.data['results']), 12)
+
+
+class FacetesTests(MascotaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.anonim = APIClient()
+        crear_mascota(self.protectora, tamano='GRANDE', apto_con=['NINOS', 'PERROS'])
+        crear_mascota(self.protectora, tamano='GRANDE', apto_con=['NINOS'], estado_legal_salud=['VACUNADO'])
+        crear_mascota(self.protectora, tamano='PEQUENO', apto_con=['SIN_NINOS'])
+        crear_mascota(self.protectora, especie='GATO', raza_gato='EUROPEO', apto_con=['NINOS'])
+        crear_mascota(self.protectora, tamano='GRANDE', oculto=True)
+
+    def facetes(self, ruta, client=None):
+        resposta = (client or self.anonim).get(ruta)
+        self.assertEqual(resposta.status_code, 200)
+        return resposta.data
+
+    def test_recomptes_amb_filtres_en_una_consulta(self):
+        with CaptureQueriesContext(connection) as consultes:
+            dades = self.facetes('/api/mascota/facets/')
+        self.assertEqual(len(consultes), 1)
+        self.assertEqual(dades['total'], 4)
+        self.assertEqual(dades['facetes']['tamano'], {'PEQUENO': 1, 'MEDIANO': 1, 'GRANDE': 2, 'GIGANTE': 0})
+        self.assertEqual(dades['facetes']['apto_con']['NINOS'], 3)
+        self.assertEqual(dades['facetes']['especie'], {'PERRO': 3, 'GATO': 1})
+
+    def test_recomptes_disjuntius(self):
+        # Cada faceta filtrada es compta sense el seu filtre: una consulta més per faceta filtrada
+        with CaptureQueriesContext(connection) as consultes:
+            dades = self.facetes('/api/mascota/facets/?especie=PERRO&apto_con=NINOS')
+        self.assertEqual(len(consultes), 3)
+        self.assertEqual(dades['total'], 2)
+        self.assertEqual(dades['facetes']['tamano'], {'PEQUENO': 0, 'MEDIANO': 0, 'GRANDE': 2, 'GIGANTE': 0})
+        self.assertEqual(dades['facetes']['estado_legal_salud']['VACUNADO'], 1)
+        # especie sense ?especie= (però amb apto_con=NINOS); apto_con sense ?apto_con= (però amb especie=PERRO)
+        self.assertEqual(dades['facetes']['especie'], {'PERRO': 2, 'GATO': 1})
+        self.assertEqual(dades['facetes']['apto_con']['NINOS'], 2)
+        self.assertEqual(dades['facetes']['apto_con']['SIN_NINOS'], 1)
+        self.assertEqual(dades['facetes']['apto_con']['PERROS'], 1)
+        # ?edad= filtra per edad_clasificacion: la faceta se'n compta sense
+        dades = self.facetes('/api/mascota/facets/?edad=15_MAS')
+        self.assertEqual(dades['total'], 0)
+        self.assertEqual(sum(dades['facetes']['edad_clasificacion'].values()), 4)
+
+    def test_regles_de_rol(self):
+        self.assertEqual(self.facetes('/api/mascota/facets/')['total'], 4)
+        protectora = APIClient()
+        protectora.force_authenticate(self.protectora)
+        dades = self.facetes('/api/mascota/facets/', protectora)
+        self.assertEqual(dades['total'], 5)
+        self.assertEqual(dades['facetes']['tamano']['GRANDE'], 3)
+
+    def test_cache_per_filtres_normalitzats(self):
+        self.facetes('/api/mascota/facets/?especie=PERRO&tamano=GRANDE')
+        with CaptureQueriesContext(connection) as consultes:
+            dades = self.facetes('/api/mascota/facets/?tamano=GRANDE&especie=PERRO&page=3')
+        self.assertEqual(len(consultes), 0)
+        self.assertEqual(dades['total'], 2)
+
+        # Una mascota nova canvia la generació dels llistats i invalida els recomptes
+        nova = crear_mascota(self.protectora, tamano='GRANDE')
+        self.assertEqual(self.facetes('/api/mascota/facets/?especie=PERRO&tamano=GRANDE')['total'], 3)
+        # Una edició que no canvia cap filtre, no
+        nova.descripcion = 'Tranquil'
+        nova.save()
+        with CaptureQueriesContext(connection) as consultes:
+            self.facetes('/api/mascota/facets/?especie=PERRO&tamano=GRANDE')
+        self.assertEqual(len(consultes), 0)
+
+
+class CacheCatalegTests(MascotaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.anonim = APIClient()
+        # 14 mascotes: la primera pàgina (12) té les més noves, la segona les dues primeres
+        self.mascotes = [crear_mascota(self.protectora, nombre=f'Mascota {i}') for i in range(14)]
+        self.antiga, self.nova = self.mascotes[0], self.mascotes[-1]
+
+    def consultes(self, ruta):
+        with CaptureQueriesContext(connection) as consultes:
+            resposta = self.anonim.get(ruta)
+        return resposta, len(consultes)
+
+    def test_hit_amb_parametres_normalitzats_i_comptadors(self):
+        primera, consultes_miss = self.consultes('/api/mascota/?especie=PERRO&page=1')
+        segona, consultes_hit = self.consultes('/api/mascota/?page=1&especie=PERRO&format=json')
+        self.assertGreater(consultes_miss, 0)
+        self.assertEqual(consultes_hit, 0)
+        self.assertEqual(segona.data, primera.data)
+        self.assertEqual(cache_cataleg.estadistiques(), {'hits': 1, 'misses': 1, 'taxa_encert': 0.5})
+
+    def test_peticions_autenticades_no_es_cachegen(self):
+        self.client.get('/api/mascota/')
+        with CaptureQueriesContext(connection) as consultes:
+            self.client.get('/api/mascota/')
+        self.assertGreater(len(consultes), 0)
+        self.assertEqual(cache_cataleg.estadistiques()['hits'], 0)
+
+    def test_detall_amb_pk_no_numeric_es_404(self):
+        for pk in ('%C2%B2', 'abc'):
+            with self.subTest(pk=pk):
+                self.assertEqual(self.anonim.get(f'/api/mascota/{pk}/').status_code, 404)
+
+    def test_edicio_invalida_nomes_les_seves_pagines_i_detall(self):
+        for ruta in ('/api/mascota/', '/api/mascota/?page=2', f'/api/mascota/{self.nova.pk}/',
+                     f'/api/mascota/{self.antiga.pk}/'):
+            self.anonim.get(ruta)
+
+        self.nova.descripcion = 'Nova descripció'
+        self.nova.save()
+
+        resposta, consultes = self.consultes('/api/mascota/')
+        self.assertGreater(consultes, 0)
+        self.assertEqual(resposta.data['results'][0]['descripcion'], 'Nova descripció')
+        resposta, consultes = self.consultes(f'/api/mascota/{self.nova.pk}/')
+        self.assertEqual((resposta.data['descripcion'], consultes > 0), ('Nova descripció', True))
+        # La pàgina 2 i el detall d'una altra mascota no la contenen: es mantenen
+        self.assertEqual(self.consultes('/api/mascota/?page=2')[1], 0)
+        self.assertEqual(self.consultes(f'/api/mascota/{self.antiga.pk}/')[1], 0)
+
+    def test_canvi_de_visibilitat_invalida_els_llistats(self):
+        for ruta in ('/api/mascota/?page=2', f'/api/mascota/{self.antiga.pk}/', f'/api/mascota/{self.nova.pk}/'):
+            self.anonim.get(ruta)
+
+        self.nova.oculto = True
+        self.nova.save()
+
+        # La mascota amagada era a la pàgina 1, però desplaça la 2
+        resposta, consultes = self.consultes('/api/mascota/?page=2')
+        self.assertGreater(consultes, 0)
+        self.assertEqual(len(resposta.data['results']), 1)
+        self.assertEqual(self.anonim.get(f'/api/mascota/{self.nova.pk}/').status_code, 404)
+        self.assertEqual(self.consultes(f'/api/mascota/{self.antiga.pk}/')[1], 0)
+
+    def test_alta_i_baixa(self):
+        self.anonim.get('/api/mascota/')
+        self.anonim.get(f'/api/mascota/{self.nova.pk}/')
+
+        creada = crear_mascota(self.protectora, nombre='Recent')
+        self.assertEqual(self.anonim.get('/api/mascota/').data['results'][0]['id'], creada.pk)
+
+        self.nova.delete()
+        self.assertEqual(self.anonim.get(f'/api/mascota/{self.nova.pk}/').status_code, 404)
+        self.assertEqual(self.anonim.get('/api/mascota/').data['count'], 14)
+
+    def test_canvi_de_protectora_invalida_les_seves_respostes(self):
+        self.anonim.get('/api/mascota/')
+        self.anonim.get(f'/api/mascota/{self.nova.pk}/')
+
+        # Inici de sessió: només canvia last_login, les respostes es mantenen
+        self.protectora.save(update_fields=['last_login'])
+        self.assertEqual(self.consultes('/api/mascota/')[1], 0)
+
+        self.protectora.city = 'Girona'
+        self.protectora.save()
+        self.assertEqual(self.anonim.get('/api/mascota/').data['results'][0]['protectora_ciudad'], 'Girona')
+        self.assertEqual(self.anonim.get(f'/api/mascota/{self.nova.pk}/').data['protectora_ciudad'], 'Girona')
+
+    def test_edicio_durant_el_calcul(self):
+        clau = cache_cataleg.clau_detall(self.nova.pk)
+        versions = cache_cataleg.versions([self.nova.pk])
+        # La mascota canvia mentre es calcula la resposta: el que es desa ja no val
+        cache_cataleg.invalidar_mascota(self.nova.pk, canvia_llistats=False)
+        cache_cataleg.desar(clau, {'nombre': 'Antic'}, versions)
+        self.assertIsNone(cache_cataleg.llegir(clau))
+        cache_cataleg.desar(clau, {'nombre': 'Nou'}, cache_cataleg.versions([self.nova.pk]))
+        self.assertEqual(cache_cataleg.llegir(clau), {'nombre': 'Nou'})
+
+    def test_comanda_estadistiques(self):
+        self.anonim.get('/api/mascota/')
+        self.anonim.get('/api/mascota/')
+        sortida = StringIO()
+        call_command('estadistiques_cache', stdout=sortida)
+        self.assertIn('cataleg               1 hits         1 misses', sortida.getvalue())
+
+    def test_cache_en_fitxers(self):
+        with tempfile.TemporaryDirectory() as directori:
+            caches = {'default': {
+                'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directori,
+            }}
+            with override_settings(CACHES=caches):
+                self.anonim.get(f'/api/mascota/{self.nova.pk}/')
+                self.assertEqual(self.consultes(f'/api/mascota/{self.nova.pk}/')[1], 0)
+                self.nova.nombre = 'Canviat'
+                self.nova.save()
+                self.assertEqual(self.anonim.get(f'/api/mascota/{self.nova.pk}/').data['nombre'], 'Canviat')
+                self.assertEqual(cache_cataleg.estadistiques()['hits'], 1)
+                self.assertTrue(any(Path(directori).glob('*.djcache')))
+
+
+class CampsSerialitzadorTests(MascotaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.gos = crear_mascota(self.protectora, descripcion='Molt bo')
+        self.gat = crear_mascota(self.protectora, especie='GATO', raza_gato='EUROPEO', nombre='Mixa')
+
+    def detall(self, mascota, parametres=''):
+        resposta = self.client.get(f'/api/mascota/{mascota.pk}/{parametres}')
+        self.assertEqual(resposta.status_code, 200)
+        return resposta.data
+
+    def test_camps_de_l_altra_especie_no_hi_son(self):
+        gos, gat = self.detall(self.gos), self.detall(self.gat)
+        self.assertIn('raza_perro_display', gos)
+        self.assertFalse(set(gos) & {'raza_gato', 'raza_gato_display', 'caracter_gato', 'color_pelaje_gato'})
+        self.assertEqual(gat['raza_gato_display'], 'Europeo')
+        self.assertFalse(set(gat) & {'raza_perro', 'raza_perro_display', 'caracter_perro', 'color_pelaje_perro'})
+
+    def test_fields_i_omit(self):
+        self.assertEqual(set(self.detall(self.gos, '?fields=id,nombre,no_existeix')), {'id', 'nombre'})
+        dades = self.detall(self.gos, '?omit=descripcion,protectora_nombre')
+        self.assertNotIn('descripcion', dades)
+        self.assertNotIn('protectora_nombre', dades)
+        self.assertIn('nombre', dades)
+        resposta = self.client.get('/api/mascota/?fields=id')
+        self.assertEqual([set(m) for m in resposta.data['results']], [{'id'}, {'id'}])
+
+    def test_vista_tarjeta(self):
+        resposta = self.client.get('/api/petmatch/next/?count=5&vista=tarjeta')
+        cartes = {m['id']: m for m in resposta.data['results']}
+        self.assertEqual(set(cartes[self.gat.pk]), {
+            'id', 'nombre', 'especie', 'genero', 'edad', 'edad_clasificacion', 'tamano',
+            'raza', 'raza_display', 'foto', 'fotos_srcset', 'protectora_ciudad', 'adoptado',
+        })
+        self.assertEqual((cartes[self.gat.pk]['raza'], cartes[self.gos.pk]['raza']), ('EUROPEO', 'LABRADOR'))
+        self.assertEqual(set(self.detall(self.gos, '?vista=tarjeta&fields=id,raza')), {'id', 'raza'})
+
+    def test_escriptures_no_perden_camps(self):
+        protectora = APIClient()
+        protectora.force_authenticate(self.protectora)
+        resposta = protectora.patch(f'/api/mascota/{self.gos.pk}/?fields=id&vista=tarjeta', {'nombre': 'Rex'})
+        self.assertEqual(resposta.status_code, 200)
+        self.gos.refresh_from_db()
+        self.assertEqual(self.gos.nombre, 'Rex')
+        self.assertIn('descripcion', resposta.data)
+
+    def test_benchmark_serialitzacio(self):
+        with tempfile.TemporaryDirectory() as directori:
+            sortida = Path(directori) / 'informe.json'
+            call_command(
+                'benchmark_serialitzacio', mides='3,5', repeticions=2, escalfament=0,
+                sortida=str(sortida), stdout=StringIO(),
+            )
+            informe = json.loads(sortida.read_text())
+        self.assertEqual(set(informe['mides']), {'3', '5'})
+        variants = informe['mides']['5']
+        self.assertEqual(set(variants), {'complet', 'omit', 'fields', 'tarjeta', 'rapida'})
+        self.assertTrue(variants['rapida']['mateix_json'])
+        self.assertEqual(variants['rapida']['bytes'], variants['complet']['bytes'])
+        self.assertLess(variants['tarjeta']['bytes'], variants['complet']['bytes'])
+        self.assertLess(variants['fields']['bytes'], variants['tarjeta']['bytes'])
+
+
+def imatge_jpeg(amplada, alcada, orientacio=None):
+    from PIL import Image
+    exif = Image.Exif()
+    exif[0x010F] = 'Càmera de prova'
+    if orientacio:
+        exif[0x0112] = orientacio
+    sortida = BytesIO()
+    Image.new('RGB', (amplada, alcada), 'orange').save(sortida, format='JPEG', exif=exif)
+    return sortida.getvalue()
+
+
+class ImatgesDerivadesTests(MascotaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        directori = tempfile.TemporaryDirectory()
+        self.addCleanup(directori.cleanup)
+        configuracio = override_settings(MEDIA_ROOT=directori.name, IMATGES_DERIVADES_MODE='sincron')
+        configuracio.enable()
+        self.addCleanup(configuracio.disable)
+
+    def crear_amb_foto(self, contingut, nom='gos.jpg'):
+        with self.captureOnCommitCallbacks(execute=True):
+            mascota = crear_mascota(self.protectora, foto=SimpleUploadedFile(nom, contingut, 'image/jpeg'))
+        mascota.refresh_from_db()
+        return mascota
+
+    def test_variants_amb_orientacio_i_sense_exif(self):
+        from PIL import Image
+        variants = imatges.generar_variants(imatge_jpeg(2000, 1000, orientacio=6))
+        self.assertEqual(set(variants), {'webp', 'jpeg'})
+        # Girada per l'EXIF queda de 1000x2000: no s'amplia per sobre de 1000
+        self.assertEqual(sorted(variants['jpeg']), [320, 640, 1000])
+        for format_, per_amplada in variants.items():
+            for amplada, contingut in per_amplada.items():
+                with Image.open(BytesIO(contingut)) as imatge:
+                    self.assertEqual(imatge.size, (amplada, amplada * 2))
+                    self.assertEqual(len(imatge.getexif()), 0)
+
+    def test_foto_nova_genera_derivades_i_srcset(self):
+        mascota = self.crear_amb_foto(imatge_jpeg(1600, 1200))
+        entrada = mascota.fotos_derivades['foto']
+        self.assertEqual(entrada['original'], mascota.foto.name)
+        self.assertEqual(set(entrada['webp']), {'320', '640', '1280'})
+        self.assertTrue(all(default_storage.exists(cami) for cami in entrada['jpeg'].values()))
+
+        dades = self.client.get(f'/api/mascota/{mascota.pk}/').data
+        self.assertNotIn('fotos_derivades', dades)
+        srcset = dades['fotos_srcset']['foto']
+        self.assertEqual(srcset['webp'].count('w, '), 2)
+        self.assertIn('_320.webp 320w', srcset['webp'])
+        self.assertTrue(srcset['miniatura'].endswith('_320.jpg'))
+        carta = self.client.get(f'/api/mascota/{mascota.pk}/?vista=tarjeta').data
+        self.assertEqual(carta['fotos_srcset'], {'foto': srcset})
+
+    def test_canvi_de_foto_substitueix_les_derivades(self):
+        mascota = self.crear_amb_foto(imatge_jpeg(800, 600))
+        anteriors = list(mascota.fotos_derivades['foto']['jpeg'].values())
+
+        mascota.foto = SimpleUploadedFile('gat.jpg', imatge_jpeg(400, 300), 'image/jpeg')
+        with self.captureOnCommitCallbacks(execute=True):
+            mascota.save()
+            # Fins que es regeneren, les derivades de la foto anterior no s'exposen
+            self.assertEqual(imatges.srcset(mascota), {})
+        mascota.refresh_from_db()
+        self.assertEqual(sorted(mascota.fotos_derivades['foto']['jpeg'], key=int), ['320', '400'])
+        self.assertFalse(any(default_storage.exists(cami) for cami in anteriors))
+
+    def test_pool_de_processos_i_comanda(self):
+        with self.captureOnCommitCallbacks(execute=True), override_settings(IMATGES_DERIVADES_MODE='desactivat'):
+            mascota = crear_mascota(
+                self.protectora, foto=SimpleUploadedFile('gos.jpg', imatge_jpeg(700, 700), 'image/jpeg'),
+            )
+        self.assertEqual(Mascota.objects.get(pk=mascota.pk).fotos_derivades, {})
+
+        sortida = StringIO()
+        call_command('generar_derivades_fotos', stdout=sortida)
+        self.assertIn('1 fotos amb derivades noves, 0 errors.', sortida.getvalue())
+        self.assertEqual(set(Mascota.objects.get(pk=mascota.pk).fotos_derivades['foto']['webp']), {'320', '640', '700'})
+
+
+class SerialitzacioRapidaTests(MascotaTestCase):
+    """La serialització ràpida ha de donar exactament el mateix JSON que MascotaSerializer."""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.protectora_client = APIClient()
+        self.protectora_client.force_authenticate(self.protectora)
+        sense_ciutat = Usuario.objects.create_user(
+            username='refugi', email='refugi@test.com', password='test1234', role='protectora', city='',
+        )
+        Usuario.objects.filter(pk=self.protectora.pk).update(city='Lleida · Ponent')
+        gos = crear_mascota(
+            self.protectora, nombre='Gos amb ñ', foto='mascotas/gos petit ñ.jpg', foto2='mascotas/b.png',
+            apto_con=['NINOS', 'PERROS'], estado_legal_salud=['VACUNADO', 'MICROCHIP'], descripcion='Bo',
+            edad=4, edad_clasificacion='3_6', tamano='GRANDE',
+        )
+        crear_mascota(sense_ciutat, especie='GATO', raza_gato='EUROPEO', nombre='Mixa', adoptado=True)
+        crear_mascota(self.protectora, descripcion=None, oculto=True, raza_perro='')
+        Mascota.objects.filter(pk=gos.pk).update(fotos_derivades={'foto': {
+            'original': gos.foto.name,
+            'webp': {'640': 'mascotas/derivades/gos_640.webp', '320': 'mascotas/derivades/gos_320.webp'},
+            'jpeg': {'320': 'mascotas/derivades/gos_320.jpg', '640': 'mascotas/derivades/gos_640.jpg'},
+        }, 'foto2': {'original': 'mascotas/antiga.png', 'webp': {}, 'jpeg': {}}})
+
+    def json_de(self, dades):
+        from rest_framework.renderers import JSONRenderer
+        return JSONRenderer().render(dades)
+
+    def test_mateix_json_que_el_serializer(self):
+        from rest_framework.request import Request
+        from rest_framework.test import APIRequestFactory
+        from django.utils import timezone
+        from .serializers import MascotaSerializer
+        from . import serialitzacio_rapida
+
+        mascotes = Mascota.objects.per_serialitzar().order_by('pk')
+        for parametres in ({}, {'fields': 'id,nombre,foto,fotos_srcset,raza_gato'}, {'omit': 'descripcion,raza_perro'}):
+            for zona in ('UTC', 'Europe/Madrid'):
+                with self.subTest(parametres=parametres, zona=zona), timezone.override(zona):
+                    request = Request(APIRequestFactory().get('/api/mascota/', parametres))
+                    esperat = MascotaSerializer(mascotes, many=True, context={'request': request}).data
+                    rapid = serialitzacio_rapida.serialitzar(serialitzacio_rapida.files(mascotes), request)
+                    self.assertEqual(self.json_de(rapid), self.json_de(esperat))
+
+    def respostes(self, client, ruta):
+        """Cos de la resposta amb DRF i amb la serialització ràpida."""
+        cossos = []
+        for rapida in (False, True):
+            with override_settings(MASCOTES_SERIALITZACIO_RAPIDA=rapida):
+                resposta = client.get(ruta)
+            self.assertEqual(resposta.status_code, 200)
+            cossos.append(resposta.content)
+        return cossos
+
+    def test_mateixa_resposta_als_endpoints(self):
+        rutes = [
+            (self.protectora_client, '/api/mascota/'),
+            (self.protectora_client, '/api/mascota/?paginacio=cursor&omit=descripcion'),
+            (self.client, '/api/mascota/?search=Gos&fields=id,nombre,fotos_srcset'),
+            (self.client, '/api/petmatch/next/?count=10'),
+            (self.client, '/api/ia/recomendacion/?limit=5'),
+        ]
+        # Primera crida fora de la comparació: la baralla i el rànquing queden creats
+        for client, ruta in rutes:
+            client.get(ruta)
+        for client, ruta in rutes:
+            with self.subTest(ruta=ruta):
+                drf, rapida = self.respostes(client, ruta)
+                self.assertEqual(rapida, drf)
+                self.assertIn(b'Gos amb', drf)
+
+    def test_camp_no_suportat_falla(self):
+        from rest_framework import serializers as drf_serializers
+        from .serializers import MascotaSerializer
+        from . import serialitzacio_rapida
+
+        serialitzacio_rapida.pla.cache_clear()
+        self.addCleanup(serialitzacio_rapida.pla.cache_clear)
+        with mock.patch.dict(MascotaSerializer._declared_fields, {'extra': drf_serializers.DictField(read_only=True)}):
+            with self.assertRaises(ImproperlyConfigured):
+                serialitzacio_rapida.pla()
+
+
+class JSONRapidTests(MascotaTestCase):
+    """El renderer / parser amb orjson han de donar el mateix que els de DRF."""
+
+    def dades(self):
+        import datetime
+        import decimal
+        import uuid
+        from django.utils import timezone
+        from django.utils.translation import gettext_lazy
+
+        return {
+            'text': 'Gos amb ñ i   separador  ',
+            'lazy': gettext_lazy('Not found.'),
+            'data_hora': datetime.datetime(2025, 3, 1, 10, 30, 5, 123456, tzinfo=datetime.timezone.utc),
+            'data_hora_local': timezone.localtime(
+                datetime.datetime(2025, 7, 1, 8, 0, tzinfo=datetime.timezone.utc),
+                timezone=datetime.timezone(datetime.timedelta(hours=2)),
+            ),
+            'data': datetime.date(2025, 3, 1),
+            'hora': datetime.time(9, 15),
+            'durada': datetime.timedelta(minutes=90),
+            'decimal': decimal.Decimal('12.50'),
+            'uuid': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+            'tupla': (1, 2.5, None, True),
+            'conjunt': frozenset(['a']),
+            'niat': [{'id': 1, 'claus': {3: 'tres', None: 'nul'}}],
+            'gran': 2 ** 70,
+        }
+
+    def test_renderer_mateix_json_que_drf(self):
+        from rest_framework.renderers import JSONRenderer
+        from PetConnect import json_rapid
+
+        esperat = JSONRenderer().render(self.dades())
+        self.assertEqual(json_rapid.JSONRapidRenderer().render(self.dades()), esperat)
+        self.assertIn(b'\\u2028', esperat)
+        with mock.patch.object(json_rapid, 'orjson', None):
+            self.assertEqual(json_rapid.JSONRapidRenderer().render(self.dades()), esperat)
+
+    def test_renderer_indentat_i_buit(self):
+        from rest_framework.renderers import JSONRenderer
+        from PetConnect.json_rapid import JSONRapidRenderer
+
+        dades = {'a': [1, {'b': 'c'}]}
+        self.assertEqual(
+            JSONRapidRenderer().render(dades, 'application/json; indent=4'),
+            JSONRenderer().render(dades, 'application/json; indent=4'),
+        )
+        self.assertEqual(JSONRapidRenderer().render(dades, renderer_context={'indent': 2}).count(b'\n'), 7)
+        self.assertEqual(JSONRapidRenderer().render(None), b'')
+
+    def test_renderer_tipus_desconegut_falla_com_drf(self):
+        from PetConnect.json_rapid import JSONRapidRenderer
+
+        with self.assertRaises(TypeError):
+            JSONRapidRenderer().render({'objecte': object()})
+
+    def test_parser(self):
+        from rest_framework.exceptions import ParseError
+        from PetConnect import json_rapid
+
+        cos = '{"nom": "Gos amb ñ", "llista": [1, 2.5, null, true], "gran": 1180591620717411303424}'.encode()
+        for orjson in (json_rapid.orjson, None):
+            with self.subTest(orjson=orjson is not None), mock.patch.object(json_rapid, 'orjson', orjson):
+                parser = json_rapid.JSONRapidParser()
+                dades = parser.parse(BytesIO(cos))
+                self.assertEqual(dades, {'nom': 'Gos amb ñ', 'llista': [1, 2.5, None, True], 'gran': 2 ** 70})
+                # orjson.loads els retornaria com a float (2 ** 70 == float(2 ** 70), assertEqual no ho veu)
+                self.assertIs(type(dades['gran']), int)
+                for enter in (2 ** 64 - 1, 2 ** 64, -2 ** 63, -2 ** 63 - 1, 10 ** 30 + 1):
+                    llegit = parser.parse(BytesIO(f'[{enter}]'.encode()))[0]
+                    self.assertEqual((llegit, type(llegit)), (enter, int))
+                self.assertEqual(parser.parse(BytesIO(b'{"telefon": "0034600000000000000000"}')),
+                                 {'telefon': '0034600000000000000000'})
+                # NaN no és JSON vàlid (STRICT_JSON): el mateix ParseError que DRF
+                for invalid in (b'{"nom": ', b'{"x": NaN}'):
+                    with self.assertRaises(ParseError):
+                        parser.parse(BytesIO(invalid))
+
+    def test_endpoints_fan_servir_el_renderer_rapid(self):
+        from rest_framework.renderers import JSONRenderer
+        from PetConnect.json_rapid import JSONRapidRenderer
+
+        cache.clear()
+        crear_mascota(self.protectora, nombre='Gos amb ñ')
+        resposta = self.client.get('/api/mascota/')
+        self.assertIsInstance(resposta.accepted_renderer, JSONRapidRenderer)
+        self.assertEqual(resposta.content, JSONRenderer().render(resposta.data))
+
+        resposta = self.swipe(Mascota.objects.get(nombre='Gos amb ñ'), 'like')
+        self.assertLess(resposta.status_code, 400)
+        resposta = self.client.post('/api/petmatch/action/bulk/', b'{"swipes": [', content_type='application/json')
+        self.assertEqual(resposta.status_code, 400)
+
+    def test_benchmark_json(self):
+        with tempfile.TemporaryDirectory() as directori:
+            sortida = Path(directori) / 'informe.json'
+            call_command(
+                'benchmark_json', mascotes=20, missatges=5, repeticions=2, escalfament=0,
+                sortida=str(sortida), stdout=StringIO(),
+            )
+            informe = json.loads(sortida.read_text())
+        self.assertEqual(set(informe['endpoints']), {
+            'mascota_list', 'mascota_facets', 'petmatch_next_lot', 'ia_recomendacion', 'chat_detail',
+        })
+        for nom, resultat in informe['endpoints'].items():
+            with self.subTest(endpoint=nom):
+                self.assertTrue(resultat['mateix_json'])
+                self.assertGreater(resultat['bytes'], 0)
+                self.assertEqual(resultat['render']['rapid']['n'], 2)
+        self.assertFalse(Mascota.objects.exists())
+
+
+class BatchMascotesTests(MascotaTestCase):
+    """GET /api/mascota/batch/?ids=: una consulta, ordre demanat i ids que falten."""
+
+    def setUp(self):
+        super().setUp()
+        self.gos = crear_mascota(self.protectora, nombre='Gos')
+        self.gat = crear_mascota(self.protectora, nombre='Gat', especie='GATO', raza_gato='EUROPEO', raza_perro='')
+        self.adoptat = crear_mascota(self.protectora, nombre='Adoptat', adoptado=True)
+        self.ocult = crear_mascota(self.protectora, nombre='Ocult', oculto=True)
+
+    def ids(self, *mascotes):
+        return ','.join(str(m if isinstance(m, int) else m.pk) for m in mascotes)
+
+    def test_ordre_i_missing(self):
+        for rapida in (True, False):
+            with self.subTest(rapida=rapida), override_settings(MASCOTES_SERIALITZACIO_RAPIDA=rapida):
+                with CaptureQueriesContext(connection) as consultes:
+                    resposta = APIClient().get(
+                        f'/api/mascota/batch/?ids={self.ids(self.gat, 999999, self.adoptat, self.gos, self.gat)}'
+                    )
+                self.assertEqual(resposta.status_code, 200)
+                self.assertEqual([m['nombre'] for m in resposta.data['results']], ['Gat', 'Gos'])
+                self.assertEqual(resposta.data['missing'], [999999, self.adoptat.pk])
+                self.assertEqual(len(consultes), 1)
+
+    def test_mateixa_representacio_que_el_detall(self):
+        resposta = self.client.get(f'/api/mascota/batch/?ids={self.ids(self.gos)}')
+        self.assertEqual(resposta.data['results'][0], self.client.get(f'/api/mascota/{self.gos.pk}/').data)
+
+        resposta = self.client.get(f'/api/mascota/batch/?ids={self.ids(self.gos, self.gat)}&fields=nombre')
+        self.assertEqual(resposta.data['results'], [{'nombre': 'Gos'}, {'nombre': 'Gat'}])
+        resposta = self.client.get(f'/api/mascota/batch/?ids={self.ids(self.gat)}&vista=tarjeta')
+        self.assertNotIn('descripcion', resposta.data['results'][0])
+
+    def test_protectora_veu_totes(self):
+        protectora = APIClient()
+        protectora.force_authenticate(self.protectora)
+        resposta = protectora.get(f'/api/mascota/batch/?ids={self.ids(self.ocult, self.adoptat)}')
+        self.assertEqual([m['nombre'] for m in resposta.data['results']], ['Ocult', 'Adoptat'])
+        self.assertEqual(resposta.data['missing'], [])
+
+    def test_ids_invalids(self):
+        from .views import MAX_MASCOTES_BATCH
+
+        for ids in ('', 'a,b', '1,,x'):
+            with self.subTest(ids=ids):
+                self.assertEqual(self.client.get(f'/api/mascota/batch/?ids={ids}').status_code, 400)
+        self.assertEqual(self.client.get('/api/mascota/batch/').status_code, 400)
+        massa = self.ids(*range(1, MAX_MASCOTES_BATCH + 2))
+        self.assertEqual(self.client.get(f'/api/mascota/batch/?ids={massa}').status_code, 400)
+
+    def test_ids_fora_de_rang_a_missing(self):
+        ids = f'{self.gos.pk},99999999999999999999,-1,0,{2 ** 63}'
+        for rapida in (True, False):
+            with self.subTest(rapida=rapida), override_settings(MASCOTES_SERIALITZACIO_RAPIDA=rapida):
+                resposta = self.client.get(f'/api/mascota/batch/?ids={ids}')
+                self.assertEqual(resposta.status_code, 200)
+                self.assertEqual([m['nombre'] for m in resposta.data['results']], ['Gos'])
+                self.assertEqual(resposta.data['missing'], [99999999999999999999, -1, 0, 2 ** 63])
+        resposta = self.client.get('/api/mascota/batch/?ids=99999999999999999999')
+        self.assertEqual(resposta.data, {'results': [], 'missing': [99999999999999999999]})
+
+
+class MascaresBitsTests(MascotaTestCase):
+
+    def bits(self, mascota, camp):
+        return getattr(Mascota.objects.get(pk=mascota.pk), mascares.camp_bits(camp))
+
+    def test_save_i_bulk_mantenen_les_mascares(self):
+        mascota = crear_mascota(self.protectora, apto_con=['NINOS', 'GATOS'], caracter_perro=['LEAL'])
+        bits = mascares.bits('apto_con')
+        self.assertEqual(self.bits(mascota, 'apto_con'), bits['NINOS'] | bits['GATOS'])
+        self.assertEqual(self.bits(mascota, 'caracter_perro'), mascares.bits('caracter_perro')['LEAL'])
+
+        mascota.apto_con = ['SIN_NINOS']
+        mascota.save(update_fields=['apto_con'])
+        self.assertEqual(self.bits(mascota, 'apto_con'), bits['SIN_NINOS'])
+
+        [nova] = Mascota.objects.bulk_create([Mascota(
+            nombre='Bulk', especie='GATO', raza_gato='EUROPEO', genero='HEMBRA', foto='mascotas/test.jpg',
+            protectora=self.protectora, estado_legal_salud=['VACUNADO'],
+        )])
+        self.assertEqual(self.bits(nova, 'estado_legal_salud'), mascares.bits('estado_legal_salud')['VACUNADO'])
+        nova.estado_legal_salud = []
+        Mascota.objects.bulk_update([nova], ['estado_legal_salud'])
+        self.assertEqual(self.bits(nova, 'estado_legal_salud'), 0)
+
+        Mascota.objects.filter(pk=nova.pk).update(estado_legal_salud=['MICROCHIP', 'VACUNADO'])
+        bits_salud = mascares.bits('estado_legal_salud')
+        self.assertEqual(self.bits(nova, 'estado_legal_salud'), bits_salud['MICROCHIP'] | bits_salud['VACUNADO'])
+        with self.assertRaises(ValueError):
+            Mascota.objects.update(apto_con=F('estado_legal_salud'))
+
+    def test_filtres_sense_falsos_positius(self):
+        nens = crear_mascota(self.protectora, apto_con=['NINOS', 'PERROS'], estado_legal_salud=['VACUNADO'])
+        crear_mascota(self.protectora, apto_con=['SIN_NINOS'])
+
+        def ids(params):
+            return {m['id'] for m in self.client.get('/api/mascota/', params).data['results']}
+
+        self.assertEqual(ids({'apto_con': 'NINOS'}), {nens.id})
+        self.assertEqual(ids({'apto_con': 'NINOS,PERROS', 'estado_salud': 'VACUNADO'}), {nens.id})
+        self.assertEqual(ids({'apto_con': 'NINOS,GATOS'}), set())
+        self.assertEqual(ids({'apto_con': 'NINO'}), set())
+        self.assertNotIn('LIKE', str(mascares.filtrar(Mascota.objects.all(), 'apto_con', 'NINOS').query))
+
+    def test_filtre_indexable(self):
+        rng = random.Random(0)
+        for camp in ('apto_con', 'caracter_perro'):
+            for _ in range(10):
+                valors = rng.sample(list(mascares.bits(camp)), rng.randint(0, 3))
+                crear_mascota(self.protectora, **{camp: valors})
+        for camp, valors in (('apto_con', ['NINOS']), ('apto_con', ['NINOS', 'PERROS']), ('caracter_perro', ['LEAL'])):
+            with self.subTest(camp=camp, valors=valors):
+                filtrades = mascares.filtrar(Mascota.objects.all(), camp, valors)
+                per_bits = Mascota.objects.filter(
+                    **{f'{mascares.camp_bits(camp)}__conte_tots': mascares.mascara(mascares.bits(camp), valors)}
+                )
+                self.assertCountEqual(filtrades, per_bits)
+                # Poques choices: `IN` de màscares (indexable); moltes: operació de bits
+                self.assertEqual('&' not in str(filtrades.query), camp == 'apto_con')
+        self.assertEqual(len(mascares.superconjunts(mascares.bits('apto_con'), 0)), 2 ** 9)
+
+    def test_backfill(self):
+        mascota = crear_mascota(self.protectora, apto_con=['PERROS'], condicion_especial_perro=['ANSIEDAD_SEPARACION'])
+        esperat = Mascota.objects.values_list(*(mascares.camp_bits(camp) for camp in mascares.CAMPS)).get()
+        Mascota.objects.update(**{mascares.camp_bits(camp): 0 for camp in mascares.CAMPS})
+
+        migracio = importlib.import_module('mascotas.migrations.0012_omplir_mascares_bits')
+        with mock.patch.object(migracio, 'MIDA_BLOC', 1):
+            crear_mascota(self.protectora, apto_con=['GATOS'])
+            Mascota.objects.update(apto_con_bits=0)
+            migracio.omplir_mascares(apps, None)
+
+        self.assertEqual(
+            Mascota.objects.filter(pk=mascota.pk)
+            .values_list(*(mascares.camp_bits(camp) for camp in mascares.CAMPS)).get(),
+            esperat,
+        )
+        self.assertFalse(Mascota.objects.filter(apto_con_bits=0).exists())
+
+
+class BarajaTests(MascotaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.mascotes = [crear_mascota(self.protectora, nombre=f'M{i}') for i in range(8)]
+
+    def carta(self):
+        return self.client.get('/api/petmatch/next/').data.get('id')
+
+    def recorrer(self):
+        vistes = []
+        while (mascota_id := self.carta()) is not None:
+            self.assertNotIn(mascota_id, vistes)
+            vistes.append(mascota_id)
+            self.swipe(Mascota(pk=mascota_id), 'dislike')
+        return vistes
+
+    def test_carta_estable_fins_al_swipe(self):
+        primera = self.carta()
+        self.assertEqual(self.carta(), primera)
+        self.swipe(Mascota(pk=primera), 'like')
+        self.assertNotEqual(self.carta(), primera)
+
+    def test_recorre_totes_les_mascotes_un_cop(self):
+        self.assertCountEqual(self.recorrer(), [m.id for m in self.mascotes])
+        self.assertEqual(self.client.get('/api/petmatch/next/').data['status'], 'empty')
+
+    def test_sense_ordenacio_aleatoria_a_la_bd(self):
+        self.carta()
+        with CaptureQueriesContext(connection) as consultes:
+            self.carta()
+        self.assertFalse(any('RANDOM' in q['sql'].upper() for q in consultes.captured_queries))
+
+    def test_salta_adoptades_i_ocultes(self):
+        primera = self.carta()
+        Mascota.objects.filter(pk=primera).update(adoptado=True)
+        segona = self.carta()
+        self.assertNotEqual(segona, primera)
+        Mascota.objects.filter(pk=segona).update(oculto=True)
+        self.assertNotIn(self.carta(), (primera, segona))
+
+    def test_mascotes_noves_s_hi_barregen(self):
+        self.carta()
+        nova = crear_mascota(self.protectora, nombre='Nova')
+        self.carta()
+        self.assertIn(nova.id, Baraja.objects.get(usuario=self.usuari).cartas)
+        self.assertIn(nova.id, self.recorrer())
+
+    def test_finestra_es_reomple(self):
+        with mock.patch.object(baraja, 'MIDA_BARAJA', 3):
+            self.carta()
+            self.assertEqual(len(Baraja.objects.get(usuario=self.usuari).cartas), 3)
+            self.assertCountEqual(self.recorrer(), [m.id for m in self.mascotes])
+
+    def test_mostra_acotada_a_la_bd(self):
+        mes = [crear_mascota(self.protectora, nombre=f'N{i}') for i in range(12)]
+        with mock.patch.object(baraja, 'MIDA_BARAJA', 5), mock.patch.object(baraja, 'MIDA_SONDEIG', 3):
+            with CaptureQueriesContext(connection) as consultes:
+                self.carta()
+            # Cap consulta llegeix tots els ids elegibles: sondejos de 3 ids sortejats
+            # (i la comprovació de les 5 cartes de la finestra)
+            llistes_ids = [
+                ids.split(', ') for q in consultes.captured_queries
+                for ids in re.findall(r'"mascotas"\."id" IN \(([^)]*)\)', q['sql'])
+            ]
+            self.assertIn(3, [len(ids) for ids in llistes_ids])
+            self.assertTrue(all(len(ids) <= 5 for ids in llistes_ids))
+            self.assertFalse(any('RANDOM' in q['sql'].upper() for q in consultes.captured_queries))
+            self.assertEqual(len(Baraja.objects.get(usuario=self.usuari).cartas), 5)
+            self.assertCountEqual(self.recorrer(), [m.id for m in self.mascotes + mes])
+
+    def test_mostra_uniforme(self):
+        # Un forat d'ids just davant d'una mascota no la fa sortir més sovint
+        Mascota.objects.filter(pk__in=[m.pk for m in self.mascotes[1:5]]).delete()
+        vives = [m.pk for m in self.mascotes[:1] + self.mascotes[5:]]
+        rng = random.Random(0)
+        sortides = Counter()
+        with mock.patch.object(baraja, 'MIDA_BARAJA', 1):
+            for _ in range(400):
+                sortides.update(baraja._mostra(Mascota.objects.all(), set(), rng))
+        self.assertEqual(set(sortides), set(vives))
+        self.assertTrue(all(60 <= n <= 140 for n in sortides.values()), sortides)
+
+    def test_mostra_candidats_escassos(self):
+        # Sondejos que no toquen l'única candidata: es tria igualment
+        unica = self.mascotes[3]
+        with mock.patch.object(baraja, 'MIDA_SONDEIG', 1), mock.patch.object(baraja, 'MAX_SONDEJOS', 1):
+            for seed in range(10):
+                mostra = baraja._mostra(Mascota.objects.filter(pk=unica.pk), set(), random.Random(seed))
+                self.assertEqual(mostra, [unica.pk])
+            self.assertEqual(baraja._mostra(Mascota.objects.none(), set(), random.Random(0)), [])
+
+    def test_feed_compatibles_no_avanca_la_baralla(self):
+        perfil = self.usuari.perfil_usuario
+        perfil.tiene_ninos = True
+        perfil.save()
+        compatibles = [crear_mascota(self.protectora, nombre=f'C{i}') for i in range(2)]
+        Mascota.objects.filter(pk__in=[m.pk for m in self.mascotes]).update(apto_ninos='NO_APTO_NINOS')
+
+        def lot(count, cursor=None):
+            params = {'compatibles': 1, 'count': count, **({'cursor': cursor} if cursor else {})}
+            return self.client.get('/api/petmatch/next/', params).data
+
+        with mock.patch.object(baraja, 'MIDA_BARAJA', 5):
+            # Sense prou compatibles a la finestra s'amplia (amb totes les elegibles) i es desa
+            primer = lot(2)
+            self.assertCountEqual([m['id'] for m in primer['results']], [m.pk for m in compatibles])
+            desada = Baraja.objects.get(usuario=self.usuari)
+            self.assertEqual(desada.cursor, 0)
+            self.assertTrue({m.pk for m in compatibles} <= set(desada.cartas))
+            # Mateix ordre a cada petició, i el cursor del lot continua
+            self.assertEqual(lot(2)['results'], primer['results'])
+            primera = lot(1)
+            self.assertEqual(primera['results'], primer['results'][:1])
+            self.assertEqual(lot(1, primera['cursor'])['results'], primer['results'][1:])
+            self.assertEqual(Baraja.objects.get(usuario=self.usuari).cartas, desada.cartas)
+
+        self.assertCountEqual(self.recorrer(), [m.id for m in self.mascotes + compatibles])
+
+    def test_mascotes_noves_ja_swipejades_no_s_hi_barregen(self):
+        self.carta()
+        nova = crear_mascota(self.protectora, nombre='Nova')
+        self.swipe(nova, 'dislike')
+        self.carta()
+        self.assertNotIn(nova.id, Baraja.objects.get(usuario=self.usuari).cartas)
+
+
+class LotCartesTests(MascotaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.mascotes = [crear_mascota(self.protectora, nombre=f'M{i}') for i in range(10)]
+
+    def lot(self, count, cursor=None):
+        params = {'count': count}
+        if cursor:
+            params['cursor'] = cursor
+        return self.client.get('/api/petmatch/next/', params).data
+
+    def test_lot_i_cursor(self):
+        primer = self.lot(4)
+        self.assertEqual(primer['count'], 4)
+        ids = [m['id'] for m in primer['results']]
+        self.assertEqual(len(set(ids)), 4)
+        self.assertEqual(ids[0], self.client.get('/api/petmatch/next/').data['id'])
+
+        # Sense cursor es repeteix el mateix lot; amb cursor es precarrega el següent
+        self.assertEqual([m['id'] for m in self.lot(4)['results']], ids)
+        segon = self.lot(4, primer['cursor'])
+        self.assertFalse({m['id'] for m in segon['results']} & set(ids))
+
+        tercer = self.lot(4, segon['cursor'])
+        self.assertEqual(tercer['count'], 2)
+        self.assertEqual(self.lot(4, tercer['cursor'])['status'], 'empty')
+
+    def test_cursor_despres_de_swipejar(self):
+        primer = self.lot(3)
+        for mascota in primer['results']:
+            self.swipe(Mascota(pk=mascota['id']), 'dislike')
+        segon = self.lot(3, primer['cursor'])
+        self.assertEqual([m['id'] for m in segon['results']], [m['id'] for m in self.lot(3)['results']])
+
+    def test_consultes_constants_amb_la_mida_del_lot(self):
+        self.lot(1)
+        with CaptureQueriesContext(connection) as una:
+            self.lot(1)
+        with CaptureQueriesContext(connection) as deu:
+            self.lot(10)
+        self.assertEqual(len(una.captured_queries), len(deu.captured_queries))
+
+    def test_parametres_no_valids(self):
+        self.assertEqual(self.client.get('/api/petmatch/next/', {'count': 'x'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/petmatch/next/', {'count': 2, 'cursor': '!!'}).status_code, 400)
+        self.assertEqual(self.lot(1000)['count'], 10)
+
+
+class PreferenciaImplicitaTests(MascotaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.gos = crear_mascota(self.protectora, tamano='GRANDE', apto_con=['NINOS', 'PERROS'])
+        self.gat = crear_mascota(
+            self.protectora, especie='GATO', raza_gato='EUROPEO', genero='HEMBRA',
+            estado_legal_salud=['VACUNADO'],
+        )
+
+    def histograma(self):
+        return preferencias.a_preferencies(PreferenciaImplicita.objects.get(usuario=self.usuari))
+
+    def des_de_zero(self):
+        return preferencias.a_preferencies(preferencias.reconstruir(self.usuari.pk))
+
+    def test_swipes_actualitzen_histograma(self):
+        self.swipe(self.gos, 'like')
+        self.swipe(self.gat, 'like')
+        histograma = self.histograma()
+        self.assertEqual(histograma['total_likes'], 2)
+        self.assertEqual(histograma['especie'], {'PERRO': 1, 'GATO': 1})
+        self.assertEqual(histograma['convivencia'], {'NINOS': 1, 'PERROS': 1})
+
+        self.swipe(self.gos, 'dislike')
+        histograma = self.histograma()
+        self.assertEqual(histograma['total_likes'], 1)
+        self.assertEqual(histograma['especie'], {'GATO': 1})
+        self.assertEqual(histograma['convivencia'], {})
+        self.assertEqual(histograma, self.des_de_zero())
+
+    def test_esborrar_like(self):
+        self.swipe(self.gos, 'like')
+        self.swipe(self.gat, 'like')
+        Interaccion.objects.filter(mascota=self.gat).delete()
+        self.assertEqual(self.histograma(), self.des_de_zero())
+        Interaccion.objects.all().delete()
+        self.assertIsNone(self.histograma())
+
+    def test_lectura_en_una_consulta(self):
+        self.swipe(self.gos, 'like')
+        with self.assertNumQueries(1):
+            preferencias.preferencies_implicites(self.usuari)
+
+    def test_backfill(self):
+        self.swipe(self.gos, 'like')
+        esperat = self.histograma()
+        PreferenciaImplicita.objects.all().delete()
+
+        call_command('reconstruir_preferencias_implicitas', chunk_size=1, stdout=StringIO())
+
+        self.assertEqual(self.histograma(), esperat)
+        self.assertTrue(PreferenciaImplicita.objects.filter(usuario=self.protectora, total_likes=0).exists())
+
+    def test_usuari_esborrat(self):
+        self.swipe(self.gos, 'like')
+        self.usuari.delete()
+        self.assertFalse(PreferenciaImplicita.objects.exists())
+
+
+class SwipesLotTests(MascotaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.mascotes = [
+            crear_mascota(self.protectora, nombre=f'M{i}', especie='GATO' if i % 2 else 'PERRO', raza_gato='EUROPEO')
+            for i in range(6)
+        ]
+
+    def lot(self, items):
+        return self.client.post('/api/petmatch/action/bulk/', {'swipes': items}, format='json')
+
+    def comptadors(self):
+        return list(Mascota.objects.order_by('pk').values_list('total_likes', 'total_dislikes', 'tendencia'))
+
+    def test_resultats_per_item(self):
+        self.swipe(self.mascotes[0], 'dislike')
+        self.swipe(self.mascotes[1], 'like')
+        resposta = self.lot([
+            {'mascota_id': self.mascotes[0].id, 'action': 'like'},
+            {'mascota_id': self.mascotes[1].id, 'action': 'like'},
+            {'mascota_id': self.mascotes[2].id, 'action': 'dislike'},
+            {'mascota_id': 999999, 'action': 'like'},
+            {'mascota_id': self.mascotes[3].id, 'action': 'superlike'},
+            {'mascota_id': self.mascotes[4].id, 'action': 'like'},
+            {'mascota_id': self.mascotes[4].id, 'action': 'dislike'},
+        ])
+        self.assertEqual(resposta.status_code, 200)
+        resultats = resposta.data['results']
+        self.assertEqual(
+            [r['status'] for r in resultats],
+            ['updated', 'unchanged', 'created', 'error', 'error', 'duplicate', 'created'],
+        )
+        self.assertEqual(resposta.data['count'], 4)
+        self.assertEqual(resultats[0]['chat_id'], Chat.objects.get(mascota=self.mascotes[0], adoptante=self.usuari).id)
+        self.assertEqual(resultats[1]['chat_id'], Chat.objects.get(mascota=self.mascotes[1], adoptante=self.usuari).id)
+        self.assertIsNone(resultats[2]['chat_id'])
+        self.assertEqual(Interaccion.objects.get(mascota=self.mascotes[4]).accion, 'dislike')
+        self.assertEqual(Chat.objects.count(), 2)
+
+    def test_mateix_efecte_que_swipes_individuals(self):
+        accions = [('like', 'dislike'), ('dislike', 'like'), ('like', 'like'), (None, 'like'), (None, 'dislike')]
+        for mascota, (primera, _) in zip(self.mascotes, accions):
+            if primera:
+                self.swipe(mascota, primera)
+        self.lot([
+            {'mascota_id': mascota.id, 'action': segona}
+            for mascota, (_, segona) in zip(self.mascotes, accions)
+        ])
+        comptadors_lot = self.comptadors()
+        histograma_lot = preferencias.a_preferencies(PreferenciaImplicita.objects.get(usuario=self.usuari))
+        chats_lot = set(Chat.objects.values_list('mascota_id', flat=True))
+
+        popularidad.reconciliar_comptadors()
+        for (likes, dislikes, tendencia), (likes_ok, dislikes_ok, tendencia_ok) in zip(comptadors_lot, self.comptadors()):
+            self.assertEqual((likes, dislikes), (likes_ok, dislikes_ok))
+            self.assertAlmostEqual(tendencia, tendencia_ok)
+        self.assertEqual(histograma_lot, preferencias.a_preferencies(preferencias.reconstruir(self.usuari.pk)))
+        self.assertEqual(chats_lot, {m.id for m in self.mascotes[:4]})
+
+    def test_consultes_constants(self):
+        with CaptureQueriesContext(connection) as dos:
+            self.lot([{'mascota_id': m.id, 'action': 'like'} for m in self.mascotes[:2]])
+        with CaptureQueriesContext(connection) as sis:
+            self.lot([{'mascota_id': m.id, 'action': 'dislike'} for m in self.mascotes])
+        self.assertLessEqual(len(sis), len(dos))
+        self.assertEqual(sum('INSERT INTO "interacciones"' in q['sql'] for q in sis.captured_queries), 1)
+
+    def test_peticions_no_valides(self):
+        self.assertEqual(self.lot([]).status_code, 400)
+        self.assertEqual(self.client.post('/api/petmatch/action/bulk/', {'swipes': 'x'}, format='json').status_code, 400)
+        massa = [{'mascota_id': self.mascotes[0].id, 'action': 'like'}] * 501
+        self.assertEqual(self.lot(massa).status_code, 400)
+
+    def test_ids_no_valids_per_item(self):
+        # Dígits no ASCII, fora del rang de la clau primària, booleans...: error de l'ítem, no 500
+        ids = ['\u00b2', '\u0661', str(2 ** 70), 2 ** 70, 2 ** 63, 0, '0', -1, True, 1.0, None]
+        resposta = self.lot([{'mascota_id': mascota_id, 'action': 'like'} for mascota_id in ids] + [
+            {'mascota_id': str(self.mascotes[0].id), 'action': 'like'},
+        ])
+        self.assertEqual(resposta.status_code, 200)
+        resultats = resposta.data['results']
+        self.assertEqual([r['status'] for r in resultats], ['error'] * len(ids) + ['created'])
+        self.assertTrue(all(r['detail'] == 'mascota_id no vàlid.' for r in resultats[:-1]))
+
+
+class DadesSintetiquesTests(TestCase):
+
+    def generar(self, prefix, seed=3):
+        call_command(
+            'generar_dades_sintetiques', seed=seed, prefix=prefix, protectores=3, usuaris=10, mascotes=60,
+            swipes=200, xats=8, chunk_size=7, stdout=StringIO(),
+        )
+        return list(
+            Mascota.objects.filter(protectora__username__startswith=f'{prefix}_')
+            .order_by('pk')
+            .values_list('nombre', 'especie', 'raza_perro', 'raza_gato', 'apto_con', 'oculto', 'adoptado')
+        )
+
+    def test_genera_el_dataset_complet(self):
+        self.generar('a')
+        self.assertEqual(Usuario.objects.filter(role='protectora').count(), 3)
+        self.assertEqual(PerfilUsuario.objects.count(), 10)
+        self.assertEqual(Mascota.objects.count(), 60)
+        self.assertEqual(Interaccion.objects.count(), 200)
+        self.assertEqual(Chat.objects.count(), 8)
+        self.assertTrue(Mensaje.objects.exists())
+        # Derivats reconstruïts (bulk_create no dispara signals)
+        self.assertEqual(
+            Mascota.objects.aggregate(total=Sum('total_likes'))['total'],
+            Interaccion.objects.filter(accion='like').count(),
+        )
+        self.assertEqual(PreferenciaImplicita.objects.count(), Usuario.objects.count())
+
+    def test_dates_generades(self):
+        from django.utils import timezone
+        inici = timezone.now()
+        self.generar('a')
+        # Les dates generades substitueixen les d'auto_now_add, que continua actiu per a la resta
+        for model, camp in ((Mascota, 'fecha_creacion'), (Interaccion, 'fecha'), (Chat, 'fecha_creacion')):
+            with self.subTest(model=model.__name__):
+                self.assertTrue(model.objects.filter(**{f'{camp}__lt': inici}).exists())
+                self.assertTrue(model._meta.get_field(camp).auto_now_add)
+        chat = Chat.objects.filter(mensajes__isnull=False).first()
+        self.assertGreater(chat.mensajes.order_by('fecha_envio').first().fecha_envio, chat.fecha_creacion)
+
+    def test_reproduible_amb_la_mateixa_llavor(self):
+        self.assertEqual(self.generar('a'), self.generar('b'))
+        self.assertNotEqual(self.generar('c', seed=4), self.generar('d'))
+
+    def test_prefix_existent(self):
+        self.generar('a')
+        with self.assertRaises(CommandError):
+            self.generar('a')
+
+
+class ExplicarConsultesTests(TestCase):
+
+    def test_cap_recorregut_sequencial_inesperat(self):
+        sortida = StringIO()
+        call_command(
+            'explicar_consultes', usuaris=5, mascotes=300, swipes=200, protectores=3, estricte=True, stdout=sortida,
+        )
+        self.assertIn('0 consultes amb recorreguts seqüencials no esperats.', sortida.getvalue())
+        self.assertFalse(Mascota.objects.exists())
+
+    def test_deteccio_de_recorreguts(self):
+        from .management.commands.explicar_consultes import taules_recorregudes
+        self.assertEqual(taules_recorregudes('SCAN mascotas\nSCAN interacciones USING INDEX x', 'sqlite'), ['mascotas'])
+        self.assertEqual(taules_recorregudes('Seq Scan on mascotas  (cost=0.00..1.01)', 'postgresql'), ['mascotas'])
+        self.assertEqual(taules_recorregudes('Index Scan using mascotas_visibles_recents', 'postgresql'), [])
+
+
+class BenchmarkEndpointsTests(TestCase):
+
+    def test_informe_json(self):
+        with tempfile.TemporaryDirectory() as directori:
+            sortida = Path(directori) / 'informe.json'
+            call_command(
+                'benchmark_endpoints', usuaris=5, mascotes=40, swipes=50, xats=5, protectores=2,
+                repeticions=3, escalfament=1, sortida=str(sortida), stdout=StringIO(),
+            )
+            informe = json.loads(sortida.read_text())
+
+        self.assertEqual(informe['metadades']['dataset']['mascotes'], 40)
+        self.assertEqual(set(informe['endpoints']), {
+            'petmatch_next', 'petmatch_action', 'petmatch_action_bulk', 'mascota_list', 'mascota_list_filtres',
+            'mascota_list_pagina_final', 'mascota_list_cursor_final', 'mascota_list_cache',
+            'ia_recomendacion', 'ia_recomendacion_freda', 'chat_list', 'chat_detail',
+        })
+        for nom, resultat in informe['endpoints'].items():
+            with self.subTest(endpoint=nom):
+                self.assertEqual(resultat['n'], 3)
+                self.assertTrue(all(200 <= estat < 300 for estat in resultat['estats_http']))
+                if nom == 'mascota_list_cache':
+                    self.assertEqual(resultat['consultes_max'], 0)
+                else:
+                    self.assertGreater(resultat['consultes_max'], 0)
+                self.assertLessEqual(resultat['p50_ms'], resultat['p95_ms'])
+        # Les dades sintètiques es desfan en acabar
+        self.assertFalse(Mascota.objects.exists())
@@ -16,4 +16,5 @@ urlpatterns = [
     # Rutas PetTinder (usadas por el componente PetTinder.jsx)
     path('petmatch/next/', views.get_next_card, name='api_petmatch_next'),
     path('petmatch/action/', views.swipe_action, name='api_petmatch_action'),
+    path('petmatch/action/bulk/', views.swipe_bulk, name='api_petmatch_action_bulk'),
 ]
\ No newline at end of file
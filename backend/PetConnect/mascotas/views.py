@@ -3,7 +3,8 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
 from .models import Mascota, Interaccion
-from .serializers import MascotaSerializer
+from .serializers import serializer_per_vista
+from . import serialitzacio_rapida
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
@@ -14,11 +15,12 @@ def favoritos(request):
     user = request.user
     interaccions = Interaccion.objects.filter(usuario=user, accion='like')
     mascota_ids = interaccions.values_list('mascota_id', flat=True)
-    mascotes = Mascota.objects.filter(id__in=mascota_ids)
-    serializer = MascotaSerializer(mascotes, many=True, context={'request': request})
+    mascotes = Mascota.objects.per_serialitzar().filter(id__in=mascota_ids)
+    serializer = serializer_per_vista(request)(mascotes, many=True, context={'request': request})
     return Response(serializer.data, status=status.HTTP_200_OK)
 
 import json
+from django.core.exceptions import ObjectDoesNotExist
 from django.shortcuts import get_object_or_404
 
 # Importaciones de DRF
@@ -30,16 +32,27 @@ from rest_framework.pagination import PageNumberPagination
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter
 
-from .models import Mascota, Interaccion
+from .constants import MAX_PK
+from .models import Mascota, Interaccion, camps_edicio
+from . import baraja, cache_cataleg, facetes, mascares, serialitzacio_rapida, swipes
 from chat.models import Chat
 from .serializers import MascotaSerializer
 from .permissions import MascotaPermissions
+from .pagination import MascotaCursorPagination, mode_cursor
 from rest_framework.permissions import IsAuthenticated
 
 
 class MascotaPagination(PageNumberPagination):
     page_size = 12
 
+
+def _perfil_usuario(user):
+    """PerfilUsuario de l'usuari o None (protectores i admins no en tenen)."""
+    try:
+        return user.perfil_usuario
+    except ObjectDoesNotExist:
+        return None
+
 # VISTAS DEL SWIPE (FUNCIONALIDAD TINDER) 
 
 @api_view(['GET'])
@@ -48,23 +61,30 @@ def get_next_card(request):
     """
     [GET] /api/petmatch/next/
     Retorna la següent Mascota que l'usuari NO ha swipejat.
+
+    Query params opcionals:
+    - compatibles=1: només mascotes compatibles amb la situació personal del perfil
+    - count=N: retorna un lot de fins a N cartes (màx. MAX_CARTES_LOT) com a
+      {'results': [...], 'cursor': ..., 'status': 'ok' | 'empty'}
+    - cursor: el `cursor` del lot anterior, per precarregar el lot següent
+      mentre l'usuari encara swipeja l'actual
     """
     user = request.user
-    
-    # Obtener IDs de mascotas con las que el usuario ya interactuó
-    swiped_ids = Interaccion.objects.filter(usuario=user).values_list('mascota_id', flat=True)
-    
-    # Filtrar: no adoptadas, no ocultas, y excluir ya swipeadas.
-    next_animal = Mascota.objects.filter(
-        adoptado=False, 
-        oculto=False
-    ).exclude(
-        id__in=swiped_ids
-    ).order_by('?').first() # '?' para orden aleatorio
+
+    # Les cartes surten de la baralla barrejada i persistent de l'usuari (mascotas.baraja):
+    # només mascotes no adoptades, no ocultes i no swipejades, sense ORDER BY random().
+    perfil_compatibles = None
+    if request.query_params.get('compatibles') in ('1', 'true'):
+        perfil_compatibles = _perfil_usuario(user)
+
+    if 'count' in request.query_params:
+        return _lot_de_cartes(request, perfil_compatibles)
+
+    next_animal = baraja.seguent_mascota(user, perfil_compatibles)
 
     if next_animal:
         # Usamos el Serializer para obtener los datos
-        serializer = MascotaSerializer(next_animal, context={'request': request})
+        serializer = serializer_per_vista(request)(next_animal, context={'request': request})
         return Response(serializer.data, status=status.HTTP_200_OK)
     else:
         return Response(
@@ -73,6 +93,40 @@ def get_next_card(request):
         )
 
 
+MAX_CARTES_LOT = 50
+
+
+def _lot_de_cartes(request, perfil_compatibles):
+    """Resposta de `get_next_card` amb ?count=N (i opcionalment ?cursor=...)."""
+    try:
+        count = int(request.query_params.get('count'))
+    except (TypeError, ValueError):
+        return Response({'detail': 'count ha de ser un enter.'}, status=status.HTTP_400_BAD_REQUEST)
+    count = max(1, min(count, MAX_CARTES_LOT))
+
+    despres_de = None
+    if request.query_params.get('cursor'):
+        try:
+            despres_de = baraja.decodificar_cursor(request.query_params['cursor'])
+        except ValueError as exc:
+            return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+    if serialitzacio_rapida.activa(request):
+        mascotes = baraja.seguents_mascotes(request.user, count, despres_de, perfil_compatibles, files=True)
+        resultats = serialitzacio_rapida.serialitzar(mascotes, request)
+        ultima = mascotes[-1]['id'] if mascotes else None
+    else:
+        mascotes = baraja.seguents_mascotes(request.user, count, despres_de, perfil_compatibles)
+        resultats = serializer_per_vista(request)(mascotes, many=True, context={'request': request}).data
+        ultima = mascotes[-1].id if mascotes else None
+    return Response({
+        'status': 'ok' if mascotes else 'empty',
+        'results': resultats,
+        'count': len(mascotes),
+        'cursor': baraja.codificar_cursor(ultima) if mascotes else None,
+    }, status=status.HTTP_200_OK)
+
+
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
 def swipe_action(request):
@@ -91,15 +145,29 @@ def swipe_action(request):
             return Response({'detail': 'Acció no vàlida. Utilitzi "like" o "dislike".'}, status=status.HTTP_400_BAD_REQUEST)
 
         mascota = get_object_or_404(Mascota, id=mascota_id)
+        is_like = (action_str == 'like')
 
-        # Registra o actualiza la interacción (gestiona la restricción de unicidad)
+        if swipes.write_behind_actiu():
+            # Mode write-behind: només es desa l'esdeveniment; la interacció, els
+            # comptadors i el xat els aplica més tard `buidar_swipes_pendents`
+            swipes.encuar_swipe(user, mascota, action_str)
+            chat_id = None
+            if is_like:
+                chat_id = Chat.objects.filter(mascota=mascota, adoptante=user).values_list('id', flat=True).first()
+            return Response(
+                {'status': 'queued', 'is_like': is_like, 'chat_id': chat_id, 'message': 'Interacció rebuda.'},
+                status=status.HTTP_202_ACCEPTED
+            )
+
+        # Registra o actualiza la interacción (gestiona la restricción de unicidad).
+        # Els comptadors de popularitat de la mascota s'actualitzen dins de la
+        # mateixa transacció (mascotas.signals), també quan un like passa a dislike.
         interaccion, created = Interaccion.objects.update_or_create(
             usuario=user,
             mascota=mascota,
             defaults={'accion': action_str}
         )
         
-        is_like = (action_str == 'like')
         chat_id = None
         if is_like:
             # Comprueba si ya existe el chat, si no, lo crea
@@ -119,6 +187,31 @@ def swipe_action(request):
     except Exception as e:
         return Response({'detail': f'Error intern: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def swipe_bulk(request):
+    """
+    [POST] /api/petmatch/action/bulk/
+    Registra diversos swipes alhora (clients que swipegen ràpid o que envien la cua offline).
+    Espera JSON: { "swipes": [{ "mascota_id": 123, "action": "like" }, ...] } (o directament la llista).
+    Retorna un resultat per ítem, en el mateix ordre.
+    """
+    items = request.data.get('swipes') if isinstance(request.data, dict) else request.data
+    if not isinstance(items, list) or not items:
+        return Response({'detail': 'Cal una llista "swipes" no buida.'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(items) > swipes.MAX_SWIPES_LOT:
+        return Response(
+            {'detail': f'Com a màxim {swipes.MAX_SWIPES_LOT} swipes per petició.'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    resultats = swipes.registrar_swipes(request.user, items)
+    return Response({
+        'status': 'ok',
+        'results': resultats,
+        'count': sum(1 for resultat in resultats if resultat['status'] not in ('error', 'duplicate')),
+    }, status=status.HTTP_200_OK)
+
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def get_user_preferits(request):
@@ -137,16 +230,33 @@ def get_user_preferits(request):
         status=status.HTTP_200_OK
     )
 
+MAX_MASCOTES_BATCH = 50
+
+
+def _ids_batch(valor):
+    """Ids de `?ids=1,2,3` sense repetits i en l'ordre demanat; ValueError si no són enters."""
+    ids = [int(part) for part in (valor or '').split(',') if part.strip()]
+    if not ids:
+        raise ValueError('ids ha de contenir almenys un id.')
+    return list(dict.fromkeys(ids))
+
+
 class MascotaViewSet(viewsets.ModelViewSet):
     """ViewSet para Mascota con solo `list` y `create`.
 
     - GET list: público (AllowAny)
     - POST create: solo autenticados (IsAuthenticated)
-    - Paginación: 12 por página
+    - Paginación: 12 por página. Per defecte per número de pàgina (?page=N, amb
+      `count`); amb ?paginacio=cursor, per clau (fecha_creacion, id) sense COUNT
+      ni OFFSET (mascotas.pagination), seguint l'enllaç `next`
     - Orden por defecto: -fecha_creacion
     - Filtros básicos por query params: especie, tamano, genero, edad_clasificacion, apto_con, estado_salud
+    - GET facets: recomptes per faceta amb els mateixos filtres i regles de rol
+    - GET batch: ?ids=1,2,3 (fins a MAX_MASCOTES_BATCH) en l'ordre demanat, amb els que no es veuen a `missing`
+    - GET list / retrieve anònims: resposta cachejada (mascotas.cache_cataleg)
+    - Lectures: ?vista=tarjeta (MascotaTarjetaSerializer), ?fields=a,b i ?omit=a,b
     """
-    queryset = Mascota.objects.all().order_by('-fecha_creacion')
+    queryset = Mascota.objects.per_serialitzar().order_by('-fecha_creacion')
     serializer_class = MascotaSerializer
     pagination_class = MascotaPagination
     filter_backends = [DjangoFilterBackend, SearchFilter]
@@ -156,13 +266,24 @@ class MascotaViewSet(viewsets.ModelViewSet):
 
     def get_permissions(self):
         # Mantener la estructura similar a usuarios/views.py: permitir list público y create autenticado
-        if self.action == 'list':
+        if self.action in ('list', 'facets', 'batch'):
             return [permissions.AllowAny()]
         if self.action == 'create':
             return [IsAuthenticated()]
         # Para otras acciones, usar la clase de permisos principal
         return [p() for p in self.permission_classes]
 
+    def get_serializer_class(self):
+        # ?vista=tarjeta: representació compacta per a graelles; ?fields= / ?omit= a totes dues
+        return serializer_per_vista(self.request)
+
+    @property
+    def paginator(self):
+        # Paginació per cursor opcional (el mode per número de pàgina es manté per a l'admin)
+        if not hasattr(self, '_paginator') and self.action == 'list' and mode_cursor(self.request):
+            self._paginator = MascotaCursorPagination()
+        return super().paginator
+
     def get_queryset(self):
         # Filtrado por rol: público/usuario -> oculto=False y adoptado=False; protectora -> todas
         qs = super().get_queryset()
@@ -197,22 +318,124 @@ class MascotaViewSet(viewsets.ModelViewSet):
         if edad_clasificacion and edad_clasificacion != 'todos':
             qs = qs.filter(edad_clasificacion=edad_clasificacion)
 
-        # Filtro por apto_con (convivència)
+        # Filtro por apto_con (convivència). Sobre la màscara de bits (mascotas.mascares):
+        # admet diversos valors separats per comes (la mascota els ha de tenir tots)
         apto_con = q.get('apto_con')
         if apto_con and apto_con != 'todos':
-            qs = qs.filter(apto_con__contains=apto_con)
+            qs = mascares.filtrar(qs, 'apto_con', apto_con)
 
         # Filtro por estado de salud/legal
         estado_salud = q.get('estado_salud')
         if estado_salud and estado_salud != 'todos':
-            qs = qs.filter(estado_legal_salud__contains=estado_salud)
+            qs = mascares.filtrar(qs, 'estado_legal_salud', estado_salud)
 
         return qs
 
+    def list(self, request, *args, **kwargs):
+        # Peticions anònimes: resposta cachejada per paràmetres (mascotas.cache_cataleg)
+        if not cache_cataleg.cachejable(request):
+            return self._llistar(request, *args, **kwargs)
+        clau = cache_cataleg.clau_llistat(request)
+        dades = cache_cataleg.llegir(clau)
+        if dades is not None:
+            return Response(dades)
+        resposta = self._llistar(request, *args, **kwargs)
+        if resposta.status_code == status.HTTP_200_OK:
+            resultats = resposta.data['results'] if isinstance(resposta.data, dict) else resposta.data
+            cache_cataleg.desar(clau, resposta.data, cache_cataleg.versions([m['id'] for m in resultats]))
+        return resposta
+
+    def _llistar(self, request, *args, **kwargs):
+        if not serialitzacio_rapida.activa(request):
+            return super().list(request, *args, **kwargs)
+        # Representació completa: files de `.values()` sense passar per DRF (mascotas.serialitzacio_rapida)
+        queryset = serialitzacio_rapida.files(self.filter_queryset(self.get_queryset()))
+        pagina = self.paginate_queryset(queryset)
+        return self.get_paginated_response(serialitzacio_rapida.serialitzar(pagina, request))
+
+    def retrieve(self, request, *args, **kwargs):
+        pk = str(kwargs.get('pk', ''))
+        if not (cache_cataleg.cachejable(request) and pk.isascii() and pk.isdigit()):
+            return super().retrieve(request, *args, **kwargs)
+        clau = cache_cataleg.clau_detall(int(pk))
+        dades = cache_cataleg.llegir(clau)
+        if dades is not None:
+            return Response(dades)
+        # Versió llegida abans de calcular: una edició d'ara mateix invalida el que es desi
+        versions = cache_cataleg.versions([int(pk)])
+        resposta = super().retrieve(request, *args, **kwargs)
+        if resposta.status_code == status.HTTP_200_OK:
+            cache_cataleg.desar(clau, resposta.data, versions)
+        return resposta
+
     def perform_create(self, serializer):
         # Solo protectoras/autenticados pueden crear; el permiso se controla en get_permissions
         serializer.save(protectora=self.request.user)
 
+    @action(detail=False, methods=['get'])
+    def facets(self, request):
+        """Recomptes per valor de cada faceta amb els filtres aplicats, menys el de la faceta (mascotas.facetes).
+
+        Endpoint: GET /api/mascota/facets/?<mateixos filtres que el llistat>
+        """
+        abast = 'protectora' if getattr(request.user, 'role', None) == 'protectora' else 'public'
+        return Response(facetes.obtenir(self._filtrat_sense, abast, request.query_params), status=status.HTTP_200_OK)
+
+    def _filtrat_sense(self, parametres):
+        """Queryset del llistat (regles de rol i filtres) sense els filtres dels `parametres` donats."""
+        if not parametres:
+            return self.filter_queryset(self.get_queryset())
+        # get_queryset i els filter backends llegeixen els filtres de request.query_params
+        peticio = self.request._request
+        originals = peticio.GET
+        peticio.GET = originals.copy()
+        for nom in parametres:
+            peticio.GET.pop(nom, None)
+        try:
+            return self.filter_queryset(self.get_queryset())
+        finally:
+            peticio.GET = originals
+
+    @action(detail=False, methods=['get'])
+    def batch(self, request):
+        """Diverses mascotes per id en una consulta (p. ex. la pantalla de preferits).
+
+        Endpoint: GET /api/mascota/batch/?ids=1,2,3
+        Mateixes regles de visibilitat que el llistat i el detall, i mateixos
+        ?vista= / ?fields= / ?omit=. `results` segueix l'ordre de `ids`; els ids
+        que no existeixen o no es poden veure van a `missing`.
+        """
+        try:
+            ids = _ids_batch(request.query_params.get('ids'))
+        except ValueError:
+            return Response(
+                {'detail': 'ids ha de ser una llista d\'enters separats per comes.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(ids) > MAX_MASCOTES_BATCH:
+            return Response(
+                {'detail': f'Com a màxim {MAX_MASCOTES_BATCH} ids per petició.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Els ids fora de rang van directament a `missing` (la BD no els accepta com a paràmetre)
+        queryset = self.get_queryset().filter(pk__in=[i for i in ids if 0 < i <= MAX_PK]).order_by()
+        posicio = {mascota_id: i for i, mascota_id in enumerate(ids)}
+        # S'ordena abans de serialitzar: amb ?fields= la sortida pot no portar l'id
+        if serialitzacio_rapida.activa(request):
+            files = sorted(serialitzacio_rapida.files(queryset), key=lambda fila: posicio[fila['id']])
+            trobats = [fila['id'] for fila in files]
+            resultats = serialitzacio_rapida.serialitzar(files, request)
+        else:
+            mascotes = sorted(queryset, key=lambda mascota: posicio[mascota.pk])
+            trobats = [mascota.pk for mascota in mascotes]
+            resultats = self.get_serializer(mascotes, many=True).data
+        trobats = set(trobats)
+        return Response(
+            {'results': resultats, 'missing': [mascota_id for mascota_id in ids if mascota_id not in trobats]},
+            status=status.HTTP_200_OK
+        )
+
     @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
     def mis_mascotas(self, request):
         """Retorna les mascotes creades per la protectora autenticada.
@@ -223,19 +446,19 @@ class MascotaViewSet(viewsets.ModelViewSet):
         role = getattr(user, 'role', None)
         if role != 'protectora':
             return Response({'detail': 'Només les protectores poden veure les seves mascotes.'}, status=status.HTTP_403_FORBIDDEN)
-        qs = Mascota.objects.filter(protectora=user).order_by('-fecha_creacion')
+        qs = Mascota.objects.per_serialitzar().filter(protectora=user).order_by('-fecha_creacion')
         serializer = self.get_serializer(qs, many=True, context={'request': request})
         return Response(serializer.data, status=status.HTTP_200_OK)
 
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
     def ocultar(self, request, pk=None):
         """Acción para ocultar una mascota (solo protectora dueña o admin)."""
-        mascota = get_object_or_404(Mascota, pk=pk)
+        mascota = get_object_or_404(Mascota.objects.per_serialitzar(), pk=pk)
         # permission_classes y MascotaPermissions restringirán quien puede hacerlo
         if not self.check_object_permissions(request, mascota):
             raise PermissionDenied('No tienes permiso para ocultar esta mascota.')
         mascota.oculto = True
-        mascota.save()
+        mascota.save(update_fields=camps_edicio(['oculto']))
         return Response(self.get_serializer(mascota).data, status=status.HTTP_200_OK)
 
 
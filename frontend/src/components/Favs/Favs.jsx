@@ -9,6 +9,9 @@ import api from '../../api/client';
 import { useAuthContext } from '../../context/AuthProvider';
 import { ROLES } from '../../constants/roles';
 
+// Màxim d'ids per petició a /mascota/batch/ (MAX_MASCOTES_BATCH al backend)
+const MIDA_LOT_BATCH = 50;
+
 export default function Favs() {
   const { t } = useTranslation();
   const { colors } = useColors();
@@ -46,19 +49,17 @@ export default function Favs() {
           return;
         }
         
-        // Obtenir les mascotes preferides directament per ID
-        const mascotesPromises = preferitsIds.map(id => 
-          api.get(`/mascota/${id}/`).catch(err => {
-            console.error(`Error carregant mascota ${id}:`, err);
-            return null;
-          })
+        // Obtenir les mascotes preferides en lots per ID (/mascota/batch/)
+        const lots = [];
+        for (let i = 0; i < preferitsIds.length; i += MIDA_LOT_BATCH) {
+          lots.push(preferitsIds.slice(i, i + MIDA_LOT_BATCH));
+        }
+        const mascotesResponses = await Promise.all(
+          lots.map(ids => api.get('/mascota/batch/', { params: { ids: ids.join(',') } }))
         );
-        
-        const mascotesResponses = await Promise.all(mascotesPromises);
-        const mascotesFiltrades = mascotesResponses
-          .filter(res => res !== null)
-          .map(res => res.data);
-        
+        // Les que ja no es poden veure (adoptades, ocultes) arriben a `missing`
+        const mascotesFiltrades = mascotesResponses.flatMap(res => res.data.results);
+
         setFavorits(mascotesFiltrades);
         setLoading(false);
       } catch (err) {